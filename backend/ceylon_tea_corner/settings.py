@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third party apps
     'rest_framework',
@@ -50,6 +51,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'inventory.middleware.RequestMetricsMiddleware',
+    'inventory.middleware.ReplicaPinMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -93,9 +96,32 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD', default='postgres'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432'),
+        # Seconds to keep connections open; lets the async views' worker
+        # threads reuse theirs instead of reconnecting per query
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=0, cast=int),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Optional read replica for reporting and listing reads. Writes always go to
+# 'default'; see inventory/routers.py
+if config('DB_REPLICA_HOST', default=''):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': config('DB_REPLICA_HOST'),
+        'PORT': config('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        'USER': config('DB_REPLICA_USER', default=DATABASES['default']['USER']),
+        'PASSWORD': config('DB_REPLICA_PASSWORD', default=DATABASES['default']['PASSWORD']),
+        # Tests read the replica through the primary's connection
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['inventory.routers.ReplicaRouter']
+
+# How long a user who just wrote reads from the primary; should exceed the
+# worst expected replica lag
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=15, cast=int)
+
 # SQLite Database (for development - alternative)
 # DATABASES = {
 #     'default': {
@@ -105,6 +131,52 @@ DATABASES = {
 # }
 
 
+# Cache
+# Use a shared Redis cache in production (needs the redis package) so that
+# dashboard invalidation reaches every worker process.
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'ceylon-tea-corner',
+        }
+    }
+
+# Upper bound on dashboard staleness if an invalidation is ever missed
+DASHBOARD_CACHE_TIMEOUT = config('DASHBOARD_CACHE_TIMEOUT', default=300, cast=int)
+
+# Precomputed standard report windows older than this are recomputed live;
+# keep it above the precompute_reports --interval
+REPORT_PRECOMPUTE_MAX_AGE = config('REPORT_PRECOMPUTE_MAX_AGE', default=900, cast=int)
+
+# Per-endpoint latency and SQL metrics, served at /api/metrics/ to staff
+METRICS_ENABLED = config('METRICS_ENABLED', default=False, cast=bool)
+
+# Catalogue delta sync (/api/teas/?since=): watermarks are held back by the
+# overlap so slow commits are not skipped, and deletions are remembered for
+# the retention period; older watermarks get the whole catalogue again
+CATALOGUE_SYNC_OVERLAP_SECONDS = config('CATALOGUE_SYNC_OVERLAP_SECONDS', default=5, cast=int)
+TEA_TOMBSTONE_RETENTION_DAYS = config('TEA_TOMBSTONE_RETENTION_DAYS', default=30, cast=int)
+
+# The low-stock alerts feed (/api/alerts/low-stock/) only serves alerts at
+# least this old, so an id cursor never moves past a sale still committing
+STOCK_ALERT_FEED_LAG_SECONDS = config('STOCK_ALERT_FEED_LAG_SECONDS', default=2, cast=int)
+
+# Idle /api/events/ streams get a comment this often, and every stream is
+# closed after EVENTS_STREAM_SECONDS for the client to reconnect
+EVENTS_KEEPALIVE_SECONDS = config('EVENTS_KEEPALIVE_SECONDS', default=15, cast=int)
+EVENTS_STREAM_SECONDS = config('EVENTS_STREAM_SECONDS', default=300, cast=int)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -149,7 +221,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'inventory.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -165,6 +237,10 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
 }
 
+# How long an authenticated user is reused from memory before it is reloaded;
+# bounds how late a deactivation made in another process takes effect
+AUTH_USER_CACHE_TTL = config('AUTH_USER_CACHE_TTL', default=30, cast=int)
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -6,7 +6,7 @@ from .models import Tea, Sale, UserProfile
 
 @admin.register(Tea)
 class TeaAdmin(admin.ModelAdmin):
-    list_display = ('name', 'category', 'price', 'stock_quantity', 'is_in_stock', 'created_at')
+    list_display = ('name', 'category', 'price', 'stock_quantity', 'reorder_level', 'is_in_stock', 'created_at')
     list_filter = ('category', 'created_at')
     search_fields = ('name', 'description')
     ordering = ('name',)
@@ -17,7 +17,7 @@ class TeaAdmin(admin.ModelAdmin):
             'fields': ('name', 'category', 'price', 'description')
         }),
         ('Inventory', {
-            'fields': ('stock_quantity',)
+            'fields': ('stock_quantity', 'reorder_level')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
@@ -30,6 +30,7 @@ class TeaAdmin(admin.ModelAdmin):
 class SaleAdmin(admin.ModelAdmin):
     list_display = ('tea', 'quantity', 'unit_price', 'total_amount', 'sold_at', 'sold_by', 'customer_name')
     list_filter = ('sold_at', 'tea__category', 'sold_by')
+    list_select_related = ('tea', 'sold_by')
     search_fields = ('tea__name', 'customer_name', 'sold_by__username')
     ordering = ('-sold_at',)
     readonly_fields = ('sold_at', 'total_amount')
@@ -71,6 +72,7 @@ admin.site.register(User, UserAdmin)
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'role', 'phone_number', 'created_at')
+    list_select_related = ('user',)
     list_filter = ('role', 'created_at')
     search_fields = ('user__username', 'user__email', 'phone_number')
     readonly_fields = ('created_at',)
@@ -0,0 +1,174 @@
+"""
+Async (ASGI) versions of the reports and dashboard endpoints.
+
+They return the same payloads as reports_view and dashboard_stats, but run
+each report's independent queries at the same time, each in its own worker
+thread with its own database connection. A summary report then takes about
+as long as its slowest query instead of the sum of all three. Set
+CONN_MAX_AGE so those worker threads keep their connections between requests.
+
+The live events stream is here too, as it holds a connection open for as
+long as the client listens and needs an ASGI server to do that cheaply.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.utils.encoders import JSONEncoder
+
+from .authentication import CachedJWTAuthentication
+from .cache import lookup_dashboard_stats, store_dashboard_stats
+from .events import KEEPALIVE_FRAME, broadcaster
+from .routers import read_from_replica, reads_use_replica
+from .views import (
+    INVALID_REPORT_TYPE, report_dates, report_options, report_queries, report_payload,
+    report_freshness, precomputed_report, dashboard_queries, dashboard_payload
+)
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, encoder=JSONEncoder)
+
+
+def _run_query(query):
+    def run():
+        try:
+            return query()
+        finally:
+            # Worker threads see no request_finished signal, so tidy up here
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False)()
+
+
+async def run_concurrently(queries):
+    """Evaluate {name: callable} queries concurrently, returning {name: result}"""
+    results = await asyncio.gather(*(_run_query(query) for query in queries.values()))
+    return dict(zip(queries, results))
+
+
+async def _authenticate(request):
+    """Return an error response, or None once request.user is set from the JWT"""
+    try:
+        result = await sync_to_async(CachedJWTAuthentication().authenticate)(request)
+    except exceptions.AuthenticationFailed as exc:
+        return _json({'detail': exc.detail}, status=exc.status_code)
+    if result is None:
+        return _json(
+            {'detail': exceptions.NotAuthenticated.default_detail}, status=401
+        )
+    request.user = result[0]
+    return None
+
+
+async def async_reports_view(request):
+    """
+    Async API endpoint for reports.
+    GET /api/async/reports/ takes the same parameters and returns the same
+    payload as /api/reports/, running the summary's queries concurrently.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    error = await _authenticate(request)
+    if error:
+        return error
+
+    report_type = request.GET.get('type', 'daily')
+    try:
+        start_date, end_date = report_dates(request.GET)
+        options = report_options(request.GET) if report_type == 'timeseries' else None
+    except exceptions.ValidationError as exc:
+        return _json(exc.detail, status=400)
+
+    queries = report_queries(report_type, start_date, end_date, **(options or {}))
+    if queries is None:
+        return _json({'error': INVALID_REPORT_TYPE}, status=400)
+
+    use_replica = await sync_to_async(reads_use_replica)(request.user)
+    # Worker threads inherit the routing choice through the copied context
+    with read_from_replica(use_replica):
+        payload = await sync_to_async(precomputed_report)(report_type, start_date, end_date)
+        if payload is None:
+            computed_at = timezone.now()
+            results = await run_concurrently(queries)
+            payload = {
+                **report_payload(report_type, start_date, end_date, results, options),
+                **report_freshness(computed_at, False),
+            }
+    return _json(payload)
+
+
+async def async_dashboard_view(request):
+    """
+    Async API endpoint for dashboard statistics.
+    GET /api/async/dashboard/ returns the same payload as /api/dashboard/,
+    from the same cache, computing a miss with concurrent queries.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    error = await _authenticate(request)
+    if error:
+        return error
+
+    today = timezone.localdate()
+    use_replica = await sync_to_async(reads_use_replica)(request.user)
+    key, stats = await sync_to_async(lookup_dashboard_stats)(today, use_replica)
+    if stats is None:
+        with read_from_replica(use_replica):
+            stats = dashboard_payload(today, await run_concurrently(dashboard_queries(today)))
+        timeout = settings.REPLICA_PIN_SECONDS if use_replica else None
+        await sync_to_async(store_dashboard_stats)(key, stats, timeout)
+    return _json(stats)
+
+
+async def live_events_view(request):
+    """
+    Async API endpoint for live updates, as server-sent events.
+    GET /api/events/ streams 'sales' events (dashboard deltas and units sold
+    per tea) and 'stock' events (a tea's stock after an edit or restock).
+    A 'reset' event means updates were missed: refetch over the REST API.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    error = await _authenticate(request)
+    if error:
+        return error
+
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_event_id = None
+
+    async def stream():
+        subscription = broadcaster.subscribe(last_event_id)
+        loop = asyncio.get_running_loop()
+        # Django 4.2 never tells a streaming view that its client has gone,
+        # so each stream ends after EVENTS_STREAM_SECONDS and EventSource
+        # reconnects with Last-Event-ID, missing nothing
+        closes_at = loop.time() + settings.EVENTS_STREAM_SECONDS
+        try:
+            # Reconnect after 3s
+            yield b'retry: 3000\n\n'
+            while True:
+                remaining = closes_at - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    yield await asyncio.wait_for(
+                        subscription.queue.get(),
+                        timeout=min(remaining, settings.EVENTS_KEEPALIVE_SECONDS),
+                    )
+                except asyncio.TimeoutError:
+                    # Keeps proxies from timing out an idle stream
+                    yield KEEPALIVE_FRAME
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,95 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class _UserCache:
+    """Small thread-safe LRU of users with a time-to-live per entry"""
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._users = OrderedDict()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires < time.monotonic():
+                del self._users[user_id]
+                return None
+            self._users.move_to_end(user_id)
+            return user
+
+    def set(self, user_id, user, ttl):
+        with self._lock:
+            self._users[user_id] = (user, time.monotonic() + ttl)
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_size:
+                self._users.popitem(last=False)
+
+    def forget(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+user_cache = _UserCache()
+
+
+def forget_user(user_id):
+    """Drop a cached user in this process; other processes expire it within the TTL"""
+    user_cache.forget(str(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that keeps recently seen users (with their profile) in
+    memory for AUTH_USER_CACHE_TTL seconds, so polled endpoints skip the
+    user query. Deactivating or editing a user evicts them in this process
+    at once and in every other process within the TTL. A TTL of 0 turns
+    the cache off.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = str(validated_token[jwt_settings.USER_ID_CLAIM])
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        ttl = settings.AUTH_USER_CACHE_TTL
+        user = user_cache.get(user_id) if ttl else None
+        # A username claim that disagrees means the id now belongs to someone else
+        if user is None or validated_token.get('username', user.username) != user.username:
+            try:
+                user = self.user_model.objects.select_related('profile').get(
+                    **{jwt_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            if ttl:
+                user_cache.set(user_id, user, ttl)
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if jwt_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            jwt_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(
+                _("The user's password has been changed."), code='password_changed'
+            )
+        # Each request gets its own copy, so per-request attributes never leak
+        return copy.copy(user)
@@ -0,0 +1,190 @@
+"""
+Endpoint benchmarks with SQL query and latency budgets.
+
+Every sync route in inventory/urls.py has at least one case. The
+bench_endpoints command times them against seeded data and writes a JSON
+report; the test suite runs the same cases to hold the query budgets. The
+async routes query from worker threads, which cannot see the rolled-back
+seed data, so bench_async_views measures those against committed data;
+the live event stream is long-lived and has no budget.
+"""
+import math
+import statistics
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import Tea, UserProfile, DailySalesRollup
+from .synthetic import SalesGenerator, catalogue_teas, load_sales
+
+BENCH_USERNAME = 'bench-admin'
+BENCH_PASSWORD = 'bench-password'
+
+
+@dataclass
+class EndpointCase:
+    name: str
+    method: str
+    path: str
+    max_queries: int
+    p95_ms: float
+    data: dict = None
+    status: int = 200
+    authenticated: bool = True
+
+
+def seed_benchmark_data(sales=0, days=90, seed=42):
+    """
+    Create the benchmark user and a well-stocked tea, plus ``sales`` synthetic
+    sales spread over the catalogue. Returns the objects the cases need.
+    """
+    user, created = User.objects.get_or_create(
+        username=BENCH_USERNAME, defaults={'is_staff': True, 'is_superuser': True}
+    )
+    if created:
+        user.set_password(BENCH_PASSWORD)
+        user.save()
+    UserProfile.objects.get_or_create(user=user, defaults={'role': 'admin'})
+
+    # Enough stock that repeated POSTs never run out mid-benchmark
+    tea, _ = Tea.objects.update_or_create(
+        name='Benchmark Blend',
+        defaults={'category': 'Black', 'price': '450.00', 'stock_quantity': 10_000_000},
+    )
+
+    if sales:
+        cashier_ids = list(User.objects.values_list('pk', flat=True))
+        generator = SalesGenerator(catalogue_teas(), cashier_ids, days=days, seed=seed)
+        load_sales(generator.rows(sales))
+        DailySalesRollup.objects.rebuild(generator.first_day, generator.last_day)
+    return {'user': user, 'tea': tea, 'refresh': str(RefreshToken.for_user(user))}
+
+
+def endpoint_cases(fixture):
+    # Query budgets are counted inside a transaction, so atomic blocks in the
+    # write paths show up as SAVEPOINT/RELEASE pairs
+    tea = fixture['tea']
+    detail = reverse('inventory:tea-detail', args=[tea.pk])
+    teas = reverse('inventory:tea-list')
+    sales = reverse('inventory:sale-list-create')
+    reports = reverse('inventory:reports')
+    sale = {'tea': tea.pk, 'quantity': 1}
+    # Replays after the first find every key already recorded
+    replay = {'sales': [
+        {**sale, 'idempotency_key': f'bench-replay-{number}'} for number in range(2)
+    ]}
+    since = urlencode({'since': timezone.now().isoformat()})
+    return [
+        EndpointCase('teas_list', 'get', teas, max_queries=4, p95_ms=150),
+        EndpointCase('teas_list_cursor', 'get', f'{teas}?pagination=cursor',
+                     max_queries=3, p95_ms=150),
+        EndpointCase('teas_search', 'get', f'{teas}?search=ceylon', max_queries=4, p95_ms=200),
+        EndpointCase('teas_sync', 'get', f'{teas}?{since}', max_queries=3, p95_ms=150),
+        EndpointCase('tea_detail', 'get', detail, max_queries=3, p95_ms=100),
+        EndpointCase('tea_update', 'patch', detail, data={'stock_quantity': 10_000_000},
+                     max_queries=3, p95_ms=150),
+        EndpointCase('sales_list', 'get', sales, max_queries=3, p95_ms=250),
+        EndpointCase('sales_list_cursor', 'get', f'{sales}?pagination=cursor',
+                     max_queries=2, p95_ms=150),
+        EndpointCase('sales_create', 'post', sales, data=sale, status=201,
+                     max_queries=7, p95_ms=200),
+        EndpointCase('sales_checkout', 'post', reverse('inventory:sale-checkout'),
+                     data={'items': [sale, sale]}, status=201, max_queries=7, p95_ms=200),
+        EndpointCase('sales_replay', 'post', reverse('inventory:sale-replay'), data=replay,
+                     max_queries=8, p95_ms=250),
+        EndpointCase('sales_export', 'get',
+                     f"{reverse('inventory:sale-export')}?output=ndjson&category=White",
+                     max_queries=2, p95_ms=5000),
+        EndpointCase('login', 'post', reverse('inventory:login'),
+                     data={'username': BENCH_USERNAME, 'password': BENCH_PASSWORD},
+                     authenticated=False, max_queries=3, p95_ms=1500),
+        EndpointCase('token_refresh', 'post', reverse('inventory:token-refresh'),
+                     data={'refresh': fixture['refresh']}, authenticated=False,
+                     max_queries=1, p95_ms=50),
+        EndpointCase('reports_daily', 'get', f'{reports}?type=daily', max_queries=2, p95_ms=150),
+        EndpointCase('reports_category', 'get', f'{reports}?type=category',
+                     max_queries=2, p95_ms=150),
+        EndpointCase('reports_summary', 'get', f'{reports}?type=summary',
+                     max_queries=4, p95_ms=200),
+        EndpointCase('reports_timeseries', 'get', f'{reports}?type=timeseries&granularity=week',
+                     max_queries=1, p95_ms=150),
+        EndpointCase('reports_timeseries_hourly', 'get',
+                     f'{reports}?type=timeseries&granularity=hour&group_by=category',
+                     max_queries=1, p95_ms=250),
+        EndpointCase('reports_heatmap', 'get', f'{reports}?type=heatmap', max_queries=1, p95_ms=250),
+        EndpointCase('reports_top_selling', 'get', reverse('inventory:reports-top-selling'),
+                     max_queries=2, p95_ms=150),
+        EndpointCase('low_stock_alerts', 'get', reverse('inventory:low-stock-alerts'),
+                     max_queries=1, p95_ms=100),
+        EndpointCase('dashboard', 'get', reverse('inventory:dashboard'), max_queries=3, p95_ms=150),
+        EndpointCase('dashboard_cache', 'get', reverse('inventory:dashboard-cache'),
+                     max_queries=1, p95_ms=50),
+        EndpointCase('metrics', 'get', reverse('inventory:metrics'),
+                     status=200 if settings.METRICS_ENABLED else 404, max_queries=1, p95_ms=50),
+    ]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def run_case(client, case, repeat):
+    timings, queries, failures = [], [], []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = getattr(client, case.method)(
+                case.path, case.data, format='json'
+            )
+            if response.streaming:
+                b''.join(response.streaming_content)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured))
+        if response.status_code != case.status:
+            failures.append(f'status {response.status_code}, expected {case.status}')
+            break
+
+    result = {
+        'method': case.method.upper(),
+        'path': case.path,
+        'requests': len(timings),
+        'queries': max(queries),
+        'query_budget': case.max_queries,
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'p99_ms': round(percentile(timings, 99), 2),
+        'p95_budget_ms': case.p95_ms,
+    }
+    if result['queries'] > case.max_queries:
+        failures.append(f"{result['queries']} queries, budget {case.max_queries}")
+    result['failures'] = failures
+    return result
+
+
+def run_benchmarks(client, fixture, repeat=20, check_latency=True, latency_factor=1.0):
+    """Run every case, returning {name: result}; results with failures did not pass"""
+    token = str(RefreshToken.for_user(fixture['user']).access_token)
+    results = {}
+    for case in endpoint_cases(fixture):
+        if case.authenticated:
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        else:
+            client.credentials()
+        result = run_case(client, case, repeat)
+        budget = case.p95_ms * latency_factor
+        if check_latency and result['p95_ms'] > budget:
+            result['failures'].append(f"p95 {result['p95_ms']}ms, budget {budget:g}ms")
+        result['passed'] = not result['failures']
+        results[case.name] = result
+    client.credentials()
+    return results
@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.core.cache import cache
+
+DASHBOARD_GENERATION_KEY = 'dashboard:generation'
+DASHBOARD_HITS_KEY = 'dashboard:hits'
+DASHBOARD_MISSES_KEY = 'dashboard:misses'
+
+
+def _incr(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # First use, or the counter was evicted
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key)
+
+
+def _dashboard_key(today, replica):
+    generation = cache.get_or_set(DASHBOARD_GENERATION_KEY, 1, timeout=None)
+    source = 'replica' if replica else 'primary'
+    return f'dashboard:stats:{generation}:{source}:{today.isoformat()}'
+
+
+def cached_dashboard_stats(today, compute, timeout=None, replica=False):
+    """
+    Return the dashboard payload for ``today`` from the cache, calling
+    ``compute(today)`` only on a miss. Entries are keyed by a generation
+    number, so invalidation never races with a slow recompute, and by
+    whether ``replica`` reads computed them, so a user pinned to the primary
+    never gets figures from a lagging replica. ``timeout`` defaults to
+    DASHBOARD_CACHE_TIMEOUT.
+    """
+    key, stats = lookup_dashboard_stats(today, replica)
+    if stats is None:
+        stats = compute(today)
+        store_dashboard_stats(key, stats, timeout)
+    return stats
+
+
+def lookup_dashboard_stats(today, replica=False):
+    """
+    The two halves of cached_dashboard_stats, for callers (like async
+    views) that compute the payload themselves. Returns (key, stats or None).
+    """
+    key = _dashboard_key(today, replica)
+    stats = cache.get(key)
+    _incr(DASHBOARD_MISSES_KEY if stats is None else DASHBOARD_HITS_KEY)
+    return key, stats
+
+
+def store_dashboard_stats(key, stats, timeout=None):
+    cache.set(key, stats, timeout=timeout or settings.DASHBOARD_CACHE_TIMEOUT)
+
+
+def invalidate_dashboard():
+    """Drop every cached dashboard payload; called after sales and tea changes"""
+    _incr(DASHBOARD_GENERATION_KEY)
+
+
+def dashboard_cache_stats():
+    counters = cache.get_many([DASHBOARD_HITS_KEY, DASHBOARD_MISSES_KEY])
+    hits = counters.get(DASHBOARD_HITS_KEY, 0)
+    misses = counters.get(DASHBOARD_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+    }
@@ -0,0 +1,41 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalGetMixin:
+    """
+    Answers GETs carrying If-None-Match / If-Modified-Since with a bare 304
+    before any serialization happens. Views supply cheap validators through
+    get_validators(), which returns (version, last_modified) or (None, None).
+    """
+
+    def get_validators(self):
+        raise NotImplementedError('Views using ConditionalGetMixin must define get_validators()')
+
+    def get(self, request, *args, **kwargs):
+        version, last_modified = self.get_validators()
+        if version is None:
+            return super().get(request, *args, **kwargs)
+
+        # The query string picks the filter and page, so it is part of the tag
+        digest = hashlib.md5(
+            f'{version}|{request.get_full_path()}'.encode(), usedforsecurity=False
+        ).hexdigest()
+        etag = quote_etag(digest)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            response.headers['ETag'] = etag
+            if timestamp is not None:
+                response.headers['Last-Modified'] = http_date(timestamp)
+
+        # Clients may keep the copy but must revalidate it on every use
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization'])
+        return response
@@ -0,0 +1,133 @@
+"""
+In-process fan-out of live updates for the /api/events/ stream.
+
+Writes publish an event once, after their transaction commits; the frame is
+encoded a single time and handed to every subscriber's queue, so any number
+of open streams costs no database queries. Only writes made in this process
+are seen, so run the stream in the same ASGI process that records sales.
+"""
+import asyncio
+import itertools
+import json
+import threading
+from collections import defaultdict, deque
+
+from rest_framework.utils.encoders import JSONEncoder
+
+# Tells a client it missed events and should refetch over the REST API
+RESET_FRAME = b'event: reset\ndata: {}\n\n'
+KEEPALIVE_FRAME = b': keep-alive\n\n'
+
+
+def format_event(event_id, event, data):
+    payload = json.dumps(data, cls=JSONEncoder, separators=(',', ':'))
+    return f'id: {event_id}\nevent: {event}\ndata: {payload}\n\n'.encode()
+
+
+class Subscription:
+    """One stream's queue of pending frames, fed on its own event loop"""
+
+    def __init__(self, loop, max_pending):
+        self.loop = loop
+        self.queue = asyncio.Queue(max_pending)
+
+    def deliver(self, frame):
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # A client this far behind refetches instead of catching up
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESET_FRAME)
+
+
+class Broadcaster:
+    """Thread-safe publisher with a short history for reconnecting clients"""
+
+    def __init__(self, history=256, max_pending=300):
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+        self._history = deque(maxlen=history)
+        self._ids = itertools.count(1)
+        self._last_id = 0
+
+    def publish(self, event, data):
+        """Send an event to every subscriber; safe to call from any thread"""
+        with self._lock:
+            self._last_id = next(self._ids)
+            frame = format_event(self._last_id, event, data)
+            self._history.append((self._last_id, frame))
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, frame)
+            except RuntimeError:
+                # Its event loop has closed
+                self.unsubscribe(subscription)
+        return self._last_id
+
+    def subscribe(self, last_event_id=None):
+        """
+        Start receiving events on the running loop. A client reconnecting
+        with the last id it saw gets the events it missed, or a reset when
+        they are no longer in the history (or this process has restarted).
+        """
+        subscription = Subscription(asyncio.get_running_loop(), self.max_pending)
+        with self._lock:
+            if last_event_id is not None:
+                oldest = self._history[0][0] if self._history else self._last_id + 1
+                if oldest - 1 <= last_event_id <= self._last_id:
+                    for event_id, frame in self._history:
+                        if event_id > last_event_id:
+                            subscription.deliver(frame)
+                else:
+                    subscription.deliver(RESET_FRAME)
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+
+broadcaster = Broadcaster()
+
+
+def publish_sales(rows, stock=True):
+    """
+    Publish a 'sales' event from (day, tea_id, revenue, quantity, count)
+    rows: dashboard deltas per local day and, with ``stock``, the units
+    each tea just sold.
+    """
+    days = defaultdict(lambda: [0, 0, 0])
+    sold = defaultdict(int)
+    for day, tea_id, revenue, quantity, count in rows:
+        days[day][0] += count
+        days[day][1] += revenue
+        days[day][2] += quantity
+        sold[tea_id] += quantity
+    broadcaster.publish('sales', {
+        'dashboard': [
+            {'day': day, 'sales_count': count, 'revenue': revenue, 'quantity_sold': quantity}
+            for day, (count, revenue, quantity) in days.items()
+        ],
+        'stock': [
+            {'tea_id': tea_id, 'sold': quantity} for tea_id, quantity in sold.items()
+        ] if stock else [],
+    })
+
+
+def publish_tea(tea):
+    """Publish a 'stock' event with a tea's current stock after it was saved"""
+    broadcaster.publish('stock', {
+        'tea_id': tea.pk,
+        'stock_quantity': tea.stock_quantity,
+        'reorder_level': tea.reorder_level,
+        'is_low_stock': tea.is_low_stock,
+    })
@@ -0,0 +1,103 @@
+import asyncio
+import statistics
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from inventory.cache import invalidate_dashboard
+from inventory.views import report_queries, dashboard_queries
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the sync and async reports/dashboard endpoints end to end '
+        'against the time of each of their queries on their own'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=10,
+            help='Timed runs per measurement; the median is reported',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='Length of the summary report range, ending today',
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(is_active=True).first()
+        if user is None:
+            raise CommandError('Run populate_data --sales N first so there is data to report on.')
+        # The async views read on worker-thread connections, which only see
+        # committed rows, so this runs against the existing data as it is
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+        self.repeat = options['repeat']
+
+        today = timezone.localdate()
+        end_date = today
+        start_date = end_date - timedelta(days=options['days'])
+        dates = f'start_date={start_date.isoformat()}&end_date={end_date.isoformat()}'
+        # Query builders are called per run so no queryset result cache is reused
+        cases = [
+            (
+                'summary report',
+                lambda: report_queries('summary', start_date, end_date),
+                f"{reverse('inventory:reports')}?type=summary&{dates}",
+                f"{reverse('inventory:async-reports')}?type=summary&{dates}",
+            ),
+            (
+                'dashboard (cold)',
+                lambda: dashboard_queries(today),
+                reverse('inventory:dashboard'),
+                reverse('inventory:async-dashboard'),
+            ),
+        ]
+
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for label, queries, sync_url, async_url in cases:
+                query_ms = {
+                    name: self._time(lambda: queries()[name]()) for name in queries()
+                }
+                sync_ms = self._time(lambda: Client().get(sync_url, headers=headers))
+                # One event loop for every run, as under a real ASGI server
+                async_ms = asyncio.run(self._time_async(async_url, headers))
+
+                self.stdout.write(label)
+                for name, ms in query_ms.items():
+                    self.stdout.write(f'  query {name:<18} {ms:>9.2f} ms')
+                self.stdout.write(f'  sum of queries           {sum(query_ms.values()):>9.2f} ms')
+                self.stdout.write(f'  slowest query            {max(query_ms.values()):>9.2f} ms')
+                self.stdout.write(f'  sync view                {sync_ms:>9.2f} ms')
+                self.stdout.write(f'  async view               {async_ms:>9.2f} ms')
+
+    def _time(self, run):
+        timings = []
+        for _ in range(self.repeat):
+            # Keep the dashboard cache out of the measurement
+            invalidate_dashboard()
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    async def _time_async(self, url, headers):
+        client = AsyncClient()
+        timings = []
+        for _ in range(self.repeat):
+            await sync_to_async(invalidate_dashboard)()
+            started = time.perf_counter()
+            await client.get(url, headers=headers)
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
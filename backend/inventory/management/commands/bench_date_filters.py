@@ -0,0 +1,151 @@
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+from inventory.cache import invalidate_dashboard
+from inventory.models import DailySalesRollup, Tea, Sale
+from inventory.synthetic import SalesGenerator, catalogue_teas, load_sales
+from inventory.utils import local_day_range, start_of_day
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the old per-row DATE(sold_at) filters with half-open '
+        'datetime ranges on a large synthetic sales table'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sales',
+            type=int,
+            default=2_000_000,
+            help='Synthetic sales to insert before benchmarking (0 to use existing data)',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=730,
+            help='Spread the synthetic sales over this many past days',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Timed runs per query; the median is reported',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the synthetic sales, with their rollups, instead of rolling them back',
+        )
+        parser.add_argument(
+            '--explain',
+            action='store_true',
+            help='Print the query plan of every benchmarked query',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            generator = None
+            if options['sales']:
+                generator = self._seed(options['sales'], options['days'])
+            self._benchmark(options['repeat'], options['explain'])
+            if not options['keep']:
+                transaction.set_rollback(True)
+            elif generator is not None:
+                # The kept sales skipped Sale.save(), so roll them up like
+                # populate_data does and drop the stale dashboard figures
+                written = DailySalesRollup.objects.rebuild(generator.first_day, generator.last_day)
+                transaction.on_commit(invalidate_dashboard)
+                self.stdout.write(f'Kept the synthetic sales ({written} rollup rows rebuilt)')
+
+    def _seed(self, count, days, batch_size=10_000):
+        cashier_ids = list(User.objects.values_list('pk', flat=True))
+        try:
+            generator = SalesGenerator(catalogue_teas(), cashier_ids, days=days, seed=42)
+        except ValueError:
+            raise CommandError('Run populate_data first so there are teas and users.')
+
+        self.stdout.write(f'Inserting {count} synthetic sales over {days} days...')
+        started = time.perf_counter()
+        load_sales(generator.rows(count), batch_size=batch_size)
+        self.stdout.write(f'  done in {time.perf_counter() - started:.1f}s')
+
+        # Fresh statistics so the planner knows how big the table is
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Sale._meta.db_table}')
+        return generator
+
+    def _cases(self):
+        today = timezone.localdate()
+        week_ago = today - timedelta(days=7)
+        month_start = today.replace(day=1)
+        week_start, week_end = local_day_range(week_ago, today)
+        today_start, tomorrow_start = local_day_range(today)
+        totals = {
+            'total': Sum('total_amount'),
+            'quantity': Sum('quantity'),
+            'sales': Count('id'),
+        }
+        tea_id = Tea.objects.values_list('pk', flat=True).first()
+
+        return [
+            (
+                'today',
+                Sale.objects.filter(sold_at__date=today),
+                Sale.objects.filter(sold_at__gte=today_start, sold_at__lt=tomorrow_start),
+                totals,
+            ),
+            (
+                'this month',
+                Sale.objects.filter(sold_at__date__gte=month_start),
+                Sale.objects.filter(sold_at__gte=start_of_day(month_start)),
+                totals,
+            ),
+            (
+                'last 7 days',
+                Sale.objects.filter(sold_at__date__range=[week_ago, today]),
+                Sale.objects.filter(sold_at__gte=week_start, sold_at__lt=week_end),
+                totals,
+            ),
+            (
+                'one tea, last 7 days',
+                Sale.objects.filter(tea_id=tea_id, sold_at__date__range=[week_ago, today]),
+                Sale.objects.filter(
+                    tea_id=tea_id, sold_at__gte=week_start, sold_at__lt=week_end
+                ),
+                totals,
+            ),
+        ]
+
+    def _time(self, queryset, aggregates, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = queryset.aggregate(**aggregates)
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), result
+
+    def _benchmark(self, repeat, explain):
+        self.stdout.write(f'Sales rows: {Sale.objects.count()}')
+        self.stdout.write(
+            f'{"query":<22} {"DATE(sold_at) ms":>18} {"range ms":>10} {"speed-up":>9}'
+        )
+        for label, before, after, aggregates in self._cases():
+            before_ms, before_result = self._time(before, aggregates, repeat)
+            after_ms, after_result = self._time(after, aggregates, repeat)
+            if before_result != after_result:
+                raise CommandError(f'{label}: results differ {before_result} != {after_result}')
+            speed_up = before_ms / after_ms if after_ms else Decimal('Infinity')
+            self.stdout.write(
+                f'{label:<22} {before_ms:>18.2f} {after_ms:>10.2f} {speed_up:>8.1f}x'
+            )
+            if explain:
+                self.stdout.write(f'  before: {before.explain()}')
+                self.stdout.write(f'  after:  {after.explain()}')
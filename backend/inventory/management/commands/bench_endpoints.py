@@ -0,0 +1,89 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from inventory.benchmarks import run_benchmarks, seed_benchmark_data
+from inventory.cache import invalidate_dashboard
+from inventory.models import Sale
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every inventory endpoint on seeded data, recording latency '
+        'percentiles and SQL query counts against their budgets'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sales',
+            type=int,
+            default=100_000,
+            help='Synthetic sales to seed before benchmarking (0 to use existing data)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Requests per endpoint',
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the JSON results to this file (defaults to stdout)',
+        )
+        parser.add_argument(
+            '--latency-factor',
+            type=float,
+            default=1.0,
+            help='Scale every p95 budget, e.g. 2 on a slow machine',
+        )
+        parser.add_argument(
+            '--no-latency-check',
+            action='store_true',
+            help='Only enforce query budgets',
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+
+        # Seed data and every write made by the benchmark is rolled back
+        with transaction.atomic(), override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']
+        ):
+            if options['sales']:
+                self.stderr.write(f"Seeding {options['sales']} synthetic sales...")
+            fixture = seed_benchmark_data(sales=options['sales'])
+            sales_rows = Sale.objects.count()
+            results = run_benchmarks(
+                APIClient(),
+                fixture,
+                repeat=options['repeat'],
+                check_latency=not options['no_latency_check'],
+                latency_factor=options['latency_factor'],
+            )
+            transaction.set_rollback(True)
+        # Cached dashboard figures were computed from the rolled-back data
+        invalidate_dashboard()
+
+        report = {
+            'database': connection.vendor,
+            'sales_rows': sales_rows,
+            'repeat': options['repeat'],
+            'endpoints': results,
+        }
+        content = json.dumps(report, indent=2, sort_keys=True) + '\n'
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                handle.write(content)
+        else:
+            self.stdout.write(content, ending='')
+
+        failed = {name: result for name, result in results.items() if not result['passed']}
+        for name, result in sorted(failed.items()):
+            self.stderr.write(f"{name}: {'; '.join(result['failures'])}")
+        if failed:
+            raise CommandError(f'{len(failed)} of {len(results)} endpoints over budget')
+        self.stderr.write(self.style.SUCCESS(f'All {len(results)} endpoints within budget'))
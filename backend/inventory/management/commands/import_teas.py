@@ -0,0 +1,145 @@
+import csv
+import json
+import time
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from inventory.cache import invalidate_dashboard
+from inventory.events import publish_tea
+from inventory.models import DailySalesRollup, Tea
+
+CATEGORIES = {value for value, _ in Tea.CATEGORY_CHOICES}
+
+
+class Command(BaseCommand):
+    help = 'Bulk insert or update teas from a supplier CSV or JSON price list'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSON file of teas')
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'json'],
+            help='File format. Defaults to the file extension.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows compared and upserted per transaction',
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f'File not found: {path}')
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in ('csv', 'json'):
+            raise CommandError('Unknown file format. Use --format csv or --format json.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        self.counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+        started = time.perf_counter()
+        with path.open(newline='', encoding='utf-8') as handle:
+            rows = csv.DictReader(handle) if file_format == 'csv' else json.load(handle)
+            batch = []
+            for line, raw in enumerate(rows, start=2 if file_format == 'csv' else 1):
+                row = self._clean(raw, line)
+                if row is None:
+                    continue
+                batch.append(row)
+                if len(batch) >= options['batch_size']:
+                    self._import_batch(batch)
+                    batch = []
+            if batch:
+                self._import_batch(batch)
+        elapsed = time.perf_counter() - started
+
+        total = sum(self.counts.values())
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                'Imported {total} rows in {elapsed:.2f}s ({rate:.0f} rows/s): '
+                '{inserted} inserted, {updated} updated, {unchanged} unchanged, '
+                '{skipped} skipped'.format(
+                    total=total, elapsed=elapsed, rate=rate, **self.counts
+                )
+            )
+        )
+
+    def _clean(self, raw, line):
+        """Validate one input row, returning None (and warning) if it is unusable"""
+        try:
+            name = (raw.get('name') or '').strip()
+            category = (raw.get('category') or '').strip()
+            if not name:
+                raise ValueError('missing name')
+            if category not in CATEGORIES:
+                raise ValueError(f'unknown category "{category}"')
+            price = Decimal(str(raw.get('price'))).quantize(Decimal('0.01'))
+            if price < 0:
+                raise ValueError('negative price')
+            row = {'name': name, 'category': category, 'price': price}
+
+            if 'description' in raw:
+                row['description'] = (raw['description'] or '').strip() or None
+            if raw.get('stock_quantity') not in (None, ''):
+                row['stock_quantity'] = int(raw['stock_quantity'])
+                if row['stock_quantity'] < 0:
+                    raise ValueError('negative stock_quantity')
+        except (AttributeError, InvalidOperation, TypeError, ValueError) as exc:
+            self.stderr.write(f'Skipping row {line}: {exc}')
+            self.counts['skipped'] += 1
+            return None
+        return row
+
+    def _import_batch(self, rows):
+        # Later rows win when a name repeats within the batch
+        rows = list({row['name']: row for row in rows}.values())
+        with transaction.atomic():
+            existing = {
+                tea.name: tea
+                for tea in Tea.objects.filter(name__in=[row['name'] for row in rows])
+            }
+
+            # Rows are grouped by the columns they carry, so a row without a
+            # stock_quantity never overwrites stock with a stale value
+            changed = defaultdict(list)
+            recategorised = []
+            for row in rows:
+                tea = existing.get(row['name'])
+                if tea is not None:
+                    if all(getattr(tea, field) == value for field, value in row.items()):
+                        self.counts['unchanged'] += 1
+                        continue
+                    self.counts['updated'] += 1
+                    if tea.category != row['category']:
+                        recategorised.append(tea.pk)
+                else:
+                    self.counts['inserted'] += 1
+                changed[frozenset(row)].append(Tea(**row))
+
+            for fields, teas in changed.items():
+                # One INSERT ... ON CONFLICT (name) DO UPDATE per group
+                Tea.objects.bulk_create(
+                    teas,
+                    update_conflicts=True,
+                    unique_fields=['name'],
+                    update_fields=sorted(fields - {'name'}) + ['updated_at'],
+                )
+            if recategorised:
+                DailySalesRollup.objects.recategorise(recategorised)
+            if changed:
+                # bulk_create skips model signals, so refresh the dashboard and
+                # tell live streams about the teas here
+                names = [tea.name for teas in changed.values() for tea in teas]
+                transaction.on_commit(invalidate_dashboard)
+                transaction.on_commit(lambda: self._publish(names))
+
+    def _publish(self, names):
+        # Refetched, as bulk_create leaves upserted teas without their pk
+        for tea in Tea.objects.filter(name__in=names):
+            publish_tea(tea)
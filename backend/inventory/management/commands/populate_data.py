@@ -1,6 +1,10 @@
-from django.core.management.base import BaseCommand
+import time
+
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.models import User
-from inventory.models import Tea, UserProfile
+from inventory.cache import invalidate_dashboard
+from inventory.models import Tea, UserProfile, DailySalesRollup
+from inventory.synthetic import SalesGenerator, catalogue_teas, load_sales
 from decimal import Decimal
 
 
@@ -13,6 +17,53 @@ class Command(BaseCommand):
             action='store_true',
             help='Clear existing data before populating',
         )
+        parser.add_argument(
+            '--sales',
+            type=int,
+            default=0,
+            help='Also generate this many synthetic sales (e.g. 2000000)',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='Spread the synthetic sales over this many past days',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed; the same seed generates the same sales',
+        )
+        parser.add_argument(
+            '--category-mix',
+            help='Share of sales per category, e.g. Black=50,Green=20,Herbal=30. '
+                 'Defaults to every tea being equally likely.',
+        )
+        parser.add_argument(
+            '--cashiers',
+            type=int,
+            default=0,
+            help='Create this many synthetic cashiers to ring up the sales '
+                 '(defaults to the existing users)',
+        )
+        parser.add_argument(
+            '--cashier-skew',
+            type=float,
+            default=1.0,
+            help='0 shares sales evenly between cashiers; higher favours a busy few',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10_000,
+            help='Synthetic sales inserted per bulk_create batch',
+        )
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='Load synthetic sales with PostgreSQL COPY instead of bulk_create',
+        )
 
     def handle(self, *args, **options):
         if options['clear']:
@@ -184,10 +235,83 @@ class Command(BaseCommand):
             self.style.SUCCESS(f'Successfully created {users_created} users')
         )
         
+        if options['sales']:
+            self._generate_sales(options)
+
         self.stdout.write(
             self.style.SUCCESS('Database population completed!')
         )
         self.stdout.write('You can now login with:')
         self.stdout.write('  Admin: admin/admin123')
         self.stdout.write('  Manager: manager/manager123')
-        self.stdout.write('  Cashier: cashier/cashier123') 
\ No newline at end of file
+        self.stdout.write('  Cashier: cashier/cashier123') 
+
+    def _parse_mix(self, value):
+        if not value:
+            return None
+        mix = {}
+        for part in value.split(','):
+            category, _, weight = part.partition('=')
+            try:
+                mix[category.strip()] = float(weight)
+            except ValueError:
+                raise CommandError(f'Invalid --category-mix entry "{part}". Use Category=weight.')
+        return mix
+
+    def _synthetic_cashiers(self, count):
+        usernames = [f'cashier{number:02d}' for number in range(1, count + 1)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        new_users = []
+        for username in usernames:
+            if username not in existing:
+                user = User(username=username, first_name='Synthetic', last_name='Cashier')
+                user.set_unusable_password()
+                new_users.append(user)
+        User.objects.bulk_create(new_users)
+        users = User.objects.filter(username__in=usernames).order_by('username')
+        UserProfile.objects.bulk_create(
+            [UserProfile(user=user, role='cashier') for user in users],
+            ignore_conflicts=True,
+        )
+        if new_users:
+            self.stdout.write(f'Created {len(new_users)} synthetic cashiers')
+        return list(users.values_list('pk', flat=True))
+
+    def _generate_sales(self, options):
+        if options['days'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--days and --batch-size must be at least 1')
+        if options['cashiers']:
+            cashier_ids = self._synthetic_cashiers(options['cashiers'])
+        else:
+            cashier_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+        try:
+            generator = SalesGenerator(
+                catalogue_teas(),
+                cashier_ids,
+                days=options['days'],
+                seed=options['seed'],
+                category_mix=self._parse_mix(options['category_mix']),
+                cashier_skew=options['cashier_skew'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(
+            f"Generating {options['sales']} synthetic sales over {options['days']} days..."
+        )
+        started = time.perf_counter()
+        loaded = load_sales(
+            generator.rows(options['sales']),
+            batch_size=options['batch_size'],
+            copy=options['copy'],
+        )
+        elapsed = time.perf_counter() - started
+        rate = loaded / elapsed if elapsed else 0
+        self.stdout.write(f'  loaded {loaded} sales in {elapsed:.1f}s ({rate:.0f} rows/s)')
+
+        # Synthetic history skips Sale.save(), so rebuild its rollups in one pass
+        written = DailySalesRollup.objects.rebuild(generator.first_day, generator.last_day)
+        invalidate_dashboard()
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully generated {loaded} sales ({written} rollup rows)')
+        )
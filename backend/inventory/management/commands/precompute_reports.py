@@ -0,0 +1,62 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+from inventory.models import PrecomputedReport
+from inventory.views import PRECOMPUTED_REPORTS, compute_report, standard_report_windows
+
+
+class Command(BaseCommand):
+    help = (
+        'Precompute the standard report windows (last 30 days, today, this '
+        'month) so /api/reports/ can serve them without recomputing'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep running and refresh every N seconds (default: run once, e.g. from cron)',
+        )
+
+    def handle(self, *args, **options):
+        if options['interval'] < 0:
+            raise CommandError('--interval must not be negative')
+        while True:
+            self._precompute()
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def _precompute(self):
+        started = time.perf_counter()
+        today = timezone.localdate()
+        # Stamped before computing, so the reported age never understates staleness
+        computed_at = timezone.now()
+        written = 0
+        with transaction.atomic():
+            for start_date, end_date in standard_report_windows(today):
+                for report_type in PRECOMPUTED_REPORTS:
+                    payload = compute_report(report_type, start_date, end_date)
+                    PrecomputedReport.objects.update_or_create(
+                        report_type=report_type,
+                        start_date=start_date,
+                        end_date=end_date,
+                        defaults={
+                            # Stored exactly as the API renders it
+                            'payload': json.loads(json.dumps(payload, cls=JSONEncoder)),
+                            'computed_at': computed_at,
+                        },
+                    )
+                    written += 1
+            # Windows that ended before today can no longer be requested as standard
+            PrecomputedReport.objects.filter(end_date__lt=today).delete()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(f'Precomputed {written} reports in {elapsed:.2f}s')
+        )
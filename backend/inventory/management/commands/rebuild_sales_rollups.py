@@ -0,0 +1,47 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from inventory.models import DailySalesRollup
+
+
+class Command(BaseCommand):
+    help = 'Backfill or rebuild the daily sales rollup table from raw sales'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start-date',
+            help='First local day to rebuild (YYYY-MM-DD). Defaults to the first sale.',
+        )
+        parser.add_argument(
+            '--end-date',
+            help='Last local day to rebuild (YYYY-MM-DD). Defaults to the last sale.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rollup rows inserted per batch',
+        )
+
+    def _parse_date(self, value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Invalid date "{value}". Use YYYY-MM-DD.')
+
+    def handle(self, *args, **options):
+        start_date = self._parse_date(options['start_date'])
+        end_date = self._parse_date(options['end_date'])
+
+        self.stdout.write('Rebuilding daily sales rollups...')
+        written = DailySalesRollup.objects.rebuild(
+            start_date=start_date,
+            end_date=end_date,
+            batch_size=options['batch_size'],
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully wrote {written} rollup rows')
+        )
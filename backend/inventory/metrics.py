@@ -0,0 +1,113 @@
+"""
+In-process request metrics rendered in the Prometheus text format.
+
+Each worker process keeps its own counters, so scrape every worker (or
+sum the series by instance) when running several.
+"""
+import bisect
+import threading
+from collections import defaultdict
+
+# Upper bounds in seconds, as in the Prometheus client defaults
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _EndpointStats:
+    __slots__ = ('statuses', 'buckets', 'latency_sum', 'count', 'queries', 'query_seconds')
+
+    def __init__(self):
+        self.statuses = defaultdict(int)
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.count = 0
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+class MetricsRegistry:
+    """Request counters and latency histograms keyed by (view name, method)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def observe(self, view, method, status, seconds, queries, query_seconds):
+        bucket = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            stats = self._endpoints.get((view, method))
+            if stats is None:
+                stats = self._endpoints[(view, method)] = _EndpointStats()
+            stats.statuses[status] += 1
+            stats.buckets[bucket] += 1
+            stats.latency_sum += seconds
+            stats.count += 1
+            stats.queries += queries
+            stats.query_seconds += query_seconds
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+
+    def render(self, extra=()):
+        """
+        Prometheus exposition text. ``extra`` is an iterable of
+        (name, type, help, value) for one-off gauges and counters.
+        """
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            snapshot = [
+                (key, dict(stats.statuses), list(stats.buckets), stats.latency_sum,
+                 stats.count, stats.queries, stats.query_seconds)
+                for key, stats in endpoints
+            ]
+
+        lines = []
+
+        def header(name, kind, text):
+            lines.append(f'# HELP {name} {text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        header('inventory_http_requests_total', 'counter', 'Requests handled, by view, method and status.')
+        for (view, method), statuses, *_ in snapshot:
+            for status, count in sorted(statuses.items()):
+                lines.append(
+                    f'inventory_http_requests_total{_labels(view=view, method=method, status=status)} {count}'
+                )
+
+        name = 'inventory_http_request_duration_seconds'
+        header(name, 'histogram', 'Time spent handling requests, by view and method.')
+        for (view, method), _, buckets, latency_sum, count, *_ in snapshot:
+            cumulative = 0
+            for bound, observed in zip(LATENCY_BUCKETS + ('+Inf',), buckets):
+                cumulative += observed
+                lines.append(f'{name}_bucket{_labels(view=view, method=method, le=bound)} {cumulative}')
+            lines.append(f'{name}_sum{_labels(view=view, method=method)} {latency_sum:.6f}')
+            lines.append(f'{name}_count{_labels(view=view, method=method)} {count}')
+
+        header('inventory_db_queries_total', 'counter', 'SQL queries executed, by view and method.')
+        for (view, method), *_, queries, _ in snapshot:
+            lines.append(f'inventory_db_queries_total{_labels(view=view, method=method)} {queries}')
+
+        header('inventory_db_query_duration_seconds_total', 'counter',
+               'Time spent in SQL queries, by view and method.')
+        for (view, method), *_, query_seconds in snapshot:
+            lines.append(
+                f'inventory_db_query_duration_seconds_total{_labels(view=view, method=method)} '
+                f'{query_seconds:.6f}'
+            )
+
+        for name, kind, text, value in extra:
+            header(name, kind, text)
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(**labels):
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,148 @@
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .metrics import registry
+from .routers import pin_to_primary, replica_configured
+
+KNOWN_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+# The timer for the request being handled. Context variables follow the
+# request into sync_to_async worker threads, including the
+# thread_sensitive=False ones the async report views run their queries in.
+_request_timer = ContextVar('request_timer', default=None)
+
+
+class _QueryTimer:
+    """Counts queries and the time spent running them, from any thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.seconds = 0.0
+
+    def add(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+
+
+def _time_query(execute, sql, params, many, context):
+    """Execute wrapper that charges queries to the current request's timer"""
+    timer = _request_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.add(time.perf_counter() - started)
+
+
+def _install_timer(connection, **kwargs):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+def _install_timers(**kwargs):
+    for connection in connections.all(initialized_only=True):
+        _install_timer(connection)
+
+
+class RequestMetricsMiddleware:
+    """
+    Records request count, latency and SQL usage per URL name and method.
+    Enabled with METRICS_ENABLED; rows streamed after the view returns
+    (e.g. sales exports) are not included in the SQL figures.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # Connections are per thread: wrap each one as it is opened, in any
+        # thread, and those the thread handling a request already has open
+        connection_created.connect(_install_timer, dispatch_uid='inventory.request_metrics')
+        request_started.connect(_install_timers, dispatch_uid='inventory.request_metrics')
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timer = _QueryTimer()
+        token = _request_timer.set(timer)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_timer.reset(token)
+        self.observe(request, response, time.perf_counter() - started, timer)
+        return response
+
+    async def __acall__(self, request):
+        timer = _QueryTimer()
+        token = _request_timer.set(timer)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_timer.reset(token)
+        self.observe(request, response, time.perf_counter() - started, timer)
+        return response
+
+    def observe(self, request, response, elapsed, timer):
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        # Keep label values bounded whatever clients send
+        method = request.method if request.method in KNOWN_METHODS else 'OTHER'
+        registry.observe(
+            view, method, response.status_code, elapsed, timer.count, timer.seconds
+        )
+
+
+class ReplicaPinMiddleware:
+    """
+    After a successful write request, pins the user to the primary database
+    so their next reads see what they just wrote. Unused without a replica.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self.pin(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+            await sync_to_async(self.pin)(request, response)
+        return response
+
+    def pin(self, request, response):
+        # DRF copies the authenticated user back onto the Django request
+        user = getattr(request, 'user', None)
+        if (request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400
+                and user is not None and user.is_authenticated):
+            pin_to_primary(user)
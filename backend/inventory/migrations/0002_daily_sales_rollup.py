@@ -0,0 +1,67 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:57
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def backfill_rollups(apps, schema_editor):
+    Sale = apps.get_model('inventory', 'Sale')
+    DailySalesRollup = apps.get_model('inventory', 'DailySalesRollup')
+    db_alias = schema_editor.connection.alias
+
+    totals = Sale.objects.using(db_alias).order_by().annotate(
+        day=TruncDate('sold_at')
+    ).values('day', 'tea_id', 'tea__category').annotate(
+        total_revenue=Sum('total_amount'),
+        total_quantity=Sum('quantity'),
+        total_count=Count('id'),
+    )
+    DailySalesRollup.objects.using(db_alias).bulk_create(
+        (
+            DailySalesRollup(
+                day=row['day'],
+                tea_id=row['tea_id'],
+                category=row['tea__category'],
+                revenue=row['total_revenue'],
+                quantity=row['total_quantity'],
+                sale_count=row['total_count'],
+            )
+            for row in totals.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('category', models.CharField(choices=[('Black', 'Black Tea'), ('Green', 'Green Tea'), ('White', 'White Tea'), ('Oolong', 'Oolong Tea'), ('Herbal', 'Herbal Tea'), ('Flavored', 'Flavored Tea')], max_length=20)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('sale_count', models.PositiveIntegerField(default=0)),
+                ('tea', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='inventory.tea')),
+            ],
+            options={
+                'verbose_name': 'Daily sales rollup',
+                'verbose_name_plural': 'Daily sales rollups',
+                'ordering': ['day'],
+                'indexes': [models.Index(fields=['day', 'category'], name='rollup_day_category_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailysalesrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'tea', 'category'), name='unique_daily_rollup'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
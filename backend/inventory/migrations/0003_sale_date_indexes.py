@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_daily_sales_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['sold_at'], name='sale_sold_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['tea', 'sold_at'], name='sale_tea_sold_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['sold_by', 'sold_at'], name='sale_sold_by_sold_at_idx'),
+        ),
+    ]
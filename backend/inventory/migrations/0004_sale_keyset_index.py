@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 00:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_sale_date_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['-sold_at', 'id'], name='sale_sold_at_id_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='sale',
+            name='sale_sold_at_idx',
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# Keep in step with inventory.search.TEA_DOCUMENT_SQL
+CREATE_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS tea_search_document_idx ON inventory_tea "
+    "USING gin ((to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, ''))))",
+    "CREATE INDEX IF NOT EXISTS tea_name_trgm_idx ON inventory_tea "
+    "USING gin (name gin_trgm_ops)",
+]
+
+DROP_SQL = [
+    "DROP INDEX IF EXISTS tea_name_trgm_idx",
+    "DROP INDEX IF EXISTS tea_search_document_idx",
+]
+
+
+def run_on_postgresql(statements):
+    def operation(apps, schema_editor):
+        # Other backends use the unindexed fallback in inventory.search
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_sale_keyset_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_postgresql(CREATE_SQL), run_on_postgresql(DROP_SQL)),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 00:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_tea_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrecomputedReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_type', models.CharField(max_length=20)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('payload', models.JSONField()),
+                ('computed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='precomputedreport',
+            constraint=models.UniqueConstraint(fields=('report_type', 'start_date', 'end_date'), name='unique_precomputed_report'),
+        ),
+    ]
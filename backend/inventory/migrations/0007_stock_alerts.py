@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 00:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_precomputed_report'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock_quantity', models.PositiveIntegerField()),
+                ('reorder_level', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='tea',
+            name='reorder_level',
+            field=models.PositiveIntegerField(default=10, help_text='Stock below this level raises a low-stock alert'),
+        ),
+        migrations.AddIndex(
+            model_name='tea',
+            index=models.Index(condition=models.Q(('stock_quantity__lt', models.F('reorder_level'))), fields=['stock_quantity'], name='tea_low_stock_idx'),
+        ),
+        migrations.AddField(
+            model_name='stockalert',
+            name='tea',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='inventory.tea'),
+        ),
+    ]
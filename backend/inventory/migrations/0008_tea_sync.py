@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-18 00:34
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_stock_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeaTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tea_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='tea',
+            index=models.Index(fields=['updated_at'], name='tea_updated_at_idx'),
+        ),
+    ]
@@ -1,7 +1,102 @@
-from django.db import models
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import TruncDate
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.utils import timezone
 
+from .cache import invalidate_dashboard
+from .events import publish_sales
+from .utils import start_of_day
+
+
+class InsufficientStock(Exception):
+    """Raised when a sale asks for more stock than a tea has left"""
+
+    def __init__(self, tea_id, requested, available):
+        self.tea_id = tea_id
+        self.requested = requested
+        self.available = available
+        super().__init__(
+            f"Insufficient stock. Available: {available}, Requested: {requested}"
+        )
+
+
+class TeaQuerySet(models.QuerySet):
+
+    def take_stock(self, tea_id, quantity):
+        """
+        Decrement a tea's stock in one conditional UPDATE.
+        Returns False (and changes nothing) when there is not enough stock,
+        so concurrent tills can never oversell or lose each other's updates.
+        """
+        updated = self.filter(pk=tea_id, stock_quantity__gte=quantity).update(
+            stock_quantity=F('stock_quantity') - quantity,
+            updated_at=timezone.now(),
+        )
+        if updated:
+            self.record_low_stock({tea_id: quantity})
+            transaction.on_commit(invalidate_dashboard, using=self.db)
+        return updated == 1
+    
+    def take_stock_many(self, quantities):
+        """
+        Decrement several teas at once, {tea_id: quantity}, in one set-based
+        UPDATE. Only teas with enough stock are touched, so a False return
+        means the caller's transaction must be rolled back.
+        """
+        enough = Q()
+        for tea_id, quantity in quantities.items():
+            enough |= Q(pk=tea_id, stock_quantity__gte=quantity)
+        
+        updated = self.filter(enough).update(
+            stock_quantity=Case(
+                *[
+                    When(pk=tea_id, then=F('stock_quantity') - quantity)
+                    for tea_id, quantity in quantities.items()
+                ],
+                output_field=models.PositiveIntegerField(),
+            ),
+            updated_at=timezone.now(),
+        )
+        if updated == len(quantities):
+            self.record_low_stock(quantities)
+        if updated:
+            transaction.on_commit(invalidate_dashboard, using=self.db)
+        return updated == len(quantities)
+    
+    def low_stock(self):
+        """Teas below their reorder level, served by the tea_low_stock_idx partial index"""
+        return self.filter(stock_quantity__lt=F('reorder_level'))
+    
+    def record_low_stock(self, quantities):
+        """
+        After stock was taken, {tea_id: quantity}, record a StockAlert for
+        each tea that has just dropped below its reorder level, with a single
+        INSERT ... SELECT. Runs in the caller's transaction, so the alerts
+        commit or roll back with the sale.
+        """
+        crossed = Q()
+        for tea_id, quantity in quantities.items():
+            crossed |= Q(pk=tea_id, stock_quantity__gte=F('reorder_level') - quantity)
+        teas = self.low_stock().filter(crossed).annotate(
+            alerted_at=Value(timezone.now(), output_field=models.DateTimeField())
+        ).values_list('pk', 'stock_quantity', 'reorder_level', 'alerted_at').order_by()
+        
+        connection = connections[self.db]
+        table = connection.ops.quote_name(StockAlert._meta.db_table)
+        select, params = teas.query.get_compiler(using=self.db).as_sql()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (tea_id, stock_quantity, reorder_level, created_at) "
+                f"{select}",
+                params,
+            )
+
 
 class Tea(models.Model):
     """Tea model with name, category, and price"""
@@ -20,20 +115,144 @@ class Tea(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     description = models.TextField(blank=True, null=True)
     stock_quantity = models.PositiveIntegerField(default=0)
+    reorder_level = models.PositiveIntegerField(
+        default=10, help_text='Stock below this level raises a low-stock alert'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TeaQuerySet.as_manager()
+    
     class Meta:
         ordering = ['name']
         verbose_name = 'Tea'
         verbose_name_plural = 'Teas'
+        indexes = [
+            # Only the few teas running low are in it, so low-stock lookups stay cheap
+            models.Index(
+                fields=['stock_quantity'], name='tea_low_stock_idx',
+                condition=Q(stock_quantity__lt=F('reorder_level')),
+            ),
+            # Delta sync reads the teas changed since a client's watermark
+            models.Index(fields=['updated_at'], name='tea_updated_at_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.category})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        tea = super().from_db(db, field_names, values)
+        # Remembered so save() can tell when the tea changes category
+        tea._saved_category = tea.__dict__.get('category')
+        return tea
+    
+    def save(self, *args, **kwargs):
+        saved_category = getattr(self, '_saved_category', None)
+        if saved_category is None or saved_category == self.category:
+            super().save(*args, **kwargs)
+        else:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                DailySalesRollup.objects.recategorise([self.pk])
+        self._saved_category = self.category
+    
     @property
     def is_in_stock(self):
         return self.stock_quantity > 0
+    
+    @property
+    def is_low_stock(self):
+        return self.stock_quantity < self.reorder_level
+
+
+class TeaTombstone(models.Model):
+    """Records a deleted tea so delta-syncing clients can drop it too"""
+    
+    tea_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    def __str__(self):
+        return f"#{self.tea_id} deleted {self.deleted_at}"
+
+
+class StockAlert(models.Model):
+    """A tea's stock dropping below its reorder level, recorded by the sale that did it"""
+    
+    tea = models.ForeignKey(Tea, on_delete=models.CASCADE, related_name='stock_alerts')
+    stock_quantity = models.PositiveIntegerField()
+    reorder_level = models.PositiveIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        # The alerts feed reads forward by id
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"{self.tea_id}: {self.stock_quantity} < {self.reorder_level}"
+
+
+class SaleQuerySet(models.QuerySet):
+    
+    def delete(self):
+        """Delete the sales, taking them out of the daily rollup in bulk first"""
+        with transaction.atomic(using=self.db):
+            DailySalesRollup.objects.using(self.db).remove_sales(self)
+            return super().delete()
+    
+    def bulk_record(self, sales):
+        """
+        Record a basket of unsaved sales all or nothing: one UPDATE takes the
+        stock for every tea and one INSERT writes the rows.
+        """
+        quantities = defaultdict(int)
+        for sale in sales:
+            if not sale.unit_price:
+                sale.unit_price = sale.tea.price
+            if not sale.total_amount:
+                sale.total_amount = sale.quantity * sale.unit_price
+            quantities[sale.tea_id] += sale.quantity
+        
+        with transaction.atomic():
+            if Tea.objects.take_stock_many(quantities):
+                sales = self.bulk_create(sales)
+                DailySalesRollup.objects.add_sales(sales)
+                return sales
+            transaction.set_rollback(True)
+        
+        # Work out which tea was short once the partial UPDATE is undone
+        available = dict(
+            Tea.objects.filter(pk__in=quantities).values_list('pk', 'stock_quantity')
+        )
+        for tea_id, quantity in quantities.items():
+            if available.get(tea_id, 0) < quantity:
+                raise InsufficientStock(tea_id, quantity, available.get(tea_id, 0))
+        # Stock came back between the UPDATE and the re-read; report the first line
+        tea_id, quantity = next(iter(quantities.items()))
+        raise InsufficientStock(tea_id, quantity, available.get(tea_id, 0))
+    
+    def record_each(self, sales):
+        """
+        Record independent unsaved sales, such as a till's offline backlog.
+        The whole lot goes through one bulk_record when it can; if any sale
+        is short of stock or already recorded, they are saved one at a time
+        instead so that sale alone fails. Returns, in order, each saved sale
+        or the InsufficientStock / IntegrityError that stopped it.
+        """
+        try:
+            return self.bulk_record(sales)
+        except (InsufficientStock, IntegrityError):
+            pass
+        
+        results = []
+        for sale in sales:
+            try:
+                sale.save()
+            except (InsufficientStock, IntegrityError) as exc:
+                results.append(exc)
+            else:
+                results.append(sale)
+        return results
 
 
 class Sale(models.Model):
@@ -47,31 +266,302 @@ class Sale(models.Model):
     sold_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sales')
     customer_name = models.CharField(max_length=100, blank=True, null=True)
     notes = models.TextField(blank=True, null=True)
+    # Generated by the till, so a retried or replayed sale is only recorded once
+    idempotency_key = models.CharField(max_length=64, blank=True, null=True)
+    
+    objects = SaleQuerySet.as_manager()
     
     class Meta:
         ordering = ['-sold_at']
         verbose_name = 'Sale'
         verbose_name_plural = 'Sales'
+        indexes = [
+            # Serves date ranges and the (-sold_at, id) keyset pagination order
+            models.Index(fields=['-sold_at', 'id'], name='sale_sold_at_id_idx'),
+            models.Index(fields=['tea', 'sold_at'], name='sale_tea_sold_at_idx'),
+            models.Index(fields=['sold_by', 'sold_at'], name='sale_sold_by_sold_at_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['sold_by', 'idempotency_key'],
+                condition=Q(idempotency_key__isnull=False),
+                name='unique_sale_idempotency_key',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.quantity}x {self.tea.name} - {self.total_amount}"
     
+    def clean(self):
+        # Lets the admin show a form error instead of failing in save()
+        if self._state.adding and self.tea_id and self.quantity:
+            if self.tea.stock_quantity < self.quantity:
+                raise ValidationError({
+                    'quantity': f"Insufficient stock. Available: {self.tea.stock_quantity}"
+                })
+    
     def save(self, *args, **kwargs):
-        # Calculate total amount if not provided
-        if not self.total_amount:
-            self.total_amount = self.quantity * self.unit_price
-        
         # Set unit_price from tea price if not provided
         if not self.unit_price:
             self.unit_price = self.tea.price
             self.total_amount = self.quantity * self.unit_price
-            
-        super().save(*args, **kwargs)
         
-        # Update stock quantity
-        if self.pk:  # Only update stock for existing sales
-            self.tea.stock_quantity = max(0, self.tea.stock_quantity - self.quantity)
-            self.tea.save()
+        # Calculate total amount if not provided
+        if not self.total_amount:
+            self.total_amount = self.quantity * self.unit_price
+        
+        if not self._state.adding:
+            super().save(*args, **kwargs)
+            return
+        
+        # New sales take their stock in the same transaction as the insert
+        with transaction.atomic():
+            if not Tea.objects.take_stock(self.tea_id, self.quantity):
+                available = Tea.objects.filter(pk=self.tea_id).values_list(
+                    'stock_quantity', flat=True
+                ).first()
+                raise InsufficientStock(self.tea_id, self.quantity, available or 0)
+            super().save(*args, **kwargs)
+            DailySalesRollup.objects.add_sales([self])
+    
+    def delete(self, *args, **kwargs):
+        # Cascades from a User go through the pre_delete receiver instead, and
+        # a Tea's rollup rows are deleted along with it
+        with transaction.atomic():
+            deleted = super().delete(*args, **kwargs)
+            DailySalesRollup.objects.remove_sale(self)
+        return deleted
+
+
+class DailySalesRollupQuerySet(models.QuerySet):
+    
+    def add_sales(self, sales):
+        """
+        Fold newly recorded sales into their (day, tea, category) rows with a
+        single INSERT ... ON CONFLICT DO UPDATE, so concurrent tills add to
+        the same row instead of overwriting each other.
+        """
+        totals = defaultdict(lambda: [Decimal('0'), 0, 0])
+        for sale in sales:
+            key = (timezone.localdate(sale.sold_at), sale.tea_id, sale.tea.category)
+            totals[key][0] += sale.total_amount
+            totals[key][1] += sale.quantity
+            totals[key][2] += 1
+        if not totals:
+            return
+        
+        connection = connections[self.db]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        rows = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(totals))
+        params = []
+        for (day, tea_id, category), (revenue, quantity, count) in totals.items():
+            params += [day, tea_id, category, revenue, quantity, count]
+        
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} "
+                f"(day, tea_id, category, revenue, quantity, sale_count) "
+                f"VALUES {rows} "
+                f"ON CONFLICT (day, tea_id, category) DO UPDATE SET "
+                f"revenue = {table}.revenue + EXCLUDED.revenue, "
+                f"quantity = {table}.quantity + EXCLUDED.quantity, "
+                f"sale_count = {table}.sale_count + EXCLUDED.sale_count",
+                params,
+            )
+        rows = [
+            (day, tea_id, revenue, quantity, count)
+            for (day, tea_id, category), (revenue, quantity, count) in totals.items()
+        ]
+        transaction.on_commit(lambda: publish_sales(rows), using=self.db)
+    
+    def rebuild(self, start_date=None, end_date=None, batch_size=1000):
+        """
+        Recompute rollup rows from the raw Sale table, optionally only for
+        local days between start_date and end_date (inclusive).
+        Returns the number of rollup rows written.
+        """
+        sales = Sale.objects.order_by()
+        rollups = self.all()
+        if start_date:
+            sales = sales.filter(sold_at__gte=start_of_day(start_date))
+            rollups = rollups.filter(day__gte=start_date)
+        if end_date:
+            sales = sales.filter(sold_at__lt=start_of_day(end_date + timedelta(days=1)))
+            rollups = rollups.filter(day__lte=end_date)
+        
+        totals = sales.annotate(day=TruncDate('sold_at')).values(
+            'day', 'tea_id', 'tea__category'
+        ).annotate(
+            total_revenue=Sum('total_amount'),
+            total_quantity=Sum('quantity'),
+            total_count=Count('id'),
+        )
+        
+        written = 0
+        with transaction.atomic(using=self.db):
+            rollups.delete()
+            batch = []
+            for row in totals.iterator(chunk_size=batch_size):
+                batch.append(self.model(
+                    day=row['day'],
+                    tea_id=row['tea_id'],
+                    category=row['tea__category'],
+                    revenue=row['total_revenue'],
+                    quantity=row['total_quantity'],
+                    sale_count=row['total_count'],
+                ))
+                if len(batch) >= batch_size:
+                    self.bulk_create(batch)
+                    written += len(batch)
+                    batch = []
+            self.bulk_create(batch)
+            written += len(batch)
+        return written
+    
+    def top_sellers(self, start_date, end_date, limit=10):
+        """
+        The best-selling teas by quantity over local days start_date to
+        end_date, read from the rollup alone so any window costs about the
+        same however many sales it covers.
+        """
+        return self.filter(day__range=[start_date, end_date]).values(
+            'tea_id', 'tea__name', 'tea__category'
+        ).annotate(
+            total_sold=Sum('quantity'),
+            total_revenue=Sum('revenue')
+        ).filter(total_sold__gt=0).order_by('-total_sold', 'tea_id')[:limit]
+    
+    def recategorise(self, tea_ids):
+        """
+        Move the rollup rows of teas whose category changed under their
+        current category, so the category report and later removals find them
+        """
+        self.filter(tea_id__in=tea_ids).update(category=Subquery(
+            Tea.objects.filter(pk=OuterRef('tea_id')).values('category')[:1]
+        ))
+        transaction.on_commit(invalidate_dashboard, using=self.db)
+    
+    def remove_sale(self, sale):
+        """Take a deleted sale back out of its rollup row"""
+        # A tea's rows always carry its current category, so (day, tea) is enough
+        row = self.filter(day=timezone.localdate(sale.sold_at), tea_id=sale.tea_id)
+        row.update(
+            revenue=F('revenue') - sale.total_amount,
+            quantity=F('quantity') - sale.quantity,
+            sale_count=F('sale_count') - 1,
+        )
+        # Reports count rollup rows, so one with no sales left must go
+        row.filter(sale_count=0).delete()
+        transaction.on_commit(invalidate_dashboard, using=self.db)
+        # Deleting a sale does not put its stock back
+        row = (
+            timezone.localdate(sale.sold_at), sale.tea_id,
+            -sale.total_amount, -sale.quantity, -1,
+        )
+        transaction.on_commit(lambda: publish_sales([row], stock=False), using=self.db)
+    
+    def remove_sales(self, sales, batch_size=500):
+        """
+        Take a queryset of sales that is about to be deleted out of the
+        rollup: one grouped read, then one CASE UPDATE per batch_size rows,
+        however many sales there are.
+        """
+        totals = list(sales.order_by().annotate(day=TruncDate('sold_at')).values(
+            'day', 'tea_id'
+        ).annotate(
+            total_revenue=Sum('total_amount'),
+            total_quantity=Sum('quantity'),
+            total_count=Count('id'),
+        ))
+        if not totals:
+            return
+        
+        for start in range(0, len(totals), batch_size):
+            batch = totals[start:start + batch_size]
+            rows, revenue, quantity, count = Q(), [], [], []
+            for row in batch:
+                key = Q(day=row['day'], tea_id=row['tea_id'])
+                rows |= key
+                revenue.append(When(key, then=F('revenue') - row['total_revenue']))
+                quantity.append(When(key, then=F('quantity') - row['total_quantity']))
+                count.append(When(key, then=F('sale_count') - row['total_count']))
+            self.filter(rows).update(
+                revenue=Case(*revenue, output_field=models.DecimalField()),
+                quantity=Case(*quantity, output_field=models.PositiveIntegerField()),
+                sale_count=Case(*count, output_field=models.PositiveIntegerField()),
+            )
+            self.filter(rows, sale_count=0).delete()
+        
+        transaction.on_commit(invalidate_dashboard, using=self.db)
+        rows = [
+            (row['day'], row['tea_id'], -row['total_revenue'],
+             -row['total_quantity'], -row['total_count'])
+            for row in totals
+        ]
+        transaction.on_commit(lambda: publish_sales(rows, stock=False), using=self.db)
+
+
+class DailySalesRollup(models.Model):
+    """Sales totals per day, tea and category, kept in step with every sale"""
+    
+    day = models.DateField()
+    tea = models.ForeignKey(Tea, on_delete=models.CASCADE, related_name='daily_rollups')
+    category = models.CharField(max_length=20, choices=Tea.CATEGORY_CHOICES)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    quantity = models.PositiveIntegerField(default=0)
+    sale_count = models.PositiveIntegerField(default=0)
+    
+    objects = DailySalesRollupQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['day']
+        verbose_name = 'Daily sales rollup'
+        verbose_name_plural = 'Daily sales rollups'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'tea', 'category'], name='unique_daily_rollup'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['day', 'category'], name='rollup_day_category_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} {self.category} #{self.tea_id}: {self.quantity}"
+
+
+class PrecomputedReportQuerySet(models.QuerySet):
+    def fresh(self, report_type, start_date, end_date, max_age):
+        """The stored report for exactly this window, unless it is older than max_age"""
+        return self.filter(
+            report_type=report_type,
+            start_date=start_date,
+            end_date=end_date,
+            computed_at__gte=timezone.now() - max_age,
+        ).first()
+
+
+class PrecomputedReport(models.Model):
+    """A report payload computed ahead of time for a commonly requested window"""
+    
+    report_type = models.CharField(max_length=20)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    payload = models.JSONField()
+    computed_at = models.DateTimeField()
+    
+    objects = PrecomputedReportQuerySet.as_manager()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['report_type', 'start_date', 'end_date'],
+                name='unique_precomputed_report',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.report_type} {self.start_date}..{self.end_date}"
 
 
 class UserProfile(models.Model):
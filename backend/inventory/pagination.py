@@ -0,0 +1,179 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a fixed ordering that ends in a unique
+    column. Pages are fetched with a WHERE on the last row seen instead of an
+    OFFSET, and no COUNT(*) is run, so every page costs the same at any depth
+    and rows arriving mid-scroll never shift between pages.
+    """
+    page_size = api_settings.PAGE_SIZE
+    ordering = ('id',)
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.descending = [name.startswith('-') for name in self.ordering]
+        self._values_select = queryset.query.values_select
+
+        direction, position = self.decode_cursor(request, queryset)
+        reverse = direction == 'p'
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [
+                name[1:] if name.startswith('-') else f'-{name}' for name in ordering
+            ]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._beyond(position, reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_position = self.previous_position = None
+        if rows:
+            if has_more or reverse:
+                self.next_position = self._position(rows[-1])
+            if position is not None and (has_more or not reverse):
+                self.previous_position = self._position(rows[0])
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor('n', self.next_position)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor('p', self.previous_position)
+
+    def _beyond(self, position, reverse):
+        """WHERE clause for rows strictly after ``position`` in page order"""
+        # (a, b) after (x, y) is: a beyond x, or a = x and b beyond y
+        condition = Q()
+        for i, (field, descending) in enumerate(zip(self.fields, self.descending)):
+            lookup = 'lt' if descending != reverse else 'gt'
+            step = Q(**{f'{field}__{lookup}': position[i]})
+            for earlier, value in zip(self.fields[:i], position[:i]):
+                step &= Q(**{earlier: value})
+            condition = condition | step if condition else step
+        if len(self.fields) > 1:
+            # The OR is no index condition on PostgreSQL; a redundant bound on
+            # the leading column lets the scan start at the cursor
+            lookup = 'lte' if self.descending[0] != reverse else 'gte'
+            condition &= Q(**{f'{self.fields[0]}__{lookup}': position[0]})
+        return condition
+
+    def _position(self, row):
+        if isinstance(row, dict):
+            return [row[field] for field in self.fields]
+        if isinstance(row, tuple):
+            return [row[self._values_select.index(field)] for field in self.fields]
+        return [getattr(row, field) for field in self.fields]
+
+    def encode_cursor(self, direction, position):
+        values = [
+            value.isoformat() if isinstance(value, (date, datetime))
+            else str(value) if isinstance(value, Decimal)
+            else value
+            for value in position
+        ]
+        payload = json.dumps({'d': direction, 'v': values}, separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, queryset):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return 'n', None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+            direction, values = payload['d'], payload['v']
+            if direction not in ('n', 'p') or len(values) != len(self.fields):
+                raise ValueError
+            position = [
+                _output_field(queryset, field).to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except (TypeError, ValueError, KeyError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return direction, position
+
+
+def _output_field(queryset, name):
+    """The model field, or annotation (e.g. a search rank), called ``name``"""
+    annotation = queryset.query.annotations.get(name)
+    if annotation is not None:
+        return annotation.output_field
+    return queryset.model._meta.get_field(name)
+
+
+class SaleKeysetPagination(KeysetPagination):
+    ordering = ('-sold_at', 'id')
+
+
+class TeaKeysetPagination(KeysetPagination):
+    ordering = ('name', 'id')
+
+
+class TeaSearchKeysetPagination(KeysetPagination):
+    """Search results stay in relevance order, on the rank search_teas annotates"""
+    ordering = ('-rank', 'id')
+
+
+class KeysetPaginationMixin:
+    """
+    Lets a list view opt in to keyset pagination with ?pagination=cursor,
+    keeping the default page-number pagination otherwise.
+    """
+    keyset_pagination_class = KeysetPagination
+
+    def get_keyset_pagination_class(self):
+        return self.keyset_pagination_class
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.request.query_params.get('pagination') == 'cursor':
+                self._paginator = self.get_keyset_pagination_class()()
+            else:
+                return super().paginator
+        return self._paginator
@@ -0,0 +1,98 @@
+"""
+Read-replica routing for reporting and listing traffic.
+
+Reads go to the primary unless a view opts in with read_from_replica(),
+ReplicaReadMixin or @replica_reads, and writes always go to the primary.
+A user who has just written something (e.g. recorded a sale) is pinned
+to the primary for REPLICA_PIN_SECONDS so they read their own writes
+while the replica catches up. Without a 'replica' database configured
+everything stays on the primary.
+"""
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_DB_ALIAS = 'replica'
+
+_read_database = contextvars.ContextVar('read_database', default=None)
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def _pin_key(user_id):
+    return f'db:primary-pin:{user_id}'
+
+
+def pin_to_primary(user):
+    """Send this user's replica-eligible reads to the primary for a while"""
+    cache.set(_pin_key(user.pk), True, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+def reads_use_replica(user=None):
+    """Whether reads for ``user`` may go to the replica right now"""
+    if not replica_configured():
+        return False
+    if user is not None and user.is_authenticated:
+        return not cache.get(_pin_key(user.pk), False)
+    return True
+
+
+def read_alias(user=None):
+    """Database alias for explicit .using() reads, e.g. in streamed responses"""
+    return REPLICA_DB_ALIAS if reads_use_replica(user) else DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def read_from_replica(enabled=True):
+    """Route reads inside the block to the replica (when ``enabled``)"""
+    if not enabled:
+        yield
+        return
+    token = _read_database.set(REPLICA_DB_ALIAS)
+    try:
+        yield
+    finally:
+        _read_database.reset(token)
+
+
+def replica_reads(view):
+    """Decorator for @api_view functions: serve GETs from the replica"""
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        with read_from_replica(reads_use_replica(request.user)):
+            return view(request, *args, **kwargs)
+    return wrapped
+
+
+class ReplicaReadMixin:
+    """Serve a generic view's GETs from the replica"""
+
+    def reads_use_replica(self, request):
+        return reads_use_replica(request.user)
+
+    def get(self, request, *args, **kwargs):
+        with read_from_replica(self.reads_use_replica(request)):
+            return super().get(request, *args, **kwargs)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_database.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Explicit, so objects read from the replica are still saved to the primary
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema through replication
+        return db != REPLICA_DB_ALIAS
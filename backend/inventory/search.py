@@ -0,0 +1,64 @@
+import re
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connections
+from django.db.models import BooleanField, Case, FloatField, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+# Must match the expression indexed in migration 0005 for the GIN index to be used
+TEA_DOCUMENT_SQL = (
+    "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, ''))"
+)
+
+
+def search_teas(queryset, term):
+    """
+    Filter and rank teas for the search box, most relevant first.
+    PostgreSQL uses the full-text and trigram GIN indexes; other databases
+    (SQLite in tests) fall back to a ranked substring match.
+    """
+    words = search_words(term)
+    if not words:
+        return queryset
+    if connections[queryset.db].vendor == 'postgresql':
+        return _postgres_search(queryset, term, words)
+    return _fallback_search(queryset, term)
+
+
+def search_words(term):
+    """The words of a search term; a term without any searches nothing"""
+    return re.findall(r'\w+', term)
+
+
+def _postgres_search(queryset, term, words):
+    # Prefix-match every word so results appear while the user is typing
+    tsquery = ' & '.join(f'{word}:*' for word in words)
+    matches = RawSQL(
+        f"{TEA_DOCUMENT_SQL} @@ to_tsquery('simple', %s)",
+        [tsquery],
+        output_field=BooleanField(),
+    )
+    text_rank = RawSQL(
+        f"ts_rank({TEA_DOCUMENT_SQL}, to_tsquery('simple', %s))",
+        [tsquery],
+        output_field=FloatField(),
+    )
+    return queryset.annotate(
+        rank=text_rank + TrigramWordSimilarity(term, 'name'),
+    ).filter(
+        # The trigram branch is what tolerates typos such as "earl gery"
+        Q(matches) | Q(name__trigram_word_similar=term)
+    ).order_by('-rank', 'name')
+
+
+def _fallback_search(queryset, term):
+    return queryset.filter(
+        Q(name__icontains=term) | Q(description__icontains=term)
+    ).annotate(
+        rank=Case(
+            When(name__istartswith=term, then=Value(2)),
+            When(name__icontains=term, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    ).order_by('-rank', 'name')
@@ -1,19 +1,24 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
-from .models import Tea, Sale, UserProfile
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from .authentication import CachedJWTAuthentication
+from .models import Tea, Sale, StockAlert, UserProfile
 
 
 class TeaSerializer(serializers.ModelSerializer):
     """Serializer for Tea model"""
     
     is_in_stock = serializers.ReadOnlyField()
+    is_low_stock = serializers.ReadOnlyField()
     
     class Meta:
         model = Tea
         fields = [
             'id', 'name', 'category', 'price', 'description', 
-            'stock_quantity', 'is_in_stock', 'created_at', 'updated_at'
+            'stock_quantity', 'reorder_level', 'is_in_stock', 'is_low_stock',
+            'created_at', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at']
 
@@ -54,6 +59,63 @@ class SaleSerializer(serializers.ModelSerializer):
         return data
 
 
+class StockAlertSerializer(serializers.ModelSerializer):
+    """Serializer for StockAlert model"""
+    
+    tea_name = serializers.CharField(source='tea.name', read_only=True)
+    tea_category = serializers.CharField(source='tea.category', read_only=True)
+    
+    class Meta:
+        model = StockAlert
+        fields = [
+            'id', 'tea', 'tea_name', 'tea_category', 'stock_quantity',
+            'reorder_level', 'created_at'
+        ]
+
+
+class SaleRowSerializer(serializers.BaseSerializer):
+    """
+    Read-only fast path for sale listings. Formats values_list() tuples into
+    exactly what SaleSerializer produces, without building model instances.
+    """
+    
+    # (output key, values_list lookup) in SaleSerializer.Meta.fields order
+    columns = (
+        ('id', 'id'),
+        ('tea', 'tea_id'),
+        ('tea_name', 'tea__name'),
+        ('tea_category', 'tea__category'),
+        ('quantity', 'quantity'),
+        ('unit_price', 'unit_price'),
+        ('total_amount', 'total_amount'),
+        ('sold_at', 'sold_at'),
+        ('sold_by', 'sold_by_id'),
+        ('sold_by_username', 'sold_by__username'),
+        ('customer_name', 'customer_name'),
+        ('notes', 'notes'),
+    )
+    
+    formatters = {
+        'unit_price': serializers.DecimalField(max_digits=10, decimal_places=2),
+        'total_amount': serializers.DecimalField(max_digits=10, decimal_places=2),
+        'sold_at': serializers.DateTimeField(),
+    }
+    
+    @classmethod
+    def values(cls, queryset):
+        """Turn a Sale queryset into the tuples this serializer expects"""
+        return queryset.values_list(*(lookup for _, lookup in cls.columns))
+    
+    def to_representation(self, row):
+        data = {}
+        for (key, _), value in zip(self.columns, row):
+            formatter = self.formatters.get(key)
+            if formatter is not None and value is not None:
+                value = formatter.to_representation(value)
+            data[key] = value
+        return data
+
+
 class SaleCreateSerializer(serializers.ModelSerializer):
     """Simplified serializer for creating sales"""
     
@@ -65,6 +127,86 @@ class SaleCreateSerializer(serializers.ModelSerializer):
         if value <= 0:
             raise serializers.ValidationError("Quantity must be greater than 0")
         return value
+    
+    def validate(self, data):
+        """Reject obviously short stock early; the decrement itself is atomic"""
+        tea = data['tea']
+        quantity = data['quantity']
+        
+        if tea.stock_quantity < quantity:
+            raise serializers.ValidationError(
+                f"Insufficient stock. Available: {tea.stock_quantity}, Requested: {quantity}"
+            )
+        
+        return data
+
+
+class CheckoutItemSerializer(serializers.Serializer):
+    """One line of a cart checkout"""
+    
+    tea = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class CheckoutSerializer(serializers.Serializer):
+    """Serializer for recording a whole cart as one all-or-nothing checkout"""
+    
+    items = CheckoutItemSerializer(many=True, allow_empty=False)
+    customer_name = serializers.CharField(
+        max_length=100, required=False, allow_blank=True, allow_null=True
+    )
+    notes = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    
+    def validate(self, data):
+        """Load every tea in one query and check stock for the whole basket"""
+        requested = {}
+        for item in data['items']:
+            requested[item['tea']] = requested.get(item['tea'], 0) + item['quantity']
+        
+        teas = Tea.objects.in_bulk(list(requested))
+        missing = sorted(set(requested) - set(teas))
+        if missing:
+            raise serializers.ValidationError(
+                {'items': f"Unknown tea id(s): {', '.join(map(str, missing))}"}
+            )
+        
+        for tea_id, quantity in requested.items():
+            tea = teas[tea_id]
+            if tea.stock_quantity < quantity:
+                raise serializers.ValidationError(
+                    f"Insufficient stock for {tea.name}. "
+                    f"Available: {tea.stock_quantity}, Requested: {quantity}"
+                )
+        
+        data['teas'] = teas
+        return data
+
+
+class SaleReplayItemSerializer(serializers.Serializer):
+    """One queued offline sale; sold_at is when the till recorded it"""
+    
+    idempotency_key = serializers.CharField(max_length=64)
+    tea = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1)
+    sold_at = serializers.DateTimeField(required=False)
+    customer_name = serializers.CharField(
+        max_length=100, required=False, allow_blank=True, allow_null=True
+    )
+    notes = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    
+    def validate_idempotency_key(self, value):
+        """':' is kept for the per-line keys a checkout stores"""
+        if ':' in value:
+            raise serializers.ValidationError("Idempotency keys must not contain ':'.")
+        return value
+
+
+class SaleReplaySerializer(serializers.Serializer):
+    """A till's backlog of offline sales; each item is validated on its own"""
+    
+    sales = serializers.ListField(
+        child=serializers.DictField(), allow_empty=False, max_length=500
+    )
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
@@ -106,6 +248,37 @@ class LoginSerializer(serializers.Serializer):
         return data
 
 
+class RefreshTokenSerializer(TokenRefreshSerializer):
+    """
+    Swaps a refresh token for a new access token without re-checking the
+    password. Deactivated users are refused, and the role claim is re-read
+    so role changes reach the client at the next refresh.
+    """
+    
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = CachedJWTAuthentication().get_user(refresh)
+        
+        refresh['username'] = user.username
+        if hasattr(user, 'profile'):
+            refresh['role'] = user.profile.role
+        data = {'access': str(refresh.access_token)}
+        
+        if jwt_settings.ROTATE_REFRESH_TOKENS:
+            if jwt_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:
+                    # token_blacklist app not installed
+                    pass
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        
+        return data
+
+
 class SalesReportSerializer(serializers.Serializer):
     """Serializer for sales reports"""
     
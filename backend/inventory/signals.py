@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .authentication import forget_user
+from .cache import invalidate_dashboard
+from .events import publish_tea
+from .models import Tea, Sale, DailySalesRollup, TeaTombstone, UserProfile
+
+
+@receiver(pre_delete, sender=User)
+def remove_users_sales_from_rollup(sender, instance, **kwargs):
+    """
+    A user's sales are fast-deleted by the cascade, so take them out of the
+    rollup in bulk first. Sale itself has no delete receivers, which would
+    make every cascade load and handle its sales one at a time.
+    """
+    DailySalesRollup.objects.remove_sales(Sale.objects.filter(sold_by=instance))
+
+
+@receiver(post_save, sender=Tea)
+@receiver(post_delete, sender=Tea)
+def invalidate_dashboard_on_tea_change(sender, **kwargs):
+    """Stock, price and catalogue size all feed the dashboard's inventory block"""
+    transaction.on_commit(invalidate_dashboard)
+
+
+@receiver(post_save, sender=Tea)
+def publish_saved_tea(sender, instance, **kwargs):
+    """Push edits and restocks to live streams; sales publish their own event"""
+    transaction.on_commit(lambda: publish_tea(instance))
+
+
+@receiver(post_delete, sender=Tea)
+def record_tea_tombstone(sender, instance, **kwargs):
+    """Let delta-syncing clients see the deletion, and forget old ones"""
+    TeaTombstone.objects.create(tea_id=instance.pk)
+    horizon = timezone.now() - timedelta(days=settings.TEA_TOMBSTONE_RETENTION_DAYS)
+    TeaTombstone.objects.filter(deleted_at__lt=horizon).delete()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_changed_user(sender, instance, **kwargs):
+    """Deactivations and permission changes apply to the next request here"""
+    forget_user(instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def forget_changed_profile(sender, instance, **kwargs):
+    forget_user(instance.user_id)
@@ -0,0 +1,150 @@
+"""
+Synthetic sales history for load testing and report benchmarking.
+
+Sales follow a shop-like shape: busier lunchtimes and weekends, a few
+best-selling teas per category, small basket quantities and a handful of
+cashiers doing most of the work. The same seed always produces the same rows.
+"""
+import itertools
+import random
+from datetime import timedelta
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import Tea, Sale
+from .utils import start_of_day
+
+# Relative share of sales per local hour, 00:00 to 23:00
+HOUR_WEIGHTS = [0, 0, 0, 0, 0, 0, 1, 3, 6, 8, 9, 10, 14, 15, 11, 8, 7, 8, 9, 7, 4, 2, 1, 0]
+QUANTITY_WEIGHTS = {1: 50, 2: 25, 3: 12, 4: 8, 5: 5}
+WEEKEND_BOOST = 1.3
+
+SALE_COLUMNS = ('tea_id', 'quantity', 'unit_price', 'total_amount', 'sold_at', 'sold_by_id')
+
+
+def _cumulative(weights):
+    return list(itertools.accumulate(weights))
+
+
+class SalesGenerator:
+    """Yields (tea_id, quantity, unit_price, total_amount, sold_at, sold_by_id) tuples"""
+
+    def __init__(self, teas, cashier_ids, days, seed=None, category_mix=None, cashier_skew=1.0):
+        """
+        teas: iterable of (id, category, price)
+        category_mix: {category: weight}; defaults to each tea being equally likely
+        cashier_skew: 0 spreads sales evenly, higher values favour the first cashiers
+        """
+        self.rng = random.Random(seed)
+        by_category = {}
+        for tea_id, category, price in teas:
+            by_category.setdefault(category, []).append((tea_id, price))
+        if not by_category:
+            raise ValueError('There are no teas to sell.')
+        if not cashier_ids:
+            raise ValueError('There are no cashiers to sell them.')
+
+        category_mix = category_mix or {c: len(t) for c, t in by_category.items()}
+        unknown = set(category_mix) - set(by_category)
+        if unknown:
+            raise ValueError(f"No teas in category: {', '.join(sorted(unknown))}")
+        self.categories = [c for c, weight in category_mix.items() if weight > 0]
+        if not self.categories:
+            raise ValueError('The category mix needs at least one positive weight.')
+        self.category_weights = _cumulative(category_mix[c] for c in self.categories)
+
+        # A few best sellers per category (Zipf-like popularity)
+        self.teas = {c: by_category[c] for c in self.categories}
+        self.tea_weights = {
+            c: _cumulative(1 / rank for rank in range(1, len(teas) + 1))
+            for c, teas in self.teas.items()
+        }
+
+        self.cashiers = list(cashier_ids)
+        self.cashier_weights = _cumulative(
+            1 / rank ** cashier_skew for rank in range(1, len(self.cashiers) + 1)
+        )
+
+        # Today only gets the hours that have already finished, so no sale
+        # lands in the future
+        now = timezone.localtime()
+        today_hours = HOUR_WEIGHTS[:now.hour]
+        today_share = sum(today_hours) / sum(HOUR_WEIGHTS)
+        if days == 1 and not today_share:
+            raise ValueError('No trading hours have finished yet today; generate more days.')
+        self.days = [now.date() - timedelta(days=offset) for offset in range(days)]
+        self.day_starts = [start_of_day(day) for day in self.days]
+        self.day_weights = _cumulative(
+            (WEEKEND_BOOST if day.weekday() >= 5 else 1) * (today_share if offset == 0 else 1)
+            for offset, day in enumerate(self.days)
+        )
+        self.hour_weights = _cumulative(HOUR_WEIGHTS)
+        self.today_hour_weights = _cumulative(today_hours)
+        self.quantities = list(QUANTITY_WEIGHTS)
+        self.quantity_weights = _cumulative(QUANTITY_WEIGHTS.values())
+
+    def rows(self, count):
+        rng = self.rng
+        pick = rng.choices
+        for _ in range(count):
+            category = pick(self.categories, cum_weights=self.category_weights)[0]
+            tea_id, price = pick(self.teas[category], cum_weights=self.tea_weights[category])[0]
+            quantity = pick(self.quantities, cum_weights=self.quantity_weights)[0]
+            day_start = pick(self.day_starts, cum_weights=self.day_weights)[0]
+            if day_start == self.day_starts[0]:
+                hour = pick(range(len(self.today_hour_weights)), cum_weights=self.today_hour_weights)[0]
+            else:
+                hour = pick(range(24), cum_weights=self.hour_weights)[0]
+            sold_at = day_start + timedelta(seconds=hour * 3600 + rng.randrange(3600))
+            cashier = pick(self.cashiers, cum_weights=self.cashier_weights)[0]
+            yield tea_id, quantity, price, price * quantity, sold_at, cashier
+
+    @property
+    def first_day(self):
+        return self.days[-1]
+
+    @property
+    def last_day(self):
+        return self.days[0]
+
+
+def catalogue_teas():
+    return Tea.objects.values_list('id', 'category', 'price')
+
+
+def load_sales(rows, using='default', batch_size=10_000, copy=False):
+    """
+    Insert generated sale tuples, with PostgreSQL COPY when ``copy`` is set
+    (psycopg 3) and batched bulk_create otherwise. Returns the row count.
+    Stock levels and rollups are left alone; rebuild the rollups afterwards.
+    """
+    connection = connections[using]
+    if copy and connection.vendor == 'postgresql':
+        return _copy_sales(rows, connection)
+
+    loaded = 0
+    while True:
+        batch = [
+            Sale(**dict(zip(SALE_COLUMNS, row)))
+            for row in itertools.islice(rows, batch_size)
+        ]
+        if not batch:
+            return loaded
+        with transaction.atomic(using=using):
+            # Model.save() would take stock; history goes straight in
+            Sale.objects.using(using).bulk_create(batch)
+        loaded += len(batch)
+
+
+def _copy_sales(rows, connection):
+    table = connection.ops.quote_name(Sale._meta.db_table)
+    columns = ', '.join(SALE_COLUMNS)
+    loaded = 0
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            with cursor.cursor.copy(f'COPY {table} ({columns}) FROM STDIN') as copy:
+                for row in rows:
+                    copy.write_row(row)
+                    loaded += 1
+    return loaded
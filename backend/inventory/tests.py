@@ -1,3 +1,1868 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
+from django.conf import settings
+from django.db import connection, connections, IntegrityError, OperationalError
+from django.db.models import Sum
+from django.http import HttpResponse
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authentication import user_cache
+from .cache import lookup_dashboard_stats, store_dashboard_stats
+from .benchmarks import run_benchmarks, seed_benchmark_data
+from .events import KEEPALIVE_FRAME, RESET_FRAME, Broadcaster, broadcaster
+from .metrics import registry
+from .middleware import RequestMetricsMiddleware
+from .models import (
+    Tea, Sale, DailySalesRollup, PrecomputedReport, StockAlert, TeaTombstone,
+    UserProfile, InsufficientStock
+)
+from .pagination import KeysetPagination
+from .routers import ReplicaRouter, read_from_replica, reads_use_replica
+from .serializers import SaleSerializer
+from .views import CheckoutView, SaleExportView, SaleListCreateView
+
+
+def make_tea(**kwargs):
+    defaults = {
+        'name': 'Ceylon Orange Pekoe',
+        'category': 'Black',
+        'price': Decimal('450.00'),
+        'stock_quantity': 100,
+    }
+    defaults.update(kwargs)
+    return Tea.objects.create(**defaults)
+
+
+def without_freshness(payload):
+    return {
+        key: value for key, value in payload.items()
+        if key not in ('precomputed', 'computed_at', 'age_seconds')
+    }
+
+
+def primary_reads(test_case):
+    """
+    Keep a test's opted-in reads on the primary even when the settings add a
+    replica alias, so its query counts and databases hold either way
+    """
+    return mock.patch('inventory.routers.replica_configured', new=lambda: False)(test_case)
+
+
+class SaleStockTests(TestCase):
+    """Stock is taken exactly once, atomically, when a sale is recorded"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cashier', password='cashier123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tea = make_tea(stock_quantity=10)
+
+    def test_sale_decrements_stock_once(self):
+        response = self.client.post(
+            reverse('inventory:sale-list-create'),
+            {'tea': self.tea.pk, 'quantity': 3},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.tea.refresh_from_db()
+        self.assertEqual(self.tea.stock_quantity, 7)
+
+        sale = Sale.objects.get()
+        self.assertEqual(sale.unit_price, Decimal('450.00'))
+        self.assertEqual(sale.total_amount, Decimal('1350.00'))
+        self.assertEqual(sale.sold_by, self.user)
+
+    def test_insufficient_stock_is_rejected(self):
+        response = self.client.post(
+            reverse('inventory:sale-list-create'),
+            {'tea': self.tea.pk, 'quantity': 11},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('non_field_errors', response.data)
+        self.tea.refresh_from_db()
+        self.assertEqual(self.tea.stock_quantity, 10)
+        self.assertFalse(Sale.objects.exists())
+
+    def test_stale_instance_cannot_oversell(self):
+        # Another till sold the last units after this instance was loaded
+        stale = Tea.objects.get(pk=self.tea.pk)
+        Tea.objects.filter(pk=self.tea.pk).update(stock_quantity=2)
+
+        with self.assertRaises(InsufficientStock) as ctx:
+            Sale.objects.create(tea=stale, quantity=5, sold_by=self.user)
+        self.assertEqual(ctx.exception.available, 2)
+        self.assertFalse(Sale.objects.exists())
+        self.assertEqual(Tea.objects.get(pk=self.tea.pk).stock_quantity, 2)
+
+    def test_editing_a_sale_does_not_touch_stock(self):
+        sale = Sale.objects.create(tea=self.tea, quantity=4, sold_by=self.user)
+        sale.notes = 'Gift wrapped'
+        sale.save()
+        self.tea.refresh_from_db()
+        self.assertEqual(self.tea.stock_quantity, 6)
+
+
+class CheckoutTests(TestCase):
+    """A cart is checked out in one request, all or nothing"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cashier', password='cashier123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.black = make_tea(stock_quantity=10)
+        self.green = make_tea(
+            name='Ceylon Green Tea', category='Green',
+            price=Decimal('380.00'), stock_quantity=5,
+        )
+        self.url = reverse('inventory:sale-checkout')
+
+    def test_checkout_records_every_line(self):
+        items = [
+            {'tea': self.black.pk, 'quantity': 2},
+            {'tea': self.green.pk, 'quantity': 1},
+            {'tea': self.black.pk, 'quantity': 3},
+        ]
+        with self.assertNumQueries(7):
+            # tea lookup, savepoint, stock UPDATE, low-stock alert INSERT ... SELECT,
+            # sale INSERT, rollup upsert, release
+            response = self.client.post(
+                self.url, {'items': items, 'customer_name': 'Nimal'}, format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['sales']), 3)
+        self.assertEqual(response.data['total_quantity'], 6)
+        self.assertEqual(response.data['total_amount'], Decimal('2630.00'))
+
+        self.black.refresh_from_db()
+        self.green.refresh_from_db()
+        self.assertEqual(self.black.stock_quantity, 5)
+        self.assertEqual(self.green.stock_quantity, 4)
+        self.assertEqual(Sale.objects.filter(customer_name='Nimal').count(), 3)
+
+    def test_short_line_rejects_whole_basket(self):
+        items = [
+            {'tea': self.black.pk, 'quantity': 2},
+            {'tea': self.green.pk, 'quantity': 6},
+        ]
+        response = self.client.post(self.url, {'items': items}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Sale.objects.exists())
+        self.assertEqual(Tea.objects.get(pk=self.black.pk).stock_quantity, 10)
+
+    def test_race_lost_after_validation_rolls_back(self):
+        stale_black = Tea.objects.get(pk=self.black.pk)
+        stale_green = Tea.objects.get(pk=self.green.pk)
+        Tea.objects.filter(pk=self.green.pk).update(stock_quantity=0)
+
+        with self.assertRaises(InsufficientStock) as ctx:
+            Sale.objects.bulk_record([
+                Sale(tea=stale_black, quantity=2, sold_by=self.user),
+                Sale(tea=stale_green, quantity=1, sold_by=self.user),
+            ])
+        self.assertEqual(ctx.exception.tea_id, self.green.pk)
+        self.assertEqual(Tea.objects.get(pk=self.black.pk).stock_quantity, 10)
+        self.assertFalse(Sale.objects.exists())
+
+    def test_unknown_tea_is_rejected(self):
+        response = self.client.post(
+            self.url, {'items': [{'tea': 9999, 'quantity': 1}]}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('items', response.data)
+
+
+def local_datetime(day, hour):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()).replace(hour=hour))
+
+
+class IdempotentSaleTests(TestCase):
+    """Retried and replayed sales are recorded once per idempotency key"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cashier', password='cashier123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.black = make_tea(stock_quantity=10)
+        self.green = make_tea(
+            name='Ceylon Green Tea', category='Green',
+            price=Decimal('380.00'), stock_quantity=5,
+        )
+        self.url = reverse('inventory:sale-replay')
+
+    def test_retried_post_is_recorded_once(self):
+        url = reverse('inventory:sale-list-create')
+        sale = {'tea': self.black.pk, 'quantity': 2}
+        first = self.client.post(url, sale, HTTP_IDEMPOTENCY_KEY='till-1-0001')
+        retry = self.client.post(url, sale, HTTP_IDEMPOTENCY_KEY='till-1-0001')
+        self.assertEqual((first.status_code, retry.status_code), (201, 200))
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(Sale.objects.count(), 1)
+        self.assertEqual(Tea.objects.get(pk=self.black.pk).stock_quantity, 8)
+
+        # Keys belong to the user who recorded the sale
+        other = User.objects.create_user('other')
+        self.client.force_authenticate(other)
+        self.assertEqual(
+            self.client.post(url, sale, HTTP_IDEMPOTENCY_KEY='till-1-0001').status_code, 201
+        )
+        self.assertEqual(
+            self.client.post(url, sale, HTTP_IDEMPOTENCY_KEY='k' * 65).status_code, 400
+        )
+        self.assertEqual(self.client.post(url, sale, HTTP_IDEMPOTENCY_KEY='  ').status_code, 400)
+        retry = self.client.post(url, sale, HTTP_IDEMPOTENCY_KEY=' till-1-0001 ')
+        self.assertEqual(retry.status_code, 200)
+
+    def test_unrelated_integrity_error_is_not_a_replay(self):
+        url = reverse('inventory:sale-list-create')
+        with mock.patch.object(SaleListCreateView, 'perform_create', side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                self.client.post(
+                    url, {'tea': self.black.pk, 'quantity': 1}, HTTP_IDEMPOTENCY_KEY='till-1-0002'
+                )
+
+    def test_retried_checkout_is_recorded_once(self):
+        url = reverse('inventory:sale-checkout')
+        cart = {'items': [
+            {'tea': self.black.pk, 'quantity': 2}, {'tea': self.green.pk, 'quantity': 5},
+        ]}
+        first = self.client.post(url, cart, format='json', HTTP_IDEMPOTENCY_KEY='cart-1')
+        # The green tea is sold out now, yet the retry still gets the first answer
+        retry = self.client.post(url, cart, format='json', HTTP_IDEMPOTENCY_KEY='cart-1')
+        self.assertEqual((first.status_code, retry.status_code), (201, 200))
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(Sale.objects.count(), 2)
+        self.assertEqual(Tea.objects.get(pk=self.black.pk).stock_quantity, 8)
+
+        response = self.client.post(url, cart, format='json', HTTP_IDEMPOTENCY_KEY='k' * 49)
+        self.assertEqual(response.status_code, 400)
+
+    def test_checkout_key_reused_for_another_cart(self):
+        url = reverse('inventory:sale-checkout')
+        cart = [{'tea': self.black.pk, 'quantity': 2}, {'tea': self.green.pk, 'quantity': 1}]
+        self.client.post(url, {'items': cart}, format='json', HTTP_IDEMPOTENCY_KEY='cart-3')
+        for items in (
+            [{'tea': self.black.pk, 'quantity': 3}, cart[1]],  # edited line
+            cart[:1],  # removed line
+            cart + [{'tea': self.black.pk, 'quantity': 1}],  # added line
+        ):
+            response = self.client.post(
+                url, {'items': items}, format='json', HTTP_IDEMPOTENCY_KEY='cart-3'
+            )
+            self.assertEqual(response.status_code, 422)
+        response = self.client.post(
+            url, {'items': cart, 'customer_name': 'Nimal'}, format='json',
+            HTTP_IDEMPOTENCY_KEY='cart-3',
+        )
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Sale.objects.count(), 2)
+
+    def test_checkout_and_single_sale_keys_do_not_collide(self):
+        sale = {'tea': self.black.pk, 'quantity': 1}
+        self.assertEqual(self.client.post(
+            reverse('inventory:sale-list-create'), sale, HTTP_IDEMPOTENCY_KEY='k:0'
+        ).status_code, 400)
+        self.client.post(reverse('inventory:sale-list-create'), sale, HTTP_IDEMPOTENCY_KEY='k')
+        response = self.client.post(
+            reverse('inventory:sale-checkout'), {'items': [sale]}, format='json',
+            HTTP_IDEMPOTENCY_KEY='k',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Sale.objects.count(), 2)
+
+        response = self.client.post(self.url, {'sales': [
+            {'idempotency_key': 'k:1', 'tea': self.black.pk, 'quantity': 1},
+        ]}, format='json')
+        self.assertIn('idempotency_key', response.data['results'][0]['errors'])
+
+    def test_concurrent_checkout_retry(self):
+        # Another request with the key commits between the lookup and the insert
+        url = reverse('inventory:sale-checkout')
+        Sale.objects.create(
+            tea=self.black, quantity=1, sold_by=self.user, idempotency_key='cart-2:0'
+        )
+        recorded = CheckoutView.recorded
+
+        def lookup(view, key, lines):
+            return recorded(view, key, lines) if lookups.call_count > 1 else []
+
+        with mock.patch.object(
+            CheckoutView, 'recorded', autospec=True, side_effect=lookup
+        ) as lookups:
+            response = self.client.post(
+                url, {'items': [{'tea': self.black.pk, 'quantity': 1}]},
+                format='json', HTTP_IDEMPOTENCY_KEY='cart-2',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(lookups.call_count, 2)
+        self.assertEqual(response.data['total_quantity'], 1)
+        self.assertEqual(Sale.objects.count(), 1)
+        self.assertEqual(Tea.objects.get(pk=self.black.pk).stock_quantity, 9)
+
+    def test_replay_backlog_in_one_go(self):
+        sold_at = local_datetime(date(2025, 8, 1), 9)
+        backlog = [
+            {'idempotency_key': f'till-1-{i}', 'tea': self.black.pk, 'quantity': 1,
+             'sold_at': sold_at.isoformat()}
+            for i in range(4)
+        ]
+        with self.assertNumQueries(8):
+            # recorded keys, teas, then one bulk_record
+            response = self.client.post(self.url, {'sales': backlog}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            (response.data['created'], response.data['duplicate'], response.data['failed']),
+            (4, 0, 0),
+        )
+        self.assertEqual(Tea.objects.get(pk=self.black.pk).stock_quantity, 6)
+        self.assertEqual(
+            DailySalesRollup.objects.get(day=date(2025, 8, 1)).sale_count, 4
+        )
+
+        # Flushing the same queue again records nothing
+        response = self.client.post(self.url, {'sales': backlog}, format='json')
+        self.assertEqual(
+            [result['status'] for result in response.data['results']], ['duplicate'] * 4
+        )
+        self.assertEqual(Sale.objects.count(), 4)
+
+    def test_per_item_results(self):
+        Sale.objects.create(
+            tea=self.black, quantity=1, sold_by=self.user, idempotency_key='done'
+        )
+        response = self.client.post(self.url, {'sales': [
+            {'idempotency_key': 'a', 'tea': self.green.pk, 'quantity': 3},
+            {'idempotency_key': 'done', 'tea': self.black.pk, 'quantity': 1},
+            {'idempotency_key': 'b', 'tea': self.green.pk, 'quantity': 3},
+            {'idempotency_key': 'a', 'tea': self.green.pk, 'quantity': 3},
+            {'idempotency_key': 'c', 'tea': 9999, 'quantity': 1},
+            {'idempotency_key': 'd', 'tea': self.black.pk, 'quantity': 0},
+            {'idempotency_key': 'e', 'tea': self.black.pk, 'quantity': 2},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual(
+            [result['status'] for result in results],
+            ['created', 'duplicate', 'error', 'duplicate', 'error', 'error', 'created'],
+        )
+        self.assertEqual(results[3]['sale_id'], results[0]['sale_id'])
+        self.assertIn('Insufficient stock', str(results[2]['errors']))
+        self.assertIn('tea', results[4]['errors'])
+        self.assertIn('quantity', results[5]['errors'])
+        self.assertEqual(
+            (response.data['created'], response.data['duplicate'], response.data['failed']),
+            (2, 2, 3),
+        )
+        self.assertEqual(Tea.objects.get(pk=self.green.pk).stock_quantity, 2)
+        self.assertEqual(Tea.objects.get(pk=self.black.pk).stock_quantity, 7)
+
+    def test_concurrent_duplicate_is_rolled_back(self):
+        # As when another replay of the same key commits between lookup and insert
+        Sale.objects.create(tea=self.black, quantity=1, sold_by=self.user, idempotency_key='x')
+        outcomes = Sale.objects.record_each([
+            Sale(tea=self.black, quantity=1, sold_by=self.user, idempotency_key='x'),
+            Sale(tea=self.black, quantity=1, sold_by=self.user, idempotency_key='y'),
+        ])
+        self.assertIsInstance(outcomes[0], IntegrityError)
+        self.assertEqual(outcomes[1].idempotency_key, 'y')
+        self.assertEqual(Tea.objects.get(pk=self.black.pk).stock_quantity, 8)
+
+    def test_invalid_batch(self):
+        self.assertEqual(self.client.post(self.url, {'sales': []}, format='json').status_code, 400)
+        too_many = [
+            {'idempotency_key': str(i), 'tea': self.black.pk, 'quantity': 1} for i in range(501)
+        ]
+        self.assertEqual(
+            self.client.post(self.url, {'sales': too_many}, format='json').status_code, 400
+        )
+
+
+class StockAlertTests(TestCase):
+    """Sales that take a tea below its reorder level feed the alerts endpoint"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cashier', password='cashier123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.black = make_tea(stock_quantity=12)
+        self.green = make_tea(
+            name='Ceylon Green Tea', category='Green',
+            price=Decimal('380.00'), stock_quantity=30, reorder_level=25,
+        )
+        self.url = reverse('inventory:low-stock-alerts')
+
+    def sell(self, tea, quantity):
+        Sale.objects.create(tea=tea, quantity=quantity, sold_by=self.user)
+
+    def test_alert_only_when_crossing_the_reorder_level(self):
+        self.sell(self.black, 2)  # 10 left, still at the level
+        self.assertFalse(StockAlert.objects.exists())
+        self.sell(self.black, 1)  # 9 left
+        self.sell(self.black, 1)  # already below, no second alert
+        alert = StockAlert.objects.get()
+        self.assertEqual(
+            (alert.tea_id, alert.stock_quantity, alert.reorder_level), (self.black.pk, 9, 10)
+        )
+
+    def test_checkout_and_per_tea_levels(self):
+        self.client.post(reverse('inventory:sale-checkout'), {'items': [
+            {'tea': self.black.pk, 'quantity': 1},
+            {'tea': self.green.pk, 'quantity': 6},
+        ]}, format='json')
+        self.assertEqual(
+            list(StockAlert.objects.values_list('tea_id', 'stock_quantity')),
+            [(self.green.pk, 24)],
+        )
+        self.assertEqual(
+            [tea.pk for tea in Tea.objects.low_stock()], [self.green.pk]
+        )
+        summary = self.client.get(reverse('inventory:reports'), {'type': 'summary'}).data
+        self.assertEqual(
+            [tea['name'] for tea in summary['low_stock_alerts']], ['Ceylon Green Tea']
+        )
+        self.assertEqual(
+            self.client.get(reverse('inventory:dashboard')).data['inventory']['low_stock_count'], 1
+        )
+
+    def test_failed_sale_records_no_alert(self):
+        with self.assertRaises(InsufficientStock):
+            self.sell(self.black, 13)
+        self.assertFalse(StockAlert.objects.exists())
+
+    @override_settings(STOCK_ALERT_FEED_LAG_SECONDS=0)
+    def test_feed_returns_only_new_alerts(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.data, {'results': [], 'last_id': 0, 'has_more': False})
+
+        self.sell(self.black, 3)
+        self.sell(self.green, 6)
+        response = self.client.get(self.url, {'limit': 1})
+        self.assertEqual([a['tea_name'] for a in response.data['results']], ['Ceylon Orange Pekoe'])
+        self.assertTrue(response.data['has_more'])
+
+        response = self.client.get(self.url, {'after': response.data['last_id']})
+        self.assertEqual([a['tea_name'] for a in response.data['results']], ['Ceylon Green Tea'])
+        self.assertFalse(response.data['has_more'])
+
+        last_id = response.data['last_id']
+        response = self.client.get(self.url, {'after': last_id})
+        self.assertEqual((response.data['results'], response.data['last_id']), ([], last_id))
+        self.assertEqual(self.client.get(self.url, {'after': 'x'}).status_code, 400)
+
+    @override_settings(STOCK_ALERT_FEED_LAG_SECONDS=60)
+    def test_feed_holds_back_recent_alerts(self):
+        self.sell(self.black, 3)
+        response = self.client.get(self.url)
+        self.assertEqual((response.data['results'], response.data['last_id']), ([], 0))
+
+        StockAlert.objects.update(created_at=timezone.now() - timedelta(seconds=61))
+        response = self.client.get(self.url)
+        self.assertEqual([a['tea_name'] for a in response.data['results']], ['Ceylon Orange Pekoe'])
+
+
+@primary_reads
+class RollupReportTests(TestCase):
+    """Reports read the daily rollup and match the raw sales they summarise"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cashier', password='cashier123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.black = make_tea(stock_quantity=100)
+        self.green = make_tea(
+            name='Ceylon Green Tea', category='Green',
+            price=Decimal('380.00'), stock_quantity=100,
+        )
+        self.day1 = date(2025, 8, 1)
+        self.day2 = date(2025, 8, 2)
+        # Midnight Colombo time is still the previous day in UTC
+        Sale.objects.create(
+            tea=self.black, quantity=2, sold_by=self.user,
+            sold_at=local_datetime(self.day1, 0),
+        )
+        Sale.objects.create(
+            tea=self.green, quantity=1, sold_by=self.user,
+            sold_at=local_datetime(self.day1, 15),
+        )
+        Sale.objects.bulk_record([
+            Sale(tea=self.black, quantity=3, sold_by=self.user,
+                 sold_at=local_datetime(self.day2, 10)),
+            Sale(tea=self.black, quantity=1, sold_by=self.user,
+                 sold_at=local_datetime(self.day2, 11)),
+        ])
+
+    def report(self, report_type):
+        return self.client.get(reverse('inventory:reports'), {
+            'type': report_type, 'start_date': '2025-08-01', 'end_date': '2025-08-02',
+        }).data
+
+    def test_rollup_rows_follow_sales(self):
+        rows = DailySalesRollup.objects.order_by('day', 'category')
+        self.assertEqual(
+            [(r.day, r.category, r.quantity, r.sale_count, r.revenue) for r in rows],
+            [
+                (self.day1, 'Black', 2, 1, Decimal('900.00')),
+                (self.day1, 'Green', 1, 1, Decimal('380.00')),
+                (self.day2, 'Black', 4, 2, Decimal('1800.00')),
+            ],
+        )
+
+    def test_daily_report(self):
+        data = list(self.report('daily')['data'])
+        self.assertEqual([row['date'] for row in data], [self.day1, self.day2])
+        self.assertEqual(data[0]['total_sales'], Decimal('1280.00'))
+        self.assertEqual(data[0]['total_quantity'], 3)
+        self.assertEqual(data[0]['tea_count'], 2)
+        self.assertEqual(data[1]['tea_count'], 1)
+
+    def test_category_report(self):
+        data = list(self.report('category')['data'])
+        self.assertEqual([row['category'] for row in data], ['Black', 'Green'])
+        self.assertEqual(data[0]['total_sales'], Decimal('2700.00'))
+        self.assertEqual(data[0]['total_quantity'], 6)
+        self.assertEqual(data[0]['tea__category'], 'Black')
+
+    def test_summary_report(self):
+        data = self.report('summary')
+        self.assertEqual(data['totals'], {
+            'total_amount': Decimal('3080.00'),
+            'total_quantity': 7,
+            'total_transactions': 4,
+        })
+        top = list(data['top_teas'])
+        self.assertEqual(top[0]['tea__name'], 'Ceylon Orange Pekoe')
+        self.assertEqual(top[0]['total_sold'], 6)
+
+    def test_top_selling(self):
+        url = reverse('inventory:reports-top-selling')
+        response = self.client.get(url, {'start_date': '2025-08-01', 'end_date': '2025-08-02'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['tea__name'], row['total_sold'], row['total_revenue']) for row in response.data['data']],
+            [('Ceylon Orange Pekoe', 6, Decimal('2700.00')), ('Ceylon Green Tea', 1, Decimal('380.00'))],
+        )
+
+        # A window only counts its own days, and a deleted sale drops out
+        Sale.objects.get(tea=self.green).delete()
+        response = self.client.get(url, {
+            'start_date': '2025-08-01', 'end_date': '2025-08-01', 'limit': 5,
+        })
+        self.assertEqual(
+            [(row['tea_id'], row['total_sold']) for row in response.data['data']],
+            [(self.black.pk, 2)],
+        )
+        self.assertEqual(response.data['limit'], 5)
+
+        for limit in ['0', '51', 'ten']:
+            response = self.client.get(url, {'limit': limit})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('limit', response.data)
+
+    def test_empty_range_summary(self):
+        data = self.client.get(reverse('inventory:reports'), {
+            'type': 'summary', 'start_date': '2024-01-01', 'end_date': '2024-01-31',
+        }).data
+        self.assertEqual(data['totals']['total_transactions'], 0)
+        self.assertIsNone(data['totals']['total_amount'])
+
+    def test_deleting_a_sale_updates_rollup(self):
+        Sale.objects.get(tea=self.green).delete()
+        # A row with no sales left is dropped, so reports do not count it
+        self.assertFalse(DailySalesRollup.objects.filter(tea=self.green).exists())
+        self.assertEqual(self.report('daily')['data'][0]['tea_count'], 1)
+        self.assertEqual(
+            [row['category'] for row in self.report('category')['data']], ['Black']
+        )
+
+        Sale.objects.filter(sold_at__lt=local_datetime(self.day2, 0)).delete()
+        self.assertEqual(
+            [row['date'] for row in self.report('daily')['data']], [self.day2]
+        )
+
+    def test_recategorised_tea_keeps_its_rollup(self):
+        self.client.patch(
+            reverse('inventory:tea-detail', args=[self.black.pk]),
+            {'category': 'Flavored'}, format='json',
+        )
+        self.assertEqual(
+            set(DailySalesRollup.objects.filter(tea=self.black).values_list('category', flat=True)),
+            {'Flavored'},
+        )
+        self.assertEqual(
+            [row['category'] for row in self.report('category')['data']], ['Flavored', 'Green']
+        )
+
+        Sale.objects.get(sold_at=local_datetime(self.day2, 10)).delete()
+        row = DailySalesRollup.objects.get(day=self.day2, tea=self.black)
+        self.assertEqual((row.quantity, row.sale_count, row.category), (1, 1, 'Flavored'))
+        self.assertEqual(self.report('daily')['data'][1]['total_quantity'], 1)
+
+        # The supplier import moves the rows too
+        call_command('import_teas', self.write_teas([
+            {'name': 'Ceylon Orange Pekoe', 'category': 'Black', 'price': '450.00'},
+        ]), stdout=io.StringIO())
+        self.assertEqual(
+            set(DailySalesRollup.objects.filter(tea=self.black).values_list('category', flat=True)),
+            {'Black'},
+        )
+
+    def write_teas(self, teas):
+        handle = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False)
+        with handle:
+            json.dump(teas, handle)
+        self.addCleanup(os.unlink, handle.name)
+        return handle.name
+
+    def test_bulk_deletes_update_rollup_without_per_sale_queries(self):
+        Sale.objects.bulk_record([
+            Sale(tea=self.black, quantity=1, sold_by=self.user,
+                 sold_at=local_datetime(self.day2, 12))
+            for _ in range(50)
+        ])
+        # One grouped read, the rollup UPDATE and emptied-row DELETE, then the
+        # sales DELETE, inside a savepoint
+        with self.assertNumQueries(6):
+            Sale.objects.filter(sold_at__gte=local_datetime(self.day2, 11)).delete()
+        row = DailySalesRollup.objects.get(day=self.day2, tea=self.black)
+        self.assertEqual((row.quantity, row.sale_count), (3, 1))
+
+        # A user's sales are cascaded in bulk, not one at a time
+        cashier = User.objects.create_user('other')
+        Sale.objects.bulk_record([
+            Sale(tea=self.green, quantity=1, sold_by=cashier, sold_at=local_datetime(self.day2, 9))
+            for _ in range(50)
+        ])
+        with CaptureQueriesContext(connection) as queries:
+            cashier.delete()
+        self.assertLess(len(queries), 20)
+        self.assertFalse(
+            DailySalesRollup.objects.filter(day=self.day2, tea=self.green).exists()
+        )
+
+        # A tea's rollup rows go with it
+        with CaptureQueriesContext(connection) as queries:
+            self.black.delete()
+        self.assertLess(len(queries), 20)
+        self.assertFalse(DailySalesRollup.objects.filter(tea_id=self.black.pk).exists())
+
+    def test_rebuild_matches_incremental_rollup(self):
+        def snapshot():
+            return list(DailySalesRollup.objects.order_by('day', 'tea_id').values_list(
+                'day', 'tea_id', 'category', 'revenue', 'quantity', 'sale_count'
+            ))
+
+        incremental = snapshot()
+        DailySalesRollup.objects.all().delete()
+        call_command('rebuild_sales_rollups', stdout=open('/dev/null', 'w'))
+        self.assertEqual(snapshot(), incremental)
+
+        # A ranged rebuild only touches its own days
+        DailySalesRollup.objects.filter(day=self.day1).update(quantity=99)
+        call_command(
+            'rebuild_sales_rollups', start_date='2025-08-02', end_date='2025-08-02',
+            stdout=open('/dev/null', 'w'),
+        )
+        self.assertEqual(
+            DailySalesRollup.objects.get(day=self.day1, tea=self.black).quantity, 99
+        )
+
+
+class TimeBucketReportTests(TestCase):
+    """timeseries buckets and the heatmap follow local (Asia/Colombo) time"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cashier', password='cashier123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.black = make_tea(stock_quantity=100)
+        self.green = make_tea(
+            name='Ceylon Green Tea', category='Green',
+            price=Decimal('380.00'), stock_quantity=100,
+        )
+        # Thursday 31 July to Monday 4 August 2025
+        for day, hour, tea, quantity in [
+            (date(2025, 7, 31), 23, self.black, 1),
+            (date(2025, 8, 1), 0, self.black, 2),
+            (date(2025, 8, 1), 0, self.green, 1),
+            (date(2025, 8, 4), 9, self.green, 2),
+        ]:
+            Sale.objects.create(
+                tea=tea, quantity=quantity, sold_by=self.user,
+                sold_at=local_datetime(day, hour),
+            )
+
+    def report(self, **params):
+        return self.client.get(reverse('inventory:reports'), {
+            'start_date': '2025-07-31', 'end_date': '2025-08-04', **params,
+        })
+
+    def rows(self, *keys, **params):
+        response = self.report(type='timeseries', **params)
+        self.assertEqual(response.status_code, 200)
+        return [tuple(row[key] for key in keys) for row in response.data['data']]
+
+    def test_default_daily_buckets(self):
+        response = self.report(type='timeseries')
+        self.assertEqual(response.data['granularity'], 'day')
+        self.assertIsNone(response.data['group_by'])
+        self.assertEqual(
+            self.rows('bucket', 'sale_count', 'total_quantity'),
+            [(date(2025, 7, 31), 1, 1), (date(2025, 8, 1), 2, 3), (date(2025, 8, 4), 1, 2)],
+        )
+
+    def test_week_and_month_buckets(self):
+        self.assertEqual(
+            self.rows('bucket', 'total_sales', granularity='week'),
+            [(date(2025, 7, 28), Decimal('1730.00')), (date(2025, 8, 4), Decimal('760.00'))],
+        )
+        self.assertEqual(
+            self.rows('bucket', 'sale_count', granularity='month'),
+            [(date(2025, 7, 1), 1), (date(2025, 8, 1), 3)],
+        )
+
+    def test_hour_buckets_are_local(self):
+        buckets = self.rows('bucket', 'sale_count', granularity='hour')
+        self.assertEqual(
+            [(timezone.localtime(bucket), count) for bucket, count in buckets],
+            [
+                (local_datetime(date(2025, 7, 31), 23), 1),
+                (local_datetime(date(2025, 8, 1), 0), 2),
+                (local_datetime(date(2025, 8, 4), 9), 1),
+            ],
+        )
+
+    def test_group_by_category_and_tea(self):
+        self.assertEqual(
+            self.rows('bucket', 'category', 'total_quantity', granularity='month', group_by='category'),
+            [
+                (date(2025, 7, 1), 'Black', 1),
+                (date(2025, 8, 1), 'Black', 2),
+                (date(2025, 8, 1), 'Green', 3),
+            ],
+        )
+        # Hourly buckets group the raw sales in the same shape
+        self.assertEqual(
+            self.rows('category', 'sale_count', granularity='hour', group_by='category')[1:3],
+            [('Black', 1), ('Green', 1)],
+        )
+        self.assertEqual(
+            self.rows('tea_name', 'total_quantity', granularity='week', group_by='tea'),
+            [('Ceylon Orange Pekoe', 3), ('Ceylon Green Tea', 1), ('Ceylon Green Tea', 2)],
+        )
+
+    def test_heatmap(self):
+        response = self.report(type='heatmap')
+        self.assertEqual(response.data['type'], 'sales_heatmap')
+        self.assertEqual(
+            [(c['weekday'], c['hour'], c['sale_count']) for c in response.data['data']],
+            [(1, 9, 1), (4, 23, 1), (5, 0, 2)],
+        )
+
+    def test_invalid_options(self):
+        for params in [{'granularity': 'year'}, {'group_by': 'cashier'}]:
+            response = self.report(type='timeseries', **params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(next(iter(params)), response.data)
+        self.assertEqual(self.report(type='weekly').status_code, 400)
+
+
+class PrecomputedReportTests(TestCase):
+    """Standard report windows are served from precompute_reports' results"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('manager', password='manager123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tea = make_tea()
+        Sale.objects.create(tea=self.tea, quantity=2, sold_by=self.user)
+        self.url = reverse('inventory:reports')
+
+    def precompute(self):
+        call_command('precompute_reports', stdout=io.StringIO())
+
+    def test_standard_windows_served_precomputed(self):
+        live = self.client.get(self.url, {'type': 'summary'}).json()
+        self.assertFalse(live['precomputed'])
+        self.precompute()
+        self.assertEqual(PrecomputedReport.objects.count(), 9)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'type': 'summary'})
+        data = response.json()
+        self.assertTrue(data['precomputed'])
+        self.assertGreaterEqual(data['age_seconds'], 0)
+        self.assertEqual(without_freshness(data), without_freshness(live))
+
+        today = timezone.localdate().isoformat()
+        month = timezone.localdate().replace(day=1).isoformat()
+        for params in ({'start_date': today, 'end_date': today}, {'start_date': month}):
+            self.assertTrue(self.client.get(self.url, {'type': 'daily', **params}).data['precomputed'])
+
+    def test_precomputed_result_can_lag(self):
+        self.precompute()
+        Sale.objects.create(tea=self.tea, quantity=3, sold_by=self.user)
+        data = self.client.get(self.url, {'type': 'summary'}).data
+        # Served as computed, until the next run
+        self.assertEqual(data['totals']['total_quantity'], 2)
+        self.precompute()
+        self.assertEqual(
+            self.client.get(self.url, {'type': 'summary'}).data['totals']['total_quantity'], 5
+        )
+
+    def test_other_and_expired_windows_are_live(self):
+        self.precompute()
+        week_ago = (timezone.localdate() - timedelta(days=7)).isoformat()
+        self.assertFalse(
+            self.client.get(self.url, {'type': 'summary', 'start_date': week_ago}).data['precomputed']
+        )
+        PrecomputedReport.objects.update(computed_at=timezone.now() - timedelta(hours=1))
+        self.assertFalse(self.client.get(self.url, {'type': 'summary'}).data['precomputed'])
+
+
+@primary_reads
+class DashboardCacheTests(TestCase):
+    """The dashboard is served from cache and refreshed by sales and tea edits"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cashier', password='cashier123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tea = make_tea(stock_quantity=20)
+        self.url = reverse('inventory:dashboard')
+
+    def dashboard(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get(self.url).data
+
+    def test_payload(self):
+        Sale.objects.create(tea=self.tea, quantity=2, sold_by=self.user)
+        data = self.dashboard()
+        self.assertEqual(data['today'], {
+            'sales_count': 1, 'revenue': Decimal('900.00'), 'quantity_sold': 2,
+        })
+        self.assertEqual(data['this_month']['sales_count'], 1)
+        self.assertEqual(data['inventory'], {
+            'total_teas': 1, 'total_stock': 18, 'low_stock_count': 0,
+        })
+        self.assertEqual(data['date'], timezone.localdate())
+
+    def test_primary_readers_never_get_replica_figures(self):
+        # As if a reader on a lagging replica refilled the cache after a sale
+        key, _ = lookup_dashboard_stats(timezone.localdate(), replica=True)
+        store_dashboard_stats(key, {'stale': True})
+        self.assertIn('today', self.dashboard())
+
+    def test_repeat_hits_touch_no_database(self):
+        with self.assertNumQueries(2):
+            self.dashboard()
+        with self.assertNumQueries(0):
+            self.dashboard()
+
+    def test_sale_invalidates(self):
+        self.assertEqual(self.dashboard()['today']['sales_count'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Sale.objects.create(tea=self.tea, quantity=1, sold_by=self.user)
+        self.assertEqual(self.dashboard()['today']['sales_count'], 1)
+
+    def test_tea_edit_invalidates(self):
+        self.assertEqual(self.dashboard()['inventory']['low_stock_count'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tea.stock_quantity = 3
+            self.tea.save()
+        self.assertEqual(self.dashboard()['inventory']['low_stock_count'], 1)
+
+    def test_hit_ratio_is_staff_only(self):
+        self.dashboard()
+        self.dashboard()
+        self.dashboard()
+        url = reverse('inventory:dashboard-cache')
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        data = self.client.get(url).data
+        self.assertEqual((data['hits'], data['misses']), (2, 1))
+        self.assertEqual(data['hit_ratio'], 0.6667)
+
+
+@primary_reads
+class SaleListQueryTests(TestCase):
+    """The sales list costs the same number of queries whatever the page size"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('inventory:sale-list-create')
+        teas = [
+            make_tea(name=f'Tea {i}', category=category, stock_quantity=100)
+            for i, category in enumerate(['Black', 'Green', 'Herbal'])
+        ]
+        users = [User.objects.create_user(f'cashier{i}') for i in range(3)]
+        self.client.force_authenticate(users[0])
+        for i in range(30):
+            Sale.objects.create(
+                tea=teas[i % 3], quantity=1 + i % 4, sold_by=users[i % 3],
+                customer_name=f'Customer {i}' if i % 2 else None,
+            )
+
+    def test_query_count_is_independent_of_page_size(self):
+        for page_size in (1, 5, 20):
+            with mock.patch.object(PageNumberPagination, 'page_size', page_size):
+                with self.subTest(page_size=page_size), self.assertNumQueries(2):
+                    # COUNT(*) for the paginator and one joined SELECT for the rows
+                    response = self.client.get(self.url)
+            self.assertEqual(len(response.data['results']), page_size)
+
+    def test_rows_match_model_serializer(self):
+        response = self.client.get(self.url, {'category': 'green'})
+        expected = SaleSerializer(
+            Sale.objects.filter(tea__category='Green')[:20], many=True
+        ).data
+        self.assertEqual(response.data['count'], 10)
+        self.assertEqual(response.data['results'], expected)
+
+
+class KeysetPaginationTests(TestCase):
+    """?pagination=cursor pages are stable, count-free and walk both ways"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cashier')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tea = make_tea(stock_quantity=1000)
+        # Several sales share a timestamp so the id tie-breaker matters
+        sold_at = timezone.now()
+        for i in range(23):
+            Sale.objects.create(
+                tea=self.tea, quantity=1, sold_by=self.user,
+                sold_at=sold_at - timedelta(minutes=i // 3),
+            )
+        self.url = reverse('inventory:sale-list-create')
+
+    def walk(self, url, params=None, key='next'):
+        ids = []
+        response = self.client.get(url, params)
+        while True:
+            ids.extend(row['id'] for row in response.data['results'])
+            if not response.data[key]:
+                return ids, response
+            response = self.client.get(response.data[key])
+
+    def expected_ids(self):
+        return list(Sale.objects.order_by('-sold_at', 'id').values_list('id', flat=True))
+
+    def test_forward_walk_visits_every_sale_once(self):
+        with mock.patch.object(KeysetPagination, 'page_size', 5):
+            ids, _ = self.walk(self.url, {'pagination': 'cursor'})
+        self.assertEqual(ids, self.expected_ids())
+
+    def test_no_count_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'pagination': 'cursor'})
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+
+    def test_new_sales_do_not_shift_pages(self):
+        with mock.patch.object(KeysetPagination, 'page_size', 5):
+            first = self.client.get(self.url, {'pagination': 'cursor'}).data
+            Sale.objects.create(tea=self.tea, quantity=1, sold_by=self.user)
+            second = self.client.get(first['next']).data
+        expected = self.expected_ids()[1:]
+        self.assertEqual(
+            [row['id'] for row in first['results'] + second['results']],
+            expected[:10],
+        )
+
+    def test_backward_walk(self):
+        with mock.patch.object(KeysetPagination, 'page_size', 5):
+            _, last_page = self.walk(self.url, {'pagination': 'cursor'})
+            back_ids = [row['id'] for row in last_page.data['results']]
+            response = self.client.get(last_page.data['previous'])
+            while True:
+                back_ids = [row['id'] for row in response.data['results']] + back_ids
+                if not response.data['previous']:
+                    break
+                response = self.client.get(response.data['previous'])
+        self.assertEqual(back_ids, self.expected_ids())
+
+    def test_cursor_bounds_the_leading_column(self):
+        with mock.patch.object(KeysetPagination, 'page_size', 5):
+            cursor = self.client.get(self.url, {'pagination': 'cursor'}).data['next']
+            with CaptureQueriesContext(connection) as queries:
+                previous = self.client.get(self.client.get(cursor).data['previous'])
+        self.assertEqual(len(previous.data['results']), 5)
+        next_page, previous_page = (query['sql'] for query in queries)
+        self.assertIn('"inventory_sale"."sold_at" <= ', next_page)
+        self.assertIn('"inventory_sale"."sold_at" >= ', previous_page)
+
+    def test_tea_cursor_pages(self):
+        for i in range(7):
+            make_tea(name=f'Blend {i}', stock_quantity=1)
+        with mock.patch.object(KeysetPagination, 'page_size', 3):
+            ids, _ = self.walk(reverse('inventory:tea-list'), {'pagination': 'cursor'})
+        self.assertEqual(
+            ids, list(Tea.objects.order_by('name', 'id').values_list('id', flat=True))
+        )
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'pagination': 'cursor', 'cursor': 'bogus'})
+        self.assertEqual(response.status_code, 404)
+
+
+class TeaSearchTests(TestCase):
+    """?search= filters the catalogue and puts the best matches first"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('cashier'))
+        make_tea(name='Vanilla Ceylon Black', description='Black tea with vanilla')
+        make_tea(name='Earl Grey Ceylon', description='Classic Earl Grey')
+        make_tea(name='Ceylon Green Tea', category='Green', description='Light and fresh')
+        make_tea(name='Chamomile Herbal', category='Herbal', description='Grown beside Ceylon hills')
+        make_tea(name='Peppermint Herbal', category='Herbal', description='Refreshing')
+
+    def search(self, term, **params):
+        response = self.client.get(reverse('inventory:tea-list'), {'search': term, **params})
+        return [row['name'] for row in response.data['results']]
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.assertEqual(self.search('ceylon'), [
+            'Ceylon Green Tea',
+            'Earl Grey Ceylon',
+            'Vanilla Ceylon Black',
+            'Chamomile Herbal',
+        ])
+
+    def test_search_combines_with_filters(self):
+        self.assertEqual(self.search('herbal', category='Herbal'), [
+            'Chamomile Herbal', 'Peppermint Herbal',
+        ])
+
+    def test_punctuation_only_term_is_ignored(self):
+        self.assertEqual(len(self.search('%%')), 5)
+
+    def test_cursor_pages_keep_relevance_order(self):
+        for i in range(4):
+            make_tea(name=f'Ceylon Blend {i}')
+        names = []
+        with mock.patch.object(KeysetPagination, 'page_size', 3):
+            response = self.client.get(
+                reverse('inventory:tea-list'), {'search': 'ceylon', 'pagination': 'cursor'}
+            )
+            while True:
+                names.extend(row['name'] for row in response.data['results'])
+                if not response.data['next']:
+                    break
+                response = self.client.get(response.data['next'])
+        # Best matches first across pages, ties in rank broken by id
+        self.assertEqual(names, [
+            'Ceylon Green Tea', 'Ceylon Blend 0', 'Ceylon Blend 1', 'Ceylon Blend 2',
+            'Ceylon Blend 3', 'Vanilla Ceylon Black', 'Earl Grey Ceylon', 'Chamomile Herbal',
+        ])
+
+    @skipUnless(connection.vendor == 'postgresql', 'full-text and trigram search need PostgreSQL')
+    def test_postgres_ranking_and_typos(self):
+        ranked = self.search('ceylon')
+        self.assertEqual(len(ranked), 4)
+        # A description-only match ranks below every name match
+        self.assertEqual(ranked[-1], 'Chamomile Herbal')
+        self.assertEqual(self.search('earl gery')[0], 'Earl Grey Ceylon')
+        self.assertEqual(self.search('pepermint'), ['Peppermint Herbal'])
+
+
+@primary_reads
+class CatalogueConditionalGetTests(TestCase):
+    """Unchanged catalogue reads are answered with 304 and no serialization"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cashier')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tea = make_tea(stock_quantity=20)
+        make_tea(name='Ceylon Green Tea', category='Green')
+        self.list_url = reverse('inventory:tea-list')
+        self.detail_url = reverse('inventory:tea-detail', args=[self.tea.pk])
+
+    def test_list_revalidation(self):
+        first = self.client.get(self.list_url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('ETag', first.headers)
+        self.assertIn('Last-Modified', first.headers)
+
+        with self.assertNumQueries(1):
+            second = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.content, b'')
+
+    def test_query_string_is_part_of_the_tag(self):
+        everything = self.client.get(self.list_url)
+        green = self.client.get(self.list_url, {'category': 'Green'})
+        self.assertNotEqual(everything['ETag'], green['ETag'])
+
+    def test_sale_changes_the_tag(self):
+        etag = self.client.get(self.list_url)['ETag']
+        Sale.objects.create(tea=self.tea, quantity=1, sold_by=self.user)
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_deletion_changes_the_tag(self):
+        etag = self.client.get(self.list_url)['ETag']
+        Tea.objects.filter(category='Green').delete()
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_deletion_moves_last_modified(self):
+        Tea.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        last_modified = self.client.get(self.list_url)['Last-Modified']
+        response = self.client.get(self.list_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        Tea.objects.filter(category='Green').delete()
+        response = self.client.get(self.list_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_detail_revalidation(self):
+        first = self.client.get(self.detail_url)
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        self.client.patch(self.detail_url, {'price': '500.00'}, format='json')
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['price'], '500.00')
+
+    def test_missing_tea_is_still_404(self):
+        response = self.client.get(reverse('inventory:tea-detail', args=[9999]))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(CATALOGUE_SYNC_OVERLAP_SECONDS=0)
+class CatalogueDeltaSyncTests(TestCase):
+    """?since= returns only what changed after the client's watermark"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cashier')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.black = make_tea(stock_quantity=20)
+        self.green = make_tea(name='Ceylon Green Tea', category='Green')
+        self.white = make_tea(name='Silver Tips', category='White')
+        Tea.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        self.url = reverse('inventory:tea-list')
+
+    def sync(self, since):
+        response = self.client.get(self.url, {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_first_sync_returns_everything(self):
+        data = self.sync('')
+        self.assertTrue(data['reset'])
+        self.assertEqual(len(data['teas']), 3)
+        self.assertEqual(data['deleted'], [])
+
+    def test_delta_after_watermark(self):
+        watermark = self.sync('')['watermark']
+        self.assertEqual(self.sync(watermark)['teas'], [])
+
+        Sale.objects.create(tea=self.black, quantity=1, sold_by=self.user)
+        green_id = self.green.pk
+        self.green.delete()
+        make_tea(name='Earl Grey Ceylon')
+        with self.assertNumQueries(3):
+            # catalogue validators, changed teas, tombstones
+            data = self.sync(watermark)
+        self.assertFalse(data['reset'])
+        # The sale moved the tea's stock, so it is in the delta too
+        self.assertEqual(
+            {tea['name']: tea['stock_quantity'] for tea in data['teas']},
+            {'Ceylon Orange Pekoe': 19, 'Earl Grey Ceylon': 100},
+        )
+        self.assertEqual(data['deleted'], [green_id])
+
+    def test_expired_watermark_resets(self):
+        old = (timezone.now() - timedelta(days=settings.TEA_TOMBSTONE_RETENTION_DAYS + 1)).isoformat()
+        data = self.sync(old)
+        self.assertTrue(data['reset'])
+        self.assertEqual(len(data['teas']), 3)
+
+    def test_old_tombstones_are_pruned(self):
+        TeaTombstone.objects.create(tea_id=999, deleted_at=timezone.now() - timedelta(days=400))
+        white_id = self.white.pk
+        self.white.delete()
+        self.assertEqual(list(TeaTombstone.objects.values_list('tea_id', flat=True)), [white_id])
+
+    def test_invalid_watermark(self):
+        response = self.client.get(self.url, {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('since', response.data)
+
+
+@primary_reads
+class SaleExportTests(TestCase):
+    """Exports stream every matching sale as CSV or NDJSON"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cashier')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        black = make_tea(stock_quantity=100)
+        green = make_tea(name='Ceylon Green Tea', category='Green', stock_quantity=100)
+        for i in range(5):
+            Sale.objects.create(
+                tea=black if i % 2 else green, quantity=i + 1, sold_by=self.user,
+                sold_at=local_datetime(date(2025, 8, 1) + timedelta(days=i), 9),
+                customer_name='Perera, A.' if i == 0 else None,
+            )
+        self.url = reverse('inventory:sale-export')
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv(self):
+        response = self.client.get(self.url, {'output': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = list(csv.reader(io.StringIO(self.content(response))))
+        self.assertEqual(lines[0][:3], ['id', 'tea', 'tea_name'])
+        self.assertEqual(len(lines), 6)
+        # Oldest first, and commas in values are quoted properly
+        self.assertEqual(lines[1][lines[0].index('customer_name')], 'Perera, A.')
+        self.assertEqual(lines[1][lines[0].index('total_amount')], '450.00')
+
+    def test_ndjson_with_filters(self):
+        response = self.client.get(self.url, {
+            'output': 'ndjson', 'category': 'black',
+            'start_date': '2025-08-02', 'end_date': '2025-08-03',
+        })
+        records = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual([r['quantity'] for r in records], [2])
+        self.assertEqual(records[0]['tea_category'], 'Black')
+
+    def test_invalid_output(self):
+        response = self.client.get(self.url, {'output': 'xlsx'})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_asgi_export_streams_in_chunks(self):
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        with mock.patch.object(SaleExportView, 'chunk_size', 2):
+            response = await self.async_client.get(
+                self.url, {'output': 'ndjson'}, headers=headers
+            )
+            self.assertTrue(response.is_async)
+            chunks = aiter(response.streaming_content)
+            first = await anext(chunks)
+            self.assertEqual(len(first.splitlines()), 2)
+            rest = [chunk async for chunk in chunks]
+        self.assertEqual([len(chunk.splitlines()) for chunk in rest], [2, 1])
+        records = [json.loads(line) for line in b''.join([first, *rest]).splitlines()]
+        self.assertEqual([r['quantity'] for r in records], [1, 2, 3, 4, 5])
+
+
+class ImportTeasCommandTests(TestCase):
+    """import_teas upserts a supplier list in batches and reports what changed"""
+
+    def run_import(self, content, suffix='.csv', **options):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False) as handle:
+            handle.write(content)
+        self.addCleanup(os.unlink, handle.name)
+        out = io.StringIO()
+        call_command('import_teas', handle.name, stdout=out, stderr=io.StringIO(), **options)
+        return out.getvalue()
+
+    def test_insert_update_and_unchanged_counts(self):
+        make_tea(name='Earl Grey Ceylon', price=Decimal('520.00'), stock_quantity=7)
+        make_tea(name='Breakfast Blend', price=Decimal('390.00'), stock_quantity=9)
+        output = self.run_import(
+            'name,category,price\n'
+            'Earl Grey Ceylon,Black,540.00\n'
+            'Breakfast Blend,Black,390.00\n'
+            'Jasmine Green Tea,Green,420\n'
+            'Mystery Tea,Purple,100\n',
+            batch_size=2,
+        )
+        self.assertIn('1 inserted, 1 updated, 1 unchanged, 1 skipped', output)
+        self.assertIn('rows/s', output)
+
+        earl_grey = Tea.objects.get(name='Earl Grey Ceylon')
+        self.assertEqual(earl_grey.price, Decimal('540.00'))
+        # The file had no stock column, so stock is left alone
+        self.assertEqual(earl_grey.stock_quantity, 7)
+        self.assertEqual(Tea.objects.get(name='Jasmine Green Tea').stock_quantity, 0)
+
+    def test_publishes_stock_after_commit(self):
+        earl_grey = make_tea(name='Earl Grey Ceylon', stock_quantity=7)
+        make_tea(name='Breakfast Blend', stock_quantity=9)
+        with mock.patch.object(broadcaster, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.run_import(
+                    'name,category,price,stock_quantity\n'
+                    'Earl Grey Ceylon,Black,450.00,30\n'
+                    'Breakfast Blend,Black,450.00,9\n'
+                    'Silver Tips,White,850,3\n'
+                )
+                publish.assert_not_called()
+        silver_tips = Tea.objects.get(name='Silver Tips')
+        self.assertCountEqual(publish.call_args_list, [
+            mock.call('stock', {
+                'tea_id': earl_grey.pk, 'stock_quantity': 30,
+                'reorder_level': 10, 'is_low_stock': False,
+            }),
+            mock.call('stock', {
+                'tea_id': silver_tips.pk, 'stock_quantity': 3,
+                'reorder_level': 10, 'is_low_stock': True,
+            }),
+        ])
+
+    def test_json_with_stock(self):
+        make_tea(name='Earl Grey Ceylon', stock_quantity=7)
+        output = self.run_import(json.dumps([
+            {'name': 'Earl Grey Ceylon', 'category': 'Black', 'price': '450.00',
+             'stock_quantity': 30},
+            {'name': 'Silver Tips', 'category': 'White', 'price': 850,
+             'description': 'Delicate'},
+        ]), suffix='.json')
+        self.assertIn('1 inserted, 1 updated, 0 unchanged', output)
+        self.assertEqual(Tea.objects.get(name='Earl Grey Ceylon').stock_quantity, 30)
+        self.assertEqual(Tea.objects.get(name='Silver Tips').description, 'Delicate')
+
+
+class SyntheticSalesTests(TestCase):
+    """populate_data --sales generates a reproducible history with matching rollups"""
+
+    def generate(self, **options):
+        call_command('populate_data', stdout=io.StringIO(), **options)
+        return list(Sale.objects.order_by('sold_at', 'id').values_list(
+            'tea__name', 'quantity', 'total_amount', 'sold_at', 'sold_by__username'
+        ))
+
+    def test_generated_sales_follow_options(self):
+        sales = self.generate(
+            sales=500, days=30, seed=7, cashiers=4,
+            category_mix='Black=3,Herbal=1', batch_size=128,
+        )
+        self.assertEqual(len(sales), 500)
+        categories = set(Sale.objects.values_list('tea__category', flat=True))
+        self.assertEqual(categories, {'Black', 'Herbal'})
+        cashiers = set(Sale.objects.values_list('sold_by__username', flat=True))
+        self.assertTrue(cashiers <= {'cashier01', 'cashier02', 'cashier03', 'cashier04'})
+        earliest = timezone.localdate() - timedelta(days=29)
+        self.assertGreaterEqual(timezone.localdate(Sale.objects.earliest('sold_at').sold_at), earliest)
+
+        # Rollups were rebuilt for the generated span
+        rollup_count = DailySalesRollup.objects.aggregate(n=Sum('sale_count'))['n']
+        self.assertEqual(rollup_count, 500)
+
+    def test_same_seed_same_sales(self):
+        first = self.generate(sales=200, days=10, seed=3)
+        Sale.objects.all().delete()
+        self.assertEqual(self.generate(sales=200, days=10, seed=3), first)
+
+    def test_unknown_category_mix(self):
+        with self.assertRaises(CommandError):
+            self.generate(sales=10, category_mix='Purple=1')
+
+    def test_category_mix_needs_a_positive_weight(self):
+        with self.assertRaisesMessage(CommandError, 'positive weight'):
+            self.generate(sales=10, category_mix='Black=0,Herbal=0')
+
+    def test_no_sales_in_the_future(self):
+        for hour in (0, 7, 13, 23):
+            now = local_datetime(timezone.localdate(), hour) + timedelta(minutes=30)
+            Sale.objects.all().delete()
+            with mock.patch('django.utils.timezone.now', return_value=now):
+                sales = self.generate(sales=300, days=2, seed=hour)
+            self.assertEqual(len(sales), 300)
+            self.assertLessEqual(sales[-1][3], now)
+
+
+    def test_kept_benchmark_sales_are_rolled_up(self):
+        make_tea()
+        User.objects.create_user('cashier')
+        with mock.patch(
+            'inventory.management.commands.bench_date_filters.invalidate_dashboard'
+        ) as invalidate, self.captureOnCommitCallbacks(execute=True):
+            call_command(
+                'bench_date_filters', sales=300, days=10, repeat=1, keep=True,
+                stdout=io.StringIO(),
+            )
+        invalidate.assert_called_once_with()
+        self.assertEqual(Sale.objects.count(), 300)
+        rollup_count = DailySalesRollup.objects.aggregate(n=Sum('sale_count'))['n']
+        self.assertEqual(rollup_count, 300)
+
+class CachedAuthenticationTests(TestCase):
+    """JWT requests reuse a recently loaded user instead of querying for it"""
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user('manager', password='manager123', is_staff=True)
+        UserProfile.objects.create(user=self.user, role='manager')
+        response = self.client.post(
+            reverse('inventory:login'), {'username': 'manager', 'password': 'manager123'}
+        )
+        self.token = response.data['access']
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.url = reverse('inventory:dashboard-cache')
+
+    def test_login_embeds_claims(self):
+        token = AccessToken(self.token)
+        self.assertEqual((token['username'], token['role']), ('manager', 'manager'))
+
+    def test_repeat_requests_skip_user_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_deactivation_applies_immediately(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_cached_user_expires(self):
+        self.client.get(self.url)
+        # Simulate a change made by another process, which sends no signal here
+        User.objects.filter(pk=self.user.pk).update(is_staff=False)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        with mock.patch('inventory.authentication.time.monotonic', return_value=time.monotonic() + 31):
+            self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    @override_settings(AUTH_USER_CACHE_TTL=0)
+    def test_cache_disabled(self):
+        for _ in range(2):
+            with self.assertNumQueries(1):
+                self.client.get(self.url)
+
+
+class TokenRefreshTests(TestCase):
+    """An expired session is renewed from the refresh token, not the password"""
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user('cashier', password='cashier123')
+        self.profile = UserProfile.objects.create(user=self.user, role='cashier')
+        self.refresh = self.client.post(
+            reverse('inventory:login'), {'username': 'cashier', 'password': 'cashier123'}
+        ).data['refresh']
+        self.url = reverse('inventory:token-refresh')
+
+    def test_refresh_skips_password_check(self):
+        with mock.patch('inventory.serializers.authenticate') as authenticate:
+            response = self.client.post(self.url, {'refresh': self.refresh})
+        authenticate.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        # ROTATE_REFRESH_TOKENS hands out a new refresh token each time
+        self.assertNotEqual(response.data['refresh'], self.refresh)
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.assertEqual(client.get(reverse('inventory:tea-list')).status_code, 200)
+
+    def test_role_change_reaches_new_tokens(self):
+        self.profile.role = 'manager'
+        self.profile.save()
+        access = self.client.post(self.url, {'refresh': self.refresh}).data['access']
+        self.assertEqual(AccessToken(access)['role'], 'manager')
+
+    def test_deactivated_user_cannot_refresh(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.post(self.url, {'refresh': self.refresh}).status_code, 401)
+
+    def test_invalid_token(self):
+        self.assertEqual(self.client.post(self.url, {'refresh': 'nonsense'}).status_code, 401)
+
+
+@primary_reads
+@override_settings(METRICS_ENABLED=True)
+class RequestMetricsTests(TestCase):
+    """The metrics middleware records latency and SQL use per URL name"""
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.user = User.objects.create_user('admin', password='admin123', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        make_tea()
+
+    def test_prometheus_text(self):
+        self.client.get(reverse('inventory:tea-list'))
+        self.client.get(reverse('inventory:tea-list'))
+        self.client.get('/api/nowhere/')
+        response = self.client.get(reverse('inventory:metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+
+        labels = 'view="inventory:tea-list",method="GET"'
+        self.assertIn(f'inventory_http_requests_total{{{labels},status="200"}} 2', text)
+        self.assertIn(f'inventory_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', text)
+        self.assertIn(f'inventory_http_request_duration_seconds_count{{{labels}}} 2', text)
+        # Two list requests, each a validators query, a count and a page
+        self.assertIn(f'inventory_db_queries_total{{{labels}}} 6', text)
+        self.assertIn('view="unresolved",method="GET",status="404"', text)
+        self.assertIn('inventory_dashboard_cache_hits_total 0', text)
+
+    def test_async_capable(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        # Under ASGI the handler awaits the middleware instead of hopping threads
+        self.assertTrue(iscoroutinefunction(RequestMetricsMiddleware(get_response)))
+        self.assertFalse(iscoroutinefunction(RequestMetricsMiddleware(lambda request: None)))
+
+    def test_staff_only(self):
+        self.user.is_staff = False
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('inventory:metrics')).status_code, 403)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        self.client.get(reverse('inventory:tea-list'))
+        self.assertEqual(self.client.get(reverse('inventory:metrics')).status_code, 404)
+        self.assertNotIn('tea-list', registry.render())
+
+
+class ReplicaRouterTests(TestCase):
+    """Opted-in reads go to the replica, writes never do, writers get pinned"""
+
+    def setUp(self):
+        cache.clear()
+        self.router = ReplicaRouter()
+
+    def test_routing(self):
+        self.assertEqual(self.router.db_for_read(Tea), 'default')
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_read(Tea), 'replica')
+            self.assertEqual(self.router.db_for_write(Tea), 'default')
+        with read_from_replica(enabled=False):
+            self.assertEqual(self.router.db_for_read(Tea), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'inventory'))
+
+    def test_no_replica_configured(self):
+        user = User.objects.create_user('cashier', password='cashier123')
+        with mock.patch.dict(settings.DATABASES):
+            settings.DATABASES.pop('replica', None)
+            self.assertFalse(reads_use_replica(user))
+
+    @mock.patch('inventory.middleware.replica_configured', return_value=True)
+    @mock.patch('inventory.routers.replica_configured', return_value=True)
+    def test_writer_is_pinned_to_primary(self, *mocks):
+        cashier = User.objects.create_user('cashier', password='cashier123')
+        other = User.objects.create_user('other', password='other123')
+        client = APIClient()
+        client.force_authenticate(cashier)
+        response = client.post(
+            reverse('inventory:sale-list-create'), {'tea': make_tea().pk, 'quantity': 1}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(reads_use_replica(cashier))
+        self.assertTrue(reads_use_replica(other))
+
+
+@skipUnless('replica' in settings.DATABASES, 'needs a replica database alias')
+class ReplicaReadTests(TransactionTestCase):
+    """
+    With a replica alias configured, reports read from it until the user
+    writes. Runs when the settings add a 'replica' that mirrors 'default'
+    (TransactionTestCase, so the mirror's connection sees the rows).
+    """
+    databases = {'default', 'replica'} if 'replica' in settings.DATABASES else {'default'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cashier', password='cashier123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tea = make_tea()
+
+    def replica_queries(self, url):
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(replica)
+
+    def test_reads_follow_the_writer(self):
+        reports = reverse('inventory:reports') + '?type=summary'
+        # precomputed report lookup, totals, top teas, low stock
+        self.assertEqual(self.replica_queries(reports), 4)
+        self.client.post(
+            reverse('inventory:sale-list-create'), {'tea': self.tea.pk, 'quantity': 1}
+        )
+        self.assertEqual(self.replica_queries(reports), 0)
+
+    def test_catalogue_sync_reads_the_primary(self):
+        teas = reverse('inventory:tea-list')
+        self.assertGreater(self.replica_queries(teas), 0)
+        self.assertEqual(self.replica_queries(teas + '?since='), 0)
+
+
+@primary_reads
+class EndpointBudgetTests(TestCase):
+    """Every endpoint stays within its SQL query budget on seeded data"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_query_budgets(self):
+        fixture = seed_benchmark_data(sales=300, days=14)
+        results = run_benchmarks(APIClient(), fixture, repeat=2, check_latency=False)
+        self.assertEqual(
+            {name for name, result in results.items() if not result['passed']},
+            set(),
+            {name: result['failures'] for name, result in results.items() if result['failures']},
+        )
+        # The report records percentiles for every case
+        self.assertTrue(all(result['p95_ms'] >= result['p50_ms'] for result in results.values()))
+
+    def test_command_writes_report(self):
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as handle:
+            path = handle.name
+        self.addCleanup(os.unlink, path)
+        call_command(
+            'bench_endpoints', sales=50, repeat=1, no_latency_check=True, output=path,
+            stderr=io.StringIO(),
+        )
+        with open(path) as handle:
+            report = json.load(handle)
+        self.assertIn('dashboard', report['endpoints'])
+        self.assertEqual(report['endpoints']['login']['requests'], 1)
+
+
+@primary_reads
+class AsyncReportViewTests(TransactionTestCase):
+    """
+    The async report and dashboard views match their sync counterparts.
+    Their queries run on worker-thread connections, which only see
+    committed rows, hence TransactionTestCase.
+    """
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.user = User.objects.create_user('manager', password='manager123')
+        token = AccessToken.for_user(self.user)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        tea = make_tea(stock_quantity=50)
+        make_tea(name='Silver Tips', category='White', stock_quantity=3)
+        for quantity in (1, 2, 4):
+            Sale.objects.create(tea=tea, quantity=quantity, sold_by=self.user)
+
+    def test_reports_match_sync_view(self):
+        for report_type in ('daily', 'category', 'summary'):
+            query = f'?type={report_type}'
+            expected = self.client.get(reverse('inventory:reports') + query)
+            response = self.client.get(reverse('inventory:async-reports') + query)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(without_freshness(response.json()), without_freshness(expected.json()))
+        summary = response.json()
+        self.assertEqual(summary['totals']['total_transactions'], 3)
+        self.assertEqual([row['name'] for row in summary['low_stock_alerts']], ['Silver Tips'])
+
+    def test_dashboard_matches_sync_view(self):
+        response = self.client.get(reverse('inventory:async-dashboard'))
+        self.assertEqual(response.status_code, 200)
+        cache.clear()
+        self.assertEqual(response.json(), self.client.get(reverse('inventory:dashboard')).json())
+        self.assertEqual(response.json()['today']['quantity_sold'], 7)
+
+        # Entries computed from the replica are kept apart from the primary's
+        key, _ = lookup_dashboard_stats(timezone.localdate(), replica=True)
+        store_dashboard_stats(key, {'stale': True})
+        cache.delete(lookup_dashboard_stats(timezone.localdate())[0])
+        response = self.client.get(reverse('inventory:async-dashboard'))
+        self.assertEqual(response.json()['today']['quantity_sold'], 7)
+
+    @override_settings(METRICS_ENABLED=True)
+    async def test_metrics_count_worker_thread_queries(self):
+        registry.reset()
+        query = '?type=summary'
+        response = await sync_to_async(self.client.get)(reverse('inventory:reports') + query)
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get(
+            reverse('inventory:async-reports') + query,
+            headers={'Authorization': self.client.defaults['HTTP_AUTHORIZATION']},
+        )
+        self.assertEqual(response.status_code, 200)
+        text = registry.render()
+        counts = {
+            name: next(
+                line.rsplit(' ', 1)[1] for line in text.splitlines()
+                if line.startswith(f'inventory_db_queries_total{{view="inventory:{name}"')
+            )
+            for name in ('reports', 'async-reports')
+        }
+        # The same queries less the user lookup, cached by the first request,
+        # though the async view runs its three on thread_sensitive=False workers
+        self.assertEqual(counts, {'reports': '5', 'async-reports': '4'})
+
+    def test_errors(self):
+        url = reverse('inventory:async-reports')
+        self.assertEqual(self.client.get(url + '?type=weekly').status_code, 400)
+        self.assertEqual(
+            self.client.get(url + '?start_date=yesterday').json(),
+            {'start_date': 'Invalid date. Use YYYY-MM-DD.'},
+        )
+        self.assertEqual(self.client.post(url).status_code, 405)
+        del self.client.defaults['HTTP_AUTHORIZATION']
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+
+class LiveEventsTests(TestCase):
+    """Committed writes reach /api/events/ subscribers through the broadcaster"""
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user('cashier', password='cashier123')
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        self.tea = make_tea(stock_quantity=50)
+
+    def test_sales_publish_deltas_after_commit(self):
+        with mock.patch.object(broadcaster, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                Sale.objects.bulk_record([
+                    Sale(tea=self.tea, quantity=2, sold_by=self.user),
+                    Sale(tea=self.tea, quantity=3, sold_by=self.user),
+                ])
+                publish.assert_not_called()
+        publish.assert_called_once_with('sales', {
+            'dashboard': [{
+                'day': timezone.localdate(), 'sales_count': 2,
+                'revenue': Decimal('2250.00'), 'quantity_sold': 5,
+            }],
+            'stock': [{'tea_id': self.tea.pk, 'sold': 5}],
+        })
+
+        with mock.patch.object(broadcaster, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.tea.stock_quantity = 8
+                self.tea.save()
+        publish.assert_called_once_with('stock', {
+            'tea_id': self.tea.pk, 'stock_quantity': 8,
+            'reorder_level': 10, 'is_low_stock': True,
+        })
+
+    async def test_replay_and_reset(self):
+        events = Broadcaster(history=2, max_pending=2)
+        for _ in range(3):
+            events.publish('sales', {})
+
+        caught_up = events.subscribe(last_event_id=2)
+        self.assertTrue(caught_up.queue.get_nowait().startswith(b'id: 3\n'))
+        self.assertTrue(caught_up.queue.empty())
+        for last_event_id in (0, 99):
+            subscription = events.subscribe(last_event_id)
+            self.assertEqual(subscription.queue.get_nowait(), RESET_FRAME)
+
+        # A subscriber that falls too far behind is told to refetch
+        for _ in range(3):
+            events.publish('sales', {})
+        await asyncio.sleep(0)
+        self.assertEqual(caught_up.queue.get_nowait(), RESET_FRAME)
+        self.assertTrue(caught_up.queue.empty())
+
+    async def test_stream(self):
+        url = reverse('inventory:live-events')
+        self.assertEqual((await self.async_client.get(url)).status_code, 401)
+
+        response = await self.async_client.get(url, headers=self.headers)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+        event_id = broadcaster.publish('stock', {'tea_id': 1})
+        self.assertEqual(
+            await anext(stream),
+            f'id: {event_id}\nevent: stock\ndata: {{"tea_id":1}}\n\n'.encode(),
+        )
+        with override_settings(EVENTS_KEEPALIVE_SECONDS=0):
+            self.assertEqual(await anext(stream), KEEPALIVE_FRAME)
+
+    @override_settings(EVENTS_STREAM_SECONDS=0)
+    async def test_stream_ends_for_the_client_to_reconnect(self):
+        subscribers = broadcaster.subscriber_count
+        response = await self.async_client.get(
+            reverse('inventory:live-events'), headers=self.headers
+        )
+        frames = [frame async for frame in response.streaming_content]
+        self.assertEqual(frames, [b'retry: 3000\n\n'])
+        self.assertEqual(broadcaster.subscriber_count, subscribers)
+
+
+class ConcurrentSaleStressTests(TransactionTestCase):
+    """Parallel tills selling the same tea must neither oversell nor lose updates"""
+
+    TILLS = 8
+    SALES_PER_TILL = 25
+    STOCK = 120
+
+    def setUp(self):
+        self.user = User.objects.create_user('cashier', password='cashier123')
+        self.tea = make_tea(stock_quantity=self.STOCK)
+
+    def _till(self, results):
+        sold = rejected = 0
+        try:
+            for _ in range(self.SALES_PER_TILL):
+                while True:
+                    try:
+                        Sale.objects.create(tea=self.tea, quantity=1, sold_by=self.user)
+                        sold += 1
+                    except InsufficientStock:
+                        rejected += 1
+                    except OperationalError:
+                        # SQLite reports lock contention instead of blocking
+                        time.sleep(0.001)
+                        continue
+                    break
+        finally:
+            connection.close()
+        results.append((sold, rejected))
+
+    def test_parallel_tills(self):
+        results = []
+        threads = [
+            threading.Thread(target=self._till, args=(results,))
+            for _ in range(self.TILLS)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        attempts = self.TILLS * self.SALES_PER_TILL
+        sold = sum(r[0] for r in results)
+        rejected = sum(r[1] for r in results)
+
+        self.assertEqual(len(results), self.TILLS)
+        self.assertEqual(sold + rejected, attempts)
+        self.assertEqual(sold, self.STOCK)
+        self.assertEqual(Sale.objects.count(), self.STOCK)
+        self.assertEqual(Tea.objects.get(pk=self.tea.pk).stock_quantity, 0)
+        # Generous floor: a conditional UPDATE path handles far more than this
+        self.assertGreater(attempts / elapsed, 50)
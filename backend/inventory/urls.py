@@ -1,7 +1,9 @@
 from django.urls import path
+from .async_views import async_reports_view, async_dashboard_view, live_events_view
 from .views import (
-    TeaListView, TeaDetailView, SaleListCreateView, 
-    LoginView, reports_view, dashboard_stats
+    TeaListView, TeaDetailView, SaleListCreateView, CheckoutView, SaleExportView,
+    SaleReplayView, LoginView, RefreshTokenView, reports_view, top_selling_view,
+    dashboard_stats, dashboard_cache_view, low_stock_alerts_view, metrics_view
 )
 
 app_name = 'inventory'
@@ -13,11 +15,30 @@ urlpatterns = [
     
     # Sales endpoints
     path('sales/', SaleListCreateView.as_view(), name='sale-list-create'),
+    path('sales/checkout/', CheckoutView.as_view(), name='sale-checkout'),
+    path('sales/export/', SaleExportView.as_view(), name='sale-export'),
+    path('sales/replay/', SaleReplayView.as_view(), name='sale-replay'),
     
     # Authentication endpoints
     path('login/', LoginView.as_view(), name='login'),
+    path('token/refresh/', RefreshTokenView.as_view(), name='token-refresh'),
     
     # Reports endpoints
     path('reports/', reports_view, name='reports'),
+    path('reports/top-selling/', top_selling_view, name='reports-top-selling'),
     path('dashboard/', dashboard_stats, name='dashboard'),
+    path('dashboard/cache/', dashboard_cache_view, name='dashboard-cache'),
+    
+    # Alert feeds
+    path('alerts/low-stock/', low_stock_alerts_view, name='low-stock-alerts'),
+    
+    # Async (ASGI) variants that run independent queries concurrently
+    path('async/reports/', async_reports_view, name='async-reports'),
+    path('async/dashboard/', async_dashboard_view, name='async-dashboard'),
+    
+    # Live updates (server-sent events, ASGI only)
+    path('events/', live_events_view, name='live-events'),
+    
+    # Monitoring endpoints
+    path('metrics/', metrics_view, name='metrics'),
 ] 
\ No newline at end of file
@@ -0,0 +1,52 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+
+
+def start_of_day(day):
+    """Aware datetime for local midnight (Asia/Colombo) at the start of ``day``"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def local_day_range(start_date, end_date=None):
+    """
+    Half-open [start, end) datetime bounds covering the local days from
+    start_date to end_date inclusive. Filtering ``sold_at`` with these keeps
+    the column bare, so the database can use its indexes, unlike
+    ``sold_at__date`` which casts every row.
+    """
+    end_date = end_date or start_date
+    return start_of_day(start_date), start_of_day(end_date + timedelta(days=1))
+
+
+def parse_date_param(value, name):
+    """Parse a YYYY-MM-DD query parameter, answering 400 when it is malformed"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise serializers.ValidationError({name: 'Invalid date. Use YYYY-MM-DD.'})
+
+
+def parse_int_param(value, name, min_value=None, max_value=None):
+    """Parse an integer query parameter within bounds, answering 400 otherwise"""
+    try:
+        return serializers.IntegerField(
+            min_value=min_value, max_value=max_value
+        ).run_validation(value)
+    except serializers.ValidationError as exc:
+        raise serializers.ValidationError({name: exc.detail})
+
+
+def parse_datetime_param(value, name):
+    """Parse an ISO 8601 query parameter, read as local time when it has no offset"""
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise serializers.ValidationError({name: 'Invalid timestamp. Use ISO 8601.'})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
@@ -1,35 +1,159 @@
+import csv
+import itertools
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.contrib.auth.models import User
-from django.db.models import Sum, Count, Q
+from django.db import IntegrityError
+from django.db.models import Sum, Count, Max, Q, Subquery
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import timedelta
 # Import F for the category report
 from django.db.models import F
+from django.db.models.functions import (
+    Coalesce, ExtractHour, ExtractIsoWeekDay, TruncHour, TruncMonth, TruncWeek
+)
 
-from rest_framework import generics, status, permissions
+from rest_framework import generics, status, permissions, serializers
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenRefreshView
 
-from .models import Tea, Sale, UserProfile
+from .models import (
+    Tea, Sale, DailySalesRollup, PrecomputedReport, StockAlert, TeaTombstone,
+    UserProfile, InsufficientStock
+)
+from .cache import cached_dashboard_stats, dashboard_cache_stats
+from .conditional import ConditionalGetMixin
+from .metrics import registry
+from .pagination import (
+    KeysetPaginationMixin, SaleKeysetPagination, TeaKeysetPagination, TeaSearchKeysetPagination
+)
+from .routers import (
+    ReplicaReadMixin, read_alias, read_from_replica, reads_use_replica, replica_reads
+)
+from .search import search_teas, search_words
+from .utils import (
+    local_day_range, parse_date_param, parse_datetime_param, parse_int_param, start_of_day
+)
 from .serializers import (
-    TeaSerializer, SaleSerializer, SaleCreateSerializer, 
+    TeaSerializer, SaleSerializer, SaleRowSerializer, SaleCreateSerializer,
+    CheckoutSerializer, CheckoutItemSerializer, SaleReplaySerializer, SaleReplayItemSerializer,
+    RefreshTokenSerializer, StockAlertSerializer,
     LoginSerializer, SalesReportSerializer, CategoryReportSerializer,
     UserProfileSerializer
 )
 
 
-class TeaListView(generics.ListCreateAPIView):
+def filter_sales(queryset, params):
+    """Apply the start_date, end_date and category filters shared by sales endpoints"""
+    start_date = params.get('start_date', None)
+    end_date = params.get('end_date', None)
+    
+    # Half-open local-time bounds keep sold_at indexable
+    if start_date:
+        start_date = parse_date_param(start_date, 'start_date')
+        queryset = queryset.filter(sold_at__gte=start_of_day(start_date))
+    if end_date:
+        end_date = parse_date_param(end_date, 'end_date')
+        queryset = queryset.filter(
+            sold_at__lt=start_of_day(end_date + timedelta(days=1))
+        )
+    
+    # Filter by tea category
+    category = params.get('category', None)
+    if category:
+        queryset = queryset.filter(tea__category__iexact=category)
+    
+    return queryset
+
+
+class TeaListView(ReplicaReadMixin, ConditionalGetMixin, KeysetPaginationMixin,
+                  generics.ListCreateAPIView):
     """
     API endpoint for listing and creating teas.
     Supports filtering by category: /api/teas/?category=Black
+    Add ?pagination=cursor for keyset pages ordered by (name, id), or by
+    relevance when searching.
+    Sends ETag/Last-Modified and answers unchanged catalogues with 304.
+    Add ?since=<watermark> for a delta sync of the whole catalogue.
     """
     queryset = Tea.objects.all()
+    keyset_pagination_class = TeaKeysetPagination
     serializer_class = TeaSerializer
     permission_classes = [IsAuthenticated]
     
+    def reads_use_replica(self, request):
+        # A lagging replica could let a sync watermark pass changes it never showed
+        if 'since' in request.query_params:
+            return False
+        return super().reads_use_replica(request)
+    
+    def get_keyset_pagination_class(self):
+        # Paging search results by name would throw their ranking away
+        if search_words(self.request.query_params.get('search') or ''):
+            return TeaSearchKeysetPagination
+        return super().get_keyset_pagination_class()
+    
+    def list(self, request, *args, **kwargs):
+        if 'since' in request.query_params:
+            return self.sync(request)
+        return super().list(request, *args, **kwargs)
+    
+    def sync(self, request):
+        """
+        The teas created or updated at or after ?since= (the watermark from
+        the previous sync), the ids of teas deleted since, and the next
+        watermark. A blank watermark, or one older than the tombstones go
+        back, returns every tea with reset=true for the client to start over.
+        """
+        now = timezone.now()
+        since = request.query_params['since']
+        if since:
+            since = parse_datetime_param(since, 'since')
+        horizon = now - timedelta(days=settings.TEA_TOMBSTONE_RETENTION_DAYS)
+        reset = not since or since < horizon
+        
+        if reset:
+            teas, deleted = Tea.objects.all(), []
+        else:
+            teas = Tea.objects.filter(updated_at__gte=since)
+            deleted = TeaTombstone.objects.filter(deleted_at__gte=since).values_list(
+                'tea_id', flat=True
+            )
+        return Response({
+            # Held back so writes that commit late are picked up next time
+            'watermark': now - timedelta(seconds=settings.CATALOGUE_SYNC_OVERLAP_SECONDS),
+            'reset': reset,
+            'teas': self.get_serializer(teas, many=True).data,
+            'deleted': list(deleted),
+        })
+    
+    def get_validators(self):
+        # Any edit, sale or addition moves max(updated_at); deletions leave a
+        # tombstone, so the latest one counts as a modification too
+        last_deleted = TeaTombstone.objects.order_by('-deleted_at').values('deleted_at')[:1]
+        catalogue = Tea.objects.aggregate(
+            last_modified=Max('updated_at'),
+            last_deleted=Max(Subquery(last_deleted)),
+            count=Count('id'),
+        )
+        last_modified = max(
+            (stamp for stamp in (catalogue['last_modified'], catalogue['last_deleted']) if stamp),
+            default=None,
+        )
+        stamp = last_modified.isoformat() if last_modified else ''
+        return f"{stamp}:{catalogue['count']}", last_modified
+    
     def get_queryset(self):
         queryset = Tea.objects.all()
         category = self.request.query_params.get('category', None)
@@ -40,9 +164,8 @@ class TeaListView(generics.ListCreateAPIView):
         # Additional filters
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | Q(description__icontains=search)
-            )
+            # Indexed, relevance-ranked and typo tolerant on PostgreSQL
+            queryset = search_teas(queryset, search)
         
         in_stock_only = self.request.query_params.get('in_stock', None)
         if in_stock_only and in_stock_only.lower() == 'true':
@@ -51,19 +174,58 @@ class TeaListView(generics.ListCreateAPIView):
         return queryset
 
 
-class TeaDetailView(generics.RetrieveUpdateDestroyAPIView):
+class TeaDetailView(ReplicaReadMixin, ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """API endpoint for individual tea operations"""
     queryset = Tea.objects.all()
     serializer_class = TeaSerializer
     permission_classes = [IsAuthenticated]
+    
+    def get_validators(self):
+        last_modified = Tea.objects.filter(pk=self.kwargs['pk']).values_list(
+            'updated_at', flat=True
+        ).first()
+        if last_modified is None:
+            # Let the normal lookup answer 404
+            return None, None
+        return last_modified.isoformat(), last_modified
+
+
+# Sale.idempotency_key holds 64 characters; a checkout stores '<key>:<line>'
+# on each of its sales, so its own key leaves room for the line number, and
+# clients may not use ':' so those keys never collide with theirs
+IDEMPOTENCY_KEY_MAX_LENGTH = 64
+CHECKOUT_KEY_MAX_LENGTH = 48
 
 
-class SaleListCreateView(generics.ListCreateAPIView):
+def idempotency_key(request, max_length=IDEMPOTENCY_KEY_MAX_LENGTH):
+    """The request's Idempotency-Key header without surrounding whitespace, or None"""
+    key = request.headers.get('Idempotency-Key')
+    if key is None:
+        return None
+    key = key.strip()
+    if not key:
+        raise serializers.ValidationError(
+            {'idempotency_key': 'Idempotency-Key must not be blank.'}
+        )
+    if len(key) > max_length:
+        raise serializers.ValidationError(
+            {'idempotency_key': f'Idempotency-Key must be at most {max_length} characters.'}
+        )
+    if ':' in key:
+        raise serializers.ValidationError(
+            {'idempotency_key': "Idempotency-Key must not contain ':'."}
+        )
+    return key
+
+
+class SaleListCreateView(ReplicaReadMixin, KeysetPaginationMixin, generics.ListCreateAPIView):
     """
     API endpoint for listing sales and recording new sales.
     POST /api/sales/ with tea ID and quantity to record a sale.
+    Add ?pagination=cursor for keyset pages ordered by (-sold_at, id).
     """
     queryset = Sale.objects.all()
+    keyset_pagination_class = SaleKeysetPagination
     permission_classes = [IsAuthenticated]
     
     def get_serializer_class(self):
@@ -71,6 +233,25 @@ class SaleListCreateView(generics.ListCreateAPIView):
             return SaleCreateSerializer
         return SaleSerializer
     
+    def create(self, request, *args, **kwargs):
+        # A retry with the same Idempotency-Key gets the sale recorded the first time
+        self.idempotency_key = key = idempotency_key(request)
+        if key is not None:
+            sale = Sale.objects.filter(sold_by=request.user, idempotency_key=key).first()
+            if sale is not None:
+                return Response(SaleCreateSerializer(sale).data, status=status.HTTP_200_OK)
+        try:
+            return super().create(request, *args, **kwargs)
+        except IntegrityError:
+            # A concurrent retry recorded it first and this attempt was rolled
+            # back; any other integrity error is not ours to answer
+            sale = None
+            if key is not None:
+                sale = Sale.objects.filter(sold_by=request.user, idempotency_key=key).first()
+            if sale is None:
+                raise
+            return Response(SaleCreateSerializer(sale).data, status=status.HTTP_200_OK)
+    
     def perform_create(self, serializer):
         # Set the user who made the sale
         tea = serializer.validated_data['tea']
@@ -80,36 +261,284 @@ class SaleListCreateView(generics.ListCreateAPIView):
         unit_price = tea.price
         total_amount = quantity * unit_price
         
-        sale = serializer.save(
-            sold_by=self.request.user,
-            unit_price=unit_price,
-            total_amount=total_amount
+        # Sale.save() takes the stock atomically and refuses to oversell
+        try:
+            return serializer.save(
+                sold_by=self.request.user,
+                unit_price=unit_price,
+                total_amount=total_amount,
+                idempotency_key=self.idempotency_key
+            )
+        except InsufficientStock as exc:
+            raise serializers.ValidationError(
+                {api_settings.NON_FIELD_ERRORS_KEY: [str(exc)]}
+            )
+    
+    def list(self, request, *args, **kwargs):
+        # Build rows from value tuples: one query per page, no model instances
+        rows = SaleRowSerializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(SaleRowSerializer(page, many=True).data)
+        return Response(SaleRowSerializer(rows, many=True).data)
+    
+    def get_queryset(self):
+        queryset = Sale.objects.select_related('tea', 'sold_by')
+        return filter_sales(queryset, self.request.query_params)
+
+
+class SaleExportView(APIView):
+    """
+    API endpoint for full sales exports.
+    GET /api/sales/export/?output=csv (or ndjson) streams every matching sale
+    in constant memory, under WSGI or ASGI. Accepts the same filters as
+    /api/sales/.
+    """
+    permission_classes = [IsAuthenticated]
+    chunk_size = 2000
+    
+    def get(self, request):
+        output = request.query_params.get('output', 'csv')
+        if output not in ('csv', 'ndjson'):
+            return Response(
+                {'error': 'Invalid output. Use: csv or ndjson'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Rows are read while streaming, after get() returns, so pick the
+        # database explicitly rather than through read_from_replica()
+        sales = filter_sales(
+            Sale.objects.using(read_alias(request.user)), request.query_params
+        )
+        # Oldest first; iterator() reads through a server-side cursor on PostgreSQL
+        rows = SaleRowSerializer.values(sales.order_by('sold_at', 'id')).iterator(
+            chunk_size=self.chunk_size
         )
+        serializer = SaleRowSerializer()
+        records = (serializer.to_representation(row) for row in rows)
         
-        # Update tea stock
-        tea.stock_quantity = max(0, tea.stock_quantity - quantity)
-        tea.save()
+        if output == 'csv':
+            content, content_type = self._csv(records), 'text/csv'
+        else:
+            content, content_type = self._ndjson(records), 'application/x-ndjson'
+        if isinstance(request._request, ASGIRequest):
+            # Django drains a sync iterator into a list before an ASGI server
+            # sends any of it; hand over an async one that reads chunk by chunk
+            content = _chunks_from_sync(content, self.chunk_size)
         
-        return sale
+        response = StreamingHttpResponse(content, content_type=content_type)
+        filename = f"sales-{timezone.localdate().isoformat()}.{output}"
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
     
-    def get_queryset(self):
-        queryset = Sale.objects.all()
+    def _csv(self, records):
+        header = [key for key, _ in SaleRowSerializer.columns]
+        writer = csv.writer(_Echo())
+        yield writer.writerow(header)
+        for record in records:
+            yield writer.writerow([record[key] for key in header])
+    
+    def _ndjson(self, records):
+        encoder = JSONEncoder(ensure_ascii=False)
+        for record in records:
+            yield encoder.encode(record) + '\n'
+
+
+async def _chunks_from_sync(lines, size):
+    """
+    Stream a sync iterator of text lines asynchronously, ``size`` lines per
+    hop to the sync thread, which also holds the export's database cursor
+    """
+    next_chunk = sync_to_async(lambda: ''.join(itertools.islice(lines, size)))
+    try:
+        while chunk := await next_chunk():
+            yield chunk
+    finally:
+        # Closes the server-side cursor when the client goes away early
+        await sync_to_async(lines.close)()
+
+
+class _Echo:
+    """File-like object whose write() hands the line back for streaming"""
+    
+    def write(self, value):
+        return value
+
+
+class CheckoutView(APIView):
+    """
+    API endpoint for recording a whole cart in one request.
+    POST /api/sales/checkout/ with a list of {tea, quantity} items.
+    Either every line is sold or none is. With an Idempotency-Key header a
+    retried checkout returns the sales recorded the first time; reusing the
+    key for a different cart is refused with 422.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def recorded(self, key, lines):
+        """
+        The sales of an earlier checkout with this key, in line order. One
+        line past the request's is looked up too, so a longer cart shows up.
+        """
+        keys = [f'{key}:{line}' for line in range(lines + 1)]
+        return list(Sale.objects.select_related('tea', 'sold_by').filter(
+            sold_by=self.request.user, idempotency_key__in=keys
+        ).order_by('id'))
+    
+    def replay(self, sales, data):
+        """
+        Answer a retry with the recorded sales, unless they are not the cart
+        this request asks for. The sales themselves are the stored request.
+        """
+        items = CheckoutItemSerializer(data=data.get('items'), many=True)
+        requested = None
+        if items.is_valid():
+            requested = [(item['tea'], item['quantity']) for item in items.validated_data]
+        recorded = [(sale.tea_id, sale.quantity) for sale in sales]
+        if requested != recorded or any(
+            (data.get(field) or None) != (getattr(sales[0], field) or None)
+            for field in ('customer_name', 'notes')
+        ):
+            return Response(
+                {'idempotency_key': 'Idempotency-Key was already used for a different checkout.'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        return self.checkout_response(sales, status.HTTP_200_OK)
+    
+    def checkout_response(self, sales, status_code):
+        return Response({
+            'sales': SaleSerializer(sales, many=True).data,
+            'total_quantity': sum(sale.quantity for sale in sales),
+            'total_amount': sum(sale.total_amount for sale in sales),
+        }, status=status_code)
+    
+    def post(self, request):
+        key = idempotency_key(request, CHECKOUT_KEY_MAX_LENGTH)
+        body = request.data if hasattr(request.data, 'get') else {}
+        items = body.get('items')
+        lines = len(items) if isinstance(items, list) else 0
+        if key is not None:
+            sales = self.recorded(key, lines)
+            if sales:
+                return self.replay(sales, body)
         
-        # Filter by date range
-        start_date = self.request.query_params.get('start_date', None)
-        end_date = self.request.query_params.get('end_date', None)
+        serializer = CheckoutSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        if start_date:
-            queryset = queryset.filter(sold_at__date__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(sold_at__date__lte=end_date)
+        data = serializer.validated_data
+        teas = data['teas']
+        sales = [
+            Sale(
+                tea=teas[item['tea']],
+                quantity=item['quantity'],
+                sold_by=request.user,
+                customer_name=data.get('customer_name'),
+                notes=data.get('notes'),
+                idempotency_key=f'{key}:{line}' if key is not None else None,
+            )
+            for line, item in enumerate(data['items'])
+        ]
         
-        # Filter by tea category
-        category = self.request.query_params.get('category', None)
-        if category:
-            queryset = queryset.filter(tea__category__iexact=category)
-            
-        return queryset
+        try:
+            sales = Sale.objects.bulk_record(sales)
+        except InsufficientStock as exc:
+            return Response(
+                {api_settings.NON_FIELD_ERRORS_KEY: [str(exc)]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except IntegrityError:
+            # A concurrent retry recorded the cart first; this one was rolled back
+            sales = self.recorded(key, lines) if key is not None else None
+            if not sales:
+                raise
+            return self.replay(sales, body)
+        
+        return self.checkout_response(sales, status.HTTP_201_CREATED)
+
+
+class SaleReplayView(APIView):
+    """
+    API endpoint for replaying sales queued while a till was offline.
+    POST /api/sales/replay/ with {"sales": [{idempotency_key, tea, quantity,
+    sold_at, ...}]}. Each sale is recorded at most once per key and gets its
+    own result, so one short or invalid sale does not hold up the others.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        serializer = SaleReplaySerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        results, valid = [], []
+        for raw in serializer.validated_data['sales']:
+            item = SaleReplayItemSerializer(data=raw)
+            if item.is_valid():
+                results.append({'idempotency_key': item.validated_data['idempotency_key']})
+                valid.append((results[-1], item.validated_data))
+            else:
+                results.append({
+                    'idempotency_key': raw.get('idempotency_key'),
+                    'status': 'error',
+                    'errors': item.errors,
+                })
+        
+        # Keys already recorded, and the teas, in one query each
+        recorded = dict(Sale.objects.filter(
+            sold_by=request.user,
+            idempotency_key__in=[data['idempotency_key'] for _, data in valid],
+        ).values_list('idempotency_key', 'id'))
+        teas = Tea.objects.in_bulk({data['tea'] for _, data in valid})
+        
+        pending, first_by_key, repeats = [], {}, []
+        for result, data in valid:
+            key = data['idempotency_key']
+            if key in recorded:
+                result.update(status='duplicate', sale_id=recorded[key])
+            elif key in first_by_key:
+                # Queued twice in this batch; it shares the first one's result
+                repeats.append((result, first_by_key[key]))
+            elif data['tea'] not in teas:
+                result.update(status='error', errors={'tea': [f"Unknown tea id: {data['tea']}"]})
+            else:
+                first_by_key[key] = result
+                pending.append((result, Sale(
+                    tea=teas[data['tea']],
+                    quantity=data['quantity'],
+                    sold_by=request.user,
+                    sold_at=data.get('sold_at') or timezone.now(),
+                    customer_name=data.get('customer_name'),
+                    notes=data.get('notes'),
+                    idempotency_key=key,
+                )))
+        
+        outcomes = Sale.objects.record_each([sale for _, sale in pending]) if pending else []
+        for (result, sale), outcome in zip(pending, outcomes):
+            if isinstance(outcome, Sale):
+                result.update(status='created', sale_id=outcome.pk)
+            elif isinstance(outcome, InsufficientStock):
+                result.update(
+                    status='error', errors={api_settings.NON_FIELD_ERRORS_KEY: [str(outcome)]}
+                )
+            else:
+                # A concurrent replay of the same backlog recorded it first
+                result.update(status='duplicate', sale_id=Sale.objects.filter(
+                    sold_by=request.user, idempotency_key=sale.idempotency_key
+                ).values_list('id', flat=True).first())
+        for result, first in repeats:
+            if first['status'] == 'error':
+                result.update(status='error', errors=first['errors'])
+            else:
+                result.update(status='duplicate', sale_id=first['sale_id'])
+        
+        counts = Counter(result['status'] for result in results)
+        return Response({
+            'results': results,
+            'created': counts['created'],
+            'duplicate': counts['duplicate'],
+            'failed': counts['error'],
+        })
 
 
 class LoginView(APIView):
@@ -123,11 +552,15 @@ class LoginView(APIView):
         serializer = LoginSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.validated_data['user']
-            refresh = RefreshToken.for_user(user)
             
             # Get or create user profile
             profile, created = UserProfile.objects.get_or_create(user=user)
             
+            # Signed claims let clients read the role without another call
+            refresh = RefreshToken.for_user(user)
+            refresh['username'] = user.username
+            refresh['role'] = profile.role
+            
             return Response({
                 'refresh': str(refresh),
                 'access': str(refresh.access_token),
@@ -143,142 +576,425 @@ class LoginView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def reports_view(request):
+class RefreshTokenView(TokenRefreshView):
     """
-    API endpoint for various reports.
-    GET /api/reports/ returns daily sales, category sales, and other analytics.
+    API endpoint for renewing an expired access token.
+    POST /api/token/refresh/ with the refresh token from login to get a new
+    access token (and a rotated refresh token) without the password check.
     """
+    serializer_class = RefreshTokenSerializer
+
+
+REPORT_NAMES = {
+    'daily': 'daily_sales',
+    'category': 'category_sales',
+    'summary': 'summary',
+    'timeseries': 'sales_timeseries',
+    'heatmap': 'sales_heatmap',
+}
+
+# Reports without options, which precompute_reports can keep warm
+PRECOMPUTED_REPORTS = ('daily', 'category', 'summary')
+
+INVALID_REPORT_TYPE = (
+    'Invalid report type. Use: daily, category, summary, timeseries, or heatmap'
+)
+
+GRANULARITIES = ('hour', 'day', 'week', 'month')
+GROUP_BY_CHOICES = ('category', 'tea')
+
+
+def report_dates(params):
+    """Report range from start_date/end_date, defaulting to the last 30 days"""
+    start_date = params.get('start_date', None)
+    end_date = params.get('end_date', None)
     
-    # Get query parameters
-    report_type = request.query_params.get('type', 'daily')
-    start_date = request.query_params.get('start_date', None)
-    end_date = request.query_params.get('end_date', None)
-    
-    # Default to last 30 days if no dates provided
     if not end_date:
-        end_date = timezone.now().date()
+        end_date = timezone.localdate()
     else:
-        end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+        end_date = parse_date_param(end_date, 'end_date')
     
     if not start_date:
         start_date = end_date - timedelta(days=30)
     else:
-        start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+        start_date = parse_date_param(start_date, 'start_date')
+    return start_date, end_date
+
+
+def report_options(params):
+    """granularity and group_by for a timeseries report, validated"""
+    granularity = params.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        raise serializers.ValidationError(
+            {'granularity': f"Use one of: {', '.join(GRANULARITIES)}."}
+        )
+    group_by = params.get('group_by') or None
+    if group_by is not None and group_by not in GROUP_BY_CHOICES:
+        raise serializers.ValidationError(
+            {'group_by': f"Use one of: {', '.join(GROUP_BY_CHOICES)}."}
+        )
+    return {'granularity': granularity, 'group_by': group_by}
+
+
+def timeseries_rows(start_date, end_date, granularity='day', group_by=None):
+    """
+    Sales totals per time bucket, optionally split by category or tea, from
+    one grouped query. Buckets are truncated in local (Asia/Colombo) time
+    and labelled by their first day, or first hour for hourly buckets; the
+    first and last week or month only cover the part inside the range.
+    """
+    if granularity == 'hour':
+        # The rollup is per day, so hourly buckets come from the raw sales
+        start, end = local_day_range(start_date, end_date)
+        rows = Sale.objects.filter(sold_at__gte=start, sold_at__lt=end)
+        bucket = TruncHour('sold_at')
+        totals = {
+            'total_sales': Sum('total_amount'),
+            'total_quantity': Sum('quantity'),
+            'sale_count': Count('id'),
+        }
+    else:
+        # Rollup days are already local dates
+        rows = DailySalesRollup.objects.filter(day__range=[start_date, end_date])
+        bucket = {
+            'day': F('day'),
+            'week': TruncWeek('day'),
+            'month': TruncMonth('day'),
+        }[granularity]
+        totals = {
+            'total_sales': Sum('revenue'),
+            'total_quantity': Sum('quantity'),
+            'sale_count': Sum('sale_count'),
+        }
+    
+    fields, expressions = [], {}
+    if group_by == 'category' and granularity == 'hour':
+        expressions = {'category': F('tea__category')}
+    elif group_by == 'category':
+        # The rollup keeps each row's category itself
+        fields = ['category']
+    elif group_by == 'tea':
+        fields, expressions = ['tea_id'], {'tea_name': F('tea__name')}
+    return rows.values(*fields, bucket=bucket, **expressions).annotate(
+        **totals
+    ).order_by('bucket', *fields, *expressions)
+
+
+def report_queries(report_type, start_date, end_date, granularity='day', group_by=None):
+    """
+    The independent queries behind a report, as {payload key: callable}.
+    Returns None for an unknown report type.
+    """
+    # Sales figures come from the daily rollup, which stays small no matter
+    # how many raw sales rows exist
+    rollups = DailySalesRollup.objects.filter(day__range=[start_date, end_date])
     
     if report_type == 'daily':
         # Daily sales report
-        daily_sales = Sale.objects.filter(
-            sold_at__date__range=[start_date, end_date]
-        ).extra(
-            select={'date': 'DATE(sold_at)'}
-        ).values('date').annotate(
-            total_sales=Sum('total_amount'),
+        daily_sales = rollups.values(date=F('day')).annotate(
+            total_sales=Sum('revenue'),
             total_quantity=Sum('quantity'),
             tea_count=Count('tea', distinct=True)
         ).order_by('date')
-        
-        return Response({
-            'type': 'daily_sales',
-            'start_date': start_date,
-            'end_date': end_date,
-            'data': daily_sales
-        })
+        return {'data': lambda: list(daily_sales)}
     
     elif report_type == 'category':
         # Category-wise sales report
-        category_sales = Sale.objects.filter(
-            sold_at__date__range=[start_date, end_date]
-        ).values('tea__category').annotate(
-            category=F('tea__category'),
-            total_sales=Sum('total_amount'),
+        # tea__category is kept so the rows have the same keys as before
+        category_sales = rollups.values(
+            'category', **{'tea__category': F('category')}
+        ).annotate(
+            total_sales=Sum('revenue'),
             total_quantity=Sum('quantity'),
             tea_count=Count('tea', distinct=True)
         ).order_by('-total_sales')
-        
-        return Response({
-            'type': 'category_sales',
-            'start_date': start_date,
-            'end_date': end_date,
-            'data': category_sales
-        })
+        return {'data': lambda: list(category_sales)}
     
     elif report_type == 'summary':
         # Summary report
-        total_sales = Sale.objects.filter(
-            sold_at__date__range=[start_date, end_date]
-        ).aggregate(
-            total_amount=Sum('total_amount'),
-            total_quantity=Sum('quantity'),
-            total_transactions=Count('id')
-        )
+        def total_sales():
+            return rollups.aggregate(
+                total_amount=Sum('revenue'),
+                total_quantity=Sum('quantity'),
+                total_transactions=Coalesce(Sum('sale_count'), 0)
+            )
         
         # Top selling teas
-        top_teas = Sale.objects.filter(
-            sold_at__date__range=[start_date, end_date]
-        ).values('tea__name', 'tea__category').annotate(
-            total_sold=Sum('quantity'),
-            total_revenue=Sum('total_amount')
-        ).order_by('-total_sold')[:10]
+        top_teas = DailySalesRollup.objects.top_sellers(start_date, end_date, limit=10)
         
         # Low stock alerts
-        low_stock_teas = Tea.objects.filter(stock_quantity__lt=10).values(
-            'name', 'category', 'stock_quantity'
+        low_stock_teas = Tea.objects.low_stock().values(
+            'name', 'category', 'stock_quantity', 'reorder_level'
         )
         
-        return Response({
-            'type': 'summary',
-            'start_date': start_date,
-            'end_date': end_date,
+        return {
             'totals': total_sales,
-            'top_teas': top_teas,
-            'low_stock_alerts': low_stock_teas
-        })
+            'top_teas': lambda: list(top_teas),
+            'low_stock_alerts': lambda: list(low_stock_teas),
+        }
     
-    else:
+    elif report_type == 'timeseries':
+        data = timeseries_rows(start_date, end_date, granularity, group_by)
+        return {'data': lambda: list(data)}
+    
+    elif report_type == 'heatmap':
+        # Sales by local weekday (1 = Monday) and hour of day, from one scan
+        start, end = local_day_range(start_date, end_date)
+        cells = Sale.objects.filter(sold_at__gte=start, sold_at__lt=end).values(
+            weekday=ExtractIsoWeekDay('sold_at'), hour=ExtractHour('sold_at')
+        ).annotate(
+            sale_count=Count('id'),
+            total_quantity=Sum('quantity'),
+            total_sales=Sum('total_amount')
+        ).order_by('weekday', 'hour')
+        return {'data': lambda: list(cells)}
+    
+    return None
+
+
+def report_payload(report_type, start_date, end_date, results, options=None):
+    return {
+        'type': REPORT_NAMES[report_type],
+        'start_date': start_date,
+        'end_date': end_date,
+        **(options or {}),
+        **results,
+    }
+
+
+def compute_report(report_type, start_date, end_date, options=None):
+    queries = report_queries(report_type, start_date, end_date, **(options or {}))
+    results = {key: run() for key, run in queries.items()}
+    return report_payload(report_type, start_date, end_date, results, options)
+
+
+def standard_report_windows(today):
+    """The (start_date, end_date) windows precompute_reports keeps warm"""
+    return [
+        (today - timedelta(days=30), today),  # the default range
+        (today, today),
+        (today.replace(day=1), today),
+    ]
+
+
+def report_freshness(computed_at, precomputed):
+    return {
+        'precomputed': precomputed,
+        'computed_at': computed_at,
+        'age_seconds': int((timezone.now() - computed_at).total_seconds()),
+    }
+
+
+def precomputed_report(report_type, start_date, end_date):
+    """A stored payload for a standard window, with its age, or None"""
+    if report_type not in PRECOMPUTED_REPORTS:
+        return None
+    if (start_date, end_date) not in standard_report_windows(timezone.localdate()):
+        return None
+    report = PrecomputedReport.objects.fresh(
+        report_type, start_date, end_date,
+        max_age=timedelta(seconds=settings.REPORT_PRECOMPUTE_MAX_AGE),
+    )
+    if report is None:
+        return None
+    return {**report.payload, **report_freshness(report.computed_at, True)}
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@replica_reads
+def reports_view(request):
+    """
+    API endpoint for various reports.
+    GET /api/reports/ returns daily sales, category sales, and other analytics.
+    type=timeseries takes granularity=hour|day|week|month and group_by=category|tea.
+    """
+    
+    # Get query parameters
+    report_type = request.query_params.get('type', 'daily')
+    start_date, end_date = report_dates(request.query_params)
+    
+    if report_type not in REPORT_NAMES:
         return Response(
-            {'error': 'Invalid report type. Use: daily, category, or summary'},
+            {'error': INVALID_REPORT_TYPE},
             status=status.HTTP_400_BAD_REQUEST
         )
+    options = report_options(request.query_params) if report_type == 'timeseries' else None
+    
+    # Standard windows are usually waiting, precomputed by precompute_reports
+    payload = precomputed_report(report_type, start_date, end_date)
+    if payload is None:
+        computed_at = timezone.now()
+        payload = {
+            **compute_report(report_type, start_date, end_date, options),
+            **report_freshness(computed_at, False),
+        }
+    return Response(payload)
+
+
+TOP_SELLING_MAX_LIMIT = 50
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def dashboard_stats(request):
+@replica_reads
+def top_selling_view(request):
     """
-    API endpoint for dashboard statistics.
-    GET /api/dashboard/ returns key metrics for the dashboard.
+    API endpoint for the top-selling teas leaderboard.
+    GET /api/reports/top-selling/ ranks teas by quantity sold between
+    start_date and end_date (default: the last 30 days), ?limit= teas (default 10).
     """
-    today = timezone.now().date()
-    this_month = today.replace(day=1)
+    start_date, end_date = report_dates(request.query_params)
+    limit = parse_int_param(
+        request.query_params.get('limit', 10), 'limit', 1, TOP_SELLING_MAX_LIMIT
+    )
     
-    # Today's stats
-    today_stats = Sale.objects.filter(sold_at__date=today).aggregate(
-        sales_count=Count('id'),
-        revenue=Sum('total_amount'),
-        quantity_sold=Sum('quantity')
+    teas = DailySalesRollup.objects.top_sellers(start_date, end_date, limit=limit)
+    return Response({
+        'type': 'top_selling',
+        'start_date': start_date,
+        'end_date': end_date,
+        'limit': limit,
+        'data': list(teas),
+    })
+
+
+STOCK_ALERTS_MAX_LIMIT = 500
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def low_stock_alerts_view(request):
+    """
+    API endpoint for the low-stock alerts feed.
+    GET /api/alerts/low-stock/?after=<id> returns alerts newer than the
+    last one the client has seen, oldest first; pass back last_id next time.
+    Alerts are held back for STOCK_ALERT_FEED_LAG_SECONDS: ids are taken
+    before commit, so a newer alert can become visible before an older one.
+    """
+    after = parse_int_param(request.query_params.get('after', 0), 'after', 0)
+    limit = parse_int_param(
+        request.query_params.get('limit', 100), 'limit', 1, STOCK_ALERTS_MAX_LIMIT
     )
     
-    # This month's stats
-    month_stats = Sale.objects.filter(sold_at__date__gte=this_month).aggregate(
-        sales_count=Count('id'),
-        revenue=Sum('total_amount'),
-        quantity_sold=Sum('quantity')
+    # Read from the primary, so a client never moves past alerts a lagging
+    # replica has not shown it yet
+    settled = timezone.now() - timedelta(seconds=settings.STOCK_ALERT_FEED_LAG_SECONDS)
+    alerts = list(
+        StockAlert.objects.select_related('tea').filter(
+            id__gt=after, created_at__lte=settled
+        )[:limit + 1]
     )
+    has_more = len(alerts) > limit
+    alerts = alerts[:limit]
+    return Response({
+        'results': StockAlertSerializer(alerts, many=True).data,
+        'last_id': alerts[-1].id if alerts else after,
+        'has_more': has_more,
+    })
+
+
+def dashboard_queries(today):
+    """The dashboard's two independent aggregates, as {name: callable}"""
+    this_month = today.replace(day=1)
+    is_today = Q(day=today)
+    
+    # Today's and this month's stats in a single pass over the rollup
+    def sales():
+        return DailySalesRollup.objects.filter(day__gte=this_month).aggregate(
+            today_sales_count=Coalesce(Sum('sale_count', filter=is_today), 0),
+            today_revenue=Sum('revenue', filter=is_today),
+            today_quantity_sold=Sum('quantity', filter=is_today),
+            month_sales_count=Coalesce(Sum('sale_count'), 0),
+            month_revenue=Sum('revenue'),
+            month_quantity_sold=Sum('quantity'),
+        )
     
     # Inventory stats
-    inventory_stats = Tea.objects.aggregate(
-        total_teas=Count('id'),
-        total_stock=Sum('stock_quantity'),
-        low_stock_count=Count('id', filter=Q(stock_quantity__lt=10))
-    )
+    def inventory():
+        return Tea.objects.aggregate(
+            total_teas=Count('id'),
+            total_stock=Sum('stock_quantity'),
+            low_stock_count=Count('id', filter=Q(stock_quantity__lt=F('reorder_level')))
+        )
     
-    return Response({
-        'today': today_stats,
-        'this_month': month_stats,
-        'inventory': inventory_stats,
+    return {'sales': sales, 'inventory': inventory}
+
+
+def dashboard_payload(today, results):
+    sales = results['sales']
+    return {
+        'today': {
+            'sales_count': sales['today_sales_count'],
+            'revenue': sales['today_revenue'],
+            'quantity_sold': sales['today_quantity_sold'],
+        },
+        'this_month': {
+            'sales_count': sales['month_sales_count'],
+            'revenue': sales['month_revenue'],
+            'quantity_sold': sales['month_quantity_sold'],
+        },
+        'inventory': results['inventory'],
         'date': today
-    })
+    }
+
+
+def compute_dashboard_stats(today):
+    """Build the dashboard payload with one rollup query and one inventory query"""
+    results = {name: run() for name, run in dashboard_queries(today).items()}
+    return dashboard_payload(today, results)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dashboard_stats(request):
+    """
+    API endpoint for dashboard statistics.
+    GET /api/dashboard/ returns key metrics for the dashboard.
+    Served from the cache; sales and tea changes invalidate it.
+    """
+    today = timezone.localdate()
+    use_replica = reads_use_replica(request.user)
+    with read_from_replica(use_replica):
+        # Replica figures may lag, so they are cached no longer than the lag
+        timeout = settings.REPLICA_PIN_SECONDS if use_replica else None
+        stats = cached_dashboard_stats(
+            today, compute_dashboard_stats, timeout=timeout, replica=use_replica
+        )
+    return Response(stats)
 
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def dashboard_cache_view(request):
+    """
+    API endpoint for dashboard cache effectiveness.
+    GET /api/dashboard/cache/ returns hit and miss counters (staff only).
+    """
+    return Response(dashboard_cache_stats())
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics_view(request):
+    """
+    API endpoint for Prometheus scraping.
+    GET /api/metrics/ returns request counts, latency histograms and SQL
+    usage per endpoint in the Prometheus text format (staff only).
+    """
+    if not settings.METRICS_ENABLED:
+        return Response(
+            {'error': 'Metrics are disabled. Set METRICS_ENABLED to collect them.'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    cache_stats = dashboard_cache_stats()
+    extra = [
+        ('inventory_dashboard_cache_hits_total', 'counter',
+         'Dashboard requests served from the cache.', cache_stats['hits']),
+        ('inventory_dashboard_cache_misses_total', 'counter',
+         'Dashboard requests that recomputed the stats.', cache_stats['misses']),
+    ]
+    return HttpResponse(
+        registry.render(extra), content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
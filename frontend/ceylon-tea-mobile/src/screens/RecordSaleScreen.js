@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import {
   View,
   Text,
@@ -15,11 +15,18 @@ import { StatusBar } from 'expo-status-bar';
 import { useSafeAreaInsets } from 'react-native-safe-area-context';
 import { useCart } from '../context/CartContext';
 import SalesService from '../services/salesService';
-import { formatCurrency } from '../utils/helpers';
+import { formatCurrency, generateIdempotencyKey } from '../utils/helpers';
 import { TEA_IMAGE_URL } from '../utils/constants';
 
 const RecordSaleScreen = ({ navigation }) => {
   const [loading, setLoading] = useState(false);
+  // Kept across retries of a checkout whose outcome is unknown
+  const checkoutKey = useRef(null);
+
+  // An edited cart is a different checkout, so it must not reuse the key
+  useEffect(() => {
+    checkoutKey.current = null;
+  }, [cartItems]);
   const { cartItems, updateQuantity, removeFromCart, clearCart, getCartTotal } = useCart();
   const insets = useSafeAreaInsets();
 
@@ -54,19 +61,20 @@ const RecordSaleScreen = ({ navigation }) => {
 
     setLoading(true);
     try {
-      // Process each item in the cart as separate sales
-      const salePromises = cartItems.map(item =>
-        SalesService.recordSale(item.tea.id, item.quantity)
+      // Record the whole cart in a single all-or-nothing checkout
+      checkoutKey.current = checkoutKey.current || generateIdempotencyKey();
+      const result = await SalesService.checkout(
+        cartItems.map(item => ({ teaId: item.tea.id, quantity: item.quantity })),
+        null,
+        checkoutKey.current
       );
-
-      const results = await Promise.all(salePromises);
-      
-      // Check if all sales were successful
-      const failedSales = results.filter(result => !result.success);
+      if (!result.retryable) {
+        checkoutKey.current = null;
+      }
       
-      if (failedSales.length === 0) {
-        const totalItems = cartItems.reduce((sum, item) => sum + item.quantity, 0);
-        const totalAmount = getCartTotal();
+      if (result.success) {
+        // Report what the server recorded, which a retry may have done earlier
+        const { total_quantity: totalItems, total_amount: totalAmount } = result.data;
         
         // Clear cart and navigate back immediately with success message
         clearCart();
@@ -74,11 +82,13 @@ const RecordSaleScreen = ({ navigation }) => {
           showSuccess: true,
           successMessage: `${totalItems} items sold for ${formatCurrency(totalAmount)}`
         });
-      } else {
+      } else if (result.retryable) {
         Alert.alert(
-          'Some Sales Failed',
-          `${failedSales.length} out of ${cartItems.length} sales failed. Please try again.`
+          'Checkout Interrupted',
+          'Could not reach the server. Check out again to retry; the cart will not be sold twice.'
         );
+      } else {
+        Alert.alert('Checkout Failed', `${result.error}. No items were sold.`);
       }
     } catch (error) {
       Alert.alert('Error', 'Failed to process sales. Please try again.');
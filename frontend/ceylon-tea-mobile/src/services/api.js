@@ -1,6 +1,6 @@
 import axios from 'axios';
 import AsyncStorage from '@react-native-async-storage/async-storage';
-import { API_BASE_URL, STORAGE_KEYS } from '../utils/constants';
+import { API_BASE_URL, ENDPOINTS, STORAGE_KEYS } from '../utils/constants';
 
 // Create axios instance
 const api = axios.create({
@@ -25,14 +25,58 @@ api.interceptors.request.use(
   }
 );
 
+// Exchange the stored refresh token for a new access token. Concurrent 401s
+// share one refresh request instead of each logging in again.
+let refreshPromise = null;
+
+const refreshAccessToken = async () => {
+  const refresh = await AsyncStorage.getItem(STORAGE_KEYS.REFRESH_TOKEN);
+  if (!refresh) {
+    throw new Error('No refresh token');
+  }
+  // Plain axios so this request skips the interceptors below
+  const response = await axios.post(
+    `${API_BASE_URL}${ENDPOINTS.TOKEN_REFRESH}`,
+    { refresh },
+    { timeout: 10000 }
+  );
+  const { access, refresh: rotated } = response.data;
+  await AsyncStorage.setItem(STORAGE_KEYS.AUTH_TOKEN, access);
+  if (rotated) {
+    await AsyncStorage.setItem(STORAGE_KEYS.REFRESH_TOKEN, rotated);
+  }
+  return access;
+};
+
+const clearSession = async () => {
+  await AsyncStorage.removeItem(STORAGE_KEYS.AUTH_TOKEN);
+  await AsyncStorage.removeItem(STORAGE_KEYS.REFRESH_TOKEN);
+  await AsyncStorage.removeItem(STORAGE_KEYS.USER_DATA);
+};
+
 // Response interceptor for error handling
 api.interceptors.response.use(
   (response) => response,
   async (error) => {
-    if (error.response?.status === 401) {
-      // Token expired or invalid, clear storage
-      await AsyncStorage.removeItem(STORAGE_KEYS.AUTH_TOKEN);
-      await AsyncStorage.removeItem(STORAGE_KEYS.USER_DATA);
+    const original = error.config;
+    if (error.response?.status === 401 && original && !original._retried
+        && original.url !== ENDPOINTS.LOGIN) {
+      original._retried = true;
+      let access;
+      try {
+        refreshPromise = refreshPromise || refreshAccessToken();
+        access = await refreshPromise;
+      } catch (refreshError) {
+        // Refresh token expired or revoked: the user has to log in again
+        await clearSession();
+        return Promise.reject(error);
+      } finally {
+        refreshPromise = null;
+      }
+      original.headers.Authorization = `Bearer ${access}`;
+      return api(original);
+    } else if (error.response?.status === 401) {
+      await clearSession();
     }
     return Promise.reject(error);
   }
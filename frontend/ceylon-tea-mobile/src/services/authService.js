@@ -15,6 +15,7 @@ class AuthService {
 
       // Store tokens and user data
       await AsyncStorage.setItem(STORAGE_KEYS.AUTH_TOKEN, access);
+      await AsyncStorage.setItem(STORAGE_KEYS.REFRESH_TOKEN, refresh);
       await AsyncStorage.setItem(STORAGE_KEYS.USER_DATA, JSON.stringify(user));
 
       return { success: true, user, token: access };
@@ -30,6 +31,7 @@ class AuthService {
   async logout() {
     try {
       await AsyncStorage.removeItem(STORAGE_KEYS.AUTH_TOKEN);
+      await AsyncStorage.removeItem(STORAGE_KEYS.REFRESH_TOKEN);
       await AsyncStorage.removeItem(STORAGE_KEYS.USER_DATA);
       return { success: true };
     } catch (error) {
@@ -1,5 +1,6 @@
 import api from './api';
 import { ENDPOINTS } from '../utils/constants';
+import { generateIdempotencyKey } from '../utils/helpers';
 
 class SalesService {
   // Record a new sale
@@ -18,6 +19,31 @@ class SalesService {
     }
   }
 
+  // Record a whole cart in one request; either every line is sold or none.
+  // Retrying with the same idempotencyKey never sells the cart twice.
+  async checkout(items, customerName = null, idempotencyKey = generateIdempotencyKey()) {
+    try {
+      const response = await api.post(
+        ENDPOINTS.CHECKOUT,
+        {
+          items: items.map(item => ({ tea: item.teaId, quantity: item.quantity })),
+          customer_name: customerName,
+        },
+        { headers: { 'Idempotency-Key': idempotencyKey } }
+      );
+      return { success: true, data: response.data };
+    } catch (error) {
+      return {
+        success: false,
+        error: error.response?.data?.non_field_errors?.[0]
+          || error.response?.data?.detail
+          || 'Failed to record sale',
+        // Without a response the cart may have been sold; retry with the same key
+        retryable: !error.response,
+      };
+    }
+  }
+
   // Get sales history
   async getSales() {
     try {
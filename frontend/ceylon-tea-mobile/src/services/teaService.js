@@ -1,12 +1,32 @@
 import api from './api';
 import { ENDPOINTS } from '../utils/constants';
 
+// Last catalogue response per query, revalidated with its ETag
+const catalogueCache = new Map();
+
+// Accept 304 Not Modified as a successful response
+const allowNotModified = (status) => (status >= 200 && status < 300) || status === 304;
+
 class TeaService {
   // Get all teas with optional category filter
   async getTeas(category = '') {
     try {
       const params = category ? { category } : {};
-      const response = await api.get(ENDPOINTS.TEAS, { params });
+      const cacheKey = JSON.stringify(params);
+      const cached = catalogueCache.get(cacheKey);
+
+      const response = await api.get(ENDPOINTS.TEAS, {
+        params,
+        headers: cached ? { 'If-None-Match': cached.etag } : {},
+        validateStatus: allowNotModified,
+      });
+
+      if (response.status === 304 && cached) {
+        return { success: true, data: cached.data };
+      }
+      if (response.headers.etag) {
+        catalogueCache.set(cacheKey, { etag: response.headers.etag, data: response.data });
+      }
       return { success: true, data: response.data };
     } catch (error) {
       return {
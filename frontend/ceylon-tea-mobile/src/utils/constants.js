@@ -4,8 +4,10 @@ export const API_BASE_URL = 'https://eeedf922968b.ngrok-free.app/api'; // Change
 // API Endpoints
 export const ENDPOINTS = {
   LOGIN: '/login/',
+  TOKEN_REFRESH: '/token/refresh/',
   TEAS: '/teas/',
   SALES: '/sales/',
+  CHECKOUT: '/sales/checkout/',
   REPORTS: '/reports/',
 };
 
@@ -56,4 +56,9 @@ export const debounce = (func, wait) => {
     clearTimeout(timeout);
     timeout = setTimeout(later, wait);
   };
-}; 
\ No newline at end of file
+}; 
+// Unique key for one checkout, sent again unchanged when it is retried
+export const generateIdempotencyKey = () => {
+  const random = Math.random().toString(36).slice(2, 12);
+  return `${Date.now().toString(36)}-${random}`;
+};